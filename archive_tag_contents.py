@@ -4,122 +4,134 @@
 # Notes:
 #   * patool cannot list the contents of an archive in a way that can be captured and
 #     put into a variable. That is by design because it would be difficult.
+#   * So the contents are listed from the headers of the archive (`srss.listing`),
+#     which is a few KB of reading per archive, whatever its size.
+#   * The size of the pages comes from the first few KB of each of them
+#     (`srss.geometry`): the most common one (and its orientation), the spreads and
+#     the outliers (pages of another size, e.g. from another scan). Only for ZIP and
+#     tar, since the pages of a RAR or 7z would have to be decompressed.
 #
 # External Dependencies
 #   * https://pypi.org/project/macos-tags/
+#   * https://pypi.org/project/py7zr/ (7z only)
+#   * https://pypi.org/project/rarfile/ (RAR only)
 # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike
-from pathlib import Path, PurePath
-from re import Pattern as re_Pattern
-from re import compile as re_compile
-from re import search as re_search
-from sys import argv
-from typing import Sequence, Union
-from zipfile import ZipFile
-
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
+from pathlib import Path
+
+from srss.client import run_script
+from srss.listing import list_archive
+from srss.media import ORIENTATION_TAGS, get_aspect_ratio
+from srss.tags import Color, Tag, TagRules, TagSession
+from srss.trace import note, span
+from srss.writer import get_tag_writer
 
 # MARK: Constants
 ARCHIVE_SUFFIXES = [
+    ".7z",
+    ".cb7",
+    ".cbr",
+    ".cbt",
     ".cbz",
+    ".rar",
+    ".tar",
     ".zip",
 ]
 
-BLUE = itemgetter("BLUE")(Color)
-
-# MARK: Functions
-
-
-# Extend `macos_tags.add` to accept a `PathLike` object
-def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    add_tag_original(tag, file=str(file))
-
-
-# Extend `macos_tags.get_all_tags` to accept a `PathLike` object
-def get_all_tags(file: Union[PathLike, str]) -> list[Tag]:
-    return get_all_tags_original(file=str(file))
+BLUE, GREEN, PURPLE, YELLOW = itemgetter("BLUE", "GREEN", "PURPLE", "YELLOW")(Color)
 
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(
+    tags=ORIENTATION_TAGS.keys(),
+    patterns=[
+        (r"\.\w+\s\(\d+\)", BLUE),  # e.g. `.jpg (24)`
+        (r"\d+x\d+", GREEN),  # e.g. `1988x3056`
+        (r"Spreads\s\(\d+\)", PURPLE),
+        (r"Outliers\s\(\d+\)", YELLOW),
+    ],
+)
 
-# Extend `macos_tags.remove` to accept a `PathLike` object
-def remove_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    remove_tag_original(file=str(file), tag=tag)
+# MARK: Process One Path
 
+tag_writer = get_tag_writer()
 
-def is_hidden(path: Union[PathLike, str]) -> bool:
-    return PurePath(path).stem.startswith(".")
 
-
-def remove_tag_by_name(
-    target_tag: Union[re_Pattern, str], file: Union[str, PathLike]
-) -> None:
-    # print(target_tag)
-    for tag in get_all_tags(file=file):
-        # print(tag.name)
-        if isinstance(target_tag, re_Pattern):
-            # print("re_Pattern")
-            results = re_search(target_tag, tag.name)
-            if results:
-                remove_tag(tag, file=file)
-                continue
-        elif tag.name == target_tag:
-            remove_tag(tag, file=file)
-            break
-
-
-def cnt_by_suffix(paths: Sequence[Union[str, PathLike]]) -> dict[str, int]:
-    sfx_cnt = {}
-    for path in paths:
-        pp = PurePath(path)
-        if is_hidden(pp):
-            continue
-        suffix = pp.suffix.lower()
-        sfx_cnt[suffix] = sfx_cnt.get(suffix, 0) + 1
-    return sfx_cnt
-
-
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
+def process(arg: str) -> None:
     arg_path = Path(arg)
 
     # Skip if not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not arg_path.is_file():
-        print(f"🛑 {arg_path.name} 👉 Not a file")
-        continue
+        note("🛑", arg_path, "Not a file", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Skip if not an archive
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not arg_path.suffix.lower() in ARCHIVE_SUFFIXES:
-        print(f"🛑 {arg_path.name} 👉 Unrecognized suffix ({arg_path.suffix})")
-        continue
+        suffix = arg_path.suffix
+        note("🛑", arg_path, f"Unrecognized suffix ({suffix})", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # Remove existing tags
+    # Read the existing tags (the contents tags are replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tag_by_name(re_compile(r"^\.\w+\s\(\d+\)$"), file=arg_path)
+    tags = TagSession(arg_path, owned=OWNED_TAGS)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # List the contents of the archive
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    z = ZipFile(arg_path)
-    contents = z.namelist()
-    cnts = cnt_by_suffix(contents)
-    # print(cnts)
+    try:
+        with span("probe", arg_path):
+            listing = list_archive(arg_path, pages=True)
+    except Exception as e:
+        note("🛑", arg_path, "Couldn't list the contents", error=e, outcome="unreadable")
+        return
+    cnts = listing.counts
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Add tags for the contents
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     for suffix, count in cnts.items():
         if count > 1:
-            tag = Tag(name=f"{suffix} ({count})", color=BLUE)
-            add_tag(tag, file=arg_path)
+            tags.add(Tag(name=f"{suffix} ({count})", color=BLUE))
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Add tags for the pages (the most common size, and the pages that aren't it)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    stats = listing.pages
+    if stats is not None:
+        note("📐", arg_path, str(stats))
+        width, height = stats.size
+        tags.add(Tag(name=f"{width}x{height}", color=GREEN))
+        for tag, test in ORIENTATION_TAGS.items():
+            if test(get_aspect_ratio(width, height)):
+                tags.add(tag)
+                break
+        if stats.spreads:
+            tags.add(Tag(name=f"Spreads ({stats.spreads})", color=PURPLE))
+        if stats.outliers:
+            tags.add(Tag(name=f"Outliers ({len(stats.outliers)})", color=YELLOW))
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("archive_tag_contents", main)
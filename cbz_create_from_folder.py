@@ -3,33 +3,27 @@
 #
 # ## External Dependencies
 #   * https://pypi.org/project/macos-tags/
-#   * https://pypi.org/project/patool/
 # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
 # MARK: Imports
 
-from glob import glob as glob_original
 from operator import itemgetter
-from os import PathLike, chdir, environ, pathsep, remove
-from os.path import relpath
+from os import remove
 from pathlib import Path
-from sys import argv
-from typing import Sequence, Union
 
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
-from patoolib import create_archive as create_archive_original
-from patoolib import test_archive as test_archive_original
-from send2trash import send2trash
+from srss.atomic import sweep_once
+from srss.cbz import get_members, write_cbz
+from srss.client import run_script
+from srss.lazy import lazy_import
+from srss.tags import Color, Tag, TagRules, TagSession, add_tag
+from srss.trace import note, span
+from srss.verified import test_verified
+from srss.verify import VERIFIER, test_zip
+from srss.writer import get_tag_writer
 
-# MARK: Path
+# MARK: Lazy Imports
 
-# Add Homebrew locations to the path for `patoolib`
-environ["PATH"] += pathsep + "/usr/local/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/sbin"
+send2trash = lazy_import("send2trash", "send2trash")
 
 # MARK: Constants
 
@@ -45,167 +39,130 @@ TAG_CLEANUP_FAILED = Tag(name="Failed Cleanup", color=RED)
 
 TAG_FAILED_ARCHIVE_CREATION = Tag(name="Failed Creation", color=RED)
 
-# MARK: Functions
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS_FOLDER = TagRules(
+    tags=[
+        TAG_FAILED_ARCHIVE_CREATION,
+        TAG_CLEANUP_FAILED,
+        TAG_COLLISION,
+        TAG_CORRUPT,
+        TAG_VALID,
+    ]
+)
+OWNED_TAGS_CBZ = TagRules(tags=[TAG_CORRUPT, TAG_VALID])
 
-# Built-In Related Functions
+# MARK: Process One Path
 
+tag_writer = get_tag_writer()
 
-# Useful when using `patoolib.create_archive`
-def get_descendant_file_relative_paths(dir: Union[Path, str]) -> list[str]:
-    dir = Path(dir).resolve()
-    if not dir.is_dir():
-        return []
-    descendants = dir.rglob("*")
-    files = [f for f in descendants if f.is_file()]
-    relative_paths = [relpath(fp, dir) for fp in files]
-    return relative_paths
-
-
-# Extend `glob.glob` to accept `PathLike` objects
-def glob(pathname: Union[PathLike, str], *args, **kwargs) -> list[str]:
-    return glob_original(str(pathname), *args, **kwargs)
-
-
-# Tag Related Functions
-
-
-# Extend `macos_tags.add` to accept `PathLike` objects
-def add_tag(tag: Tag, file: Union[PathLike, str], *args, **kwargs) -> None:
-    add_tag_original(tag, file=str(file), *args, **kwargs)
-
-
-# Extend `macos_tags.get_all_tags` to accept `PathLike` objects
-def get_all_tags(file: Union[PathLike, str], *args, **kwargs) -> list[Tag]:
-    return get_all_tags_original(file=str(file), *args, **kwargs)
-
-
-# Extend `macos_tags.remove` to accept `PathLike` objects
-def remove_tag(tag: Tag, file: Union[PathLike, str], *args, **kwargs) -> None:
-    remove_tag_original(file=str(file), tag=tag, *args, **kwargs)
-
-
-# Convenience function for `macos_tags.remove` on multiple tags
-def remove_tags(tags: list[Tag], file: Union[PathLike, str]) -> None:
-    for tag in get_all_tags(file):
-        if tag in tags:
-            remove_tag(tag, file)
-
-
-def has_tag(tag: Tag, file: Union[PathLike, str]) -> bool:
-    return tag in get_all_tags(file)
-
-
-# Patool Related Functions
-
-
-# Extend `patoolib.create_archive` to accept `PathLike` objects
-def create_archive(
-    archive: Union[PathLike, str],
-    filenames: Sequence[Union[PathLike, str]],
-    *args,
-    **kwargs,
-) -> None:
-    create_archive_original(
-        archive=str(archive),
-        filenames=[str(filename) for filename in filenames],
-        *args,
-        **kwargs,
-    )
-
-
-# Extend `patoolib.test_archive` to accept `PathLike` objects
-def test_archive(archive: Union[PathLike, str], *args, **kwargs) -> None:
-    test_archive_original(archive=str(archive), *args, **kwargs)
-
-
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
 
+def process(arg: str) -> None:
     src = Path(arg).resolve()
 
     # 🚨 Ensure it exists
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not src.exists():
-        print(f"🛑 {src} 👉 Does not exist")
+        note("🛑", src, "Does not exist", outcome="skipped")
         # No tag; this shouldn't happen when run as a Shortcut
-        continue
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # 📁 Ensure it's a directory
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not src.is_dir():
-        print(f"🛑 {src} 👉 Not a directory")
+        note("🛑", src, "Not a directory", outcome="skipped")
         # No tag; this shouldn't happen when run as a Shortcut
-        continue
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # 🛩️ Determine the destination
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     # Not using `with_suffix` below in case the `src` dir has dot(s) in the name
     dst = Path(f"{src}.cbz")
-    print(f"📂 {src} ➡️ {dst}")
+    note("📂", src, f"➡️ {dst.name}")
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # 🧹 Sweep what an interrupted run left next to it (see `srss.atomic`)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    sweep_once(dst.parent)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # 💥 Ensure no collision at the desination
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if dst.exists():
-        print(f"🛑 {dst} 👉 Collision")
+        note("🛑", dst, "Collision", outcome="collision")
         add_tag(TAG_COLLISION, file=src)
-        continue
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # 🏷️ Remove existing tags
+    # 🏷️ Read the existing tags (this script's tags are replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tags(
-        [
-            TAG_FAILED_ARCHIVE_CREATION,
-            TAG_CLEANUP_FAILED,
-            TAG_COLLISION,
-            TAG_CORRUPT,
-            TAG_VALID,
-        ],
-        file=src,
-    )
+    src_tags = TagSession(src, owned=OWNED_TAGS_FOLDER)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # 📕 Create the CBZ
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        files = get_descendant_file_relative_paths(src)
-        print(files)
-        chdir(src)  # !! Don't forget to change to the source directory
-        create_archive(dst, files)
+        with span("convert", src) as convert:
+            members = get_members(src)
+            convert.bytes = sum(Path(path).stat().st_size for _, path in members)
+            write_cbz(dst, members)
     except Exception as e:
-        print(f"❗️ Error: {e}")
-        add_tag(TAG_FAILED_ARCHIVE_CREATION, file=src)
+        note("❗️", src, "Creation failed", error=e, outcome="creation_failed")
+        src_tags.add(TAG_FAILED_ARCHIVE_CREATION)
         if dst.exists():
-            try:
-                send2trash(dst)
-            except Exception as e:
-                remove(dst)
+            with span("trash", dst):
+                try:
+                    send2trash(dst)
+                except Exception as e:
+                    remove(dst)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # ✅ Test the CBZ
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    dst_tags = TagSession(dst, owned=OWNED_TAGS_CBZ)
     try:
-        test_archive(dst)
-        print(f"✅ {dst.name} 👉 Valid")
-        add_tag(TAG_VALID, dst)
+        with span("validate", dst, bytes=dst.stat().st_size):
+            # Tested as it was written (see `srss.cbz`), so only looked up
+            test_verified(dst, test_zip, VERIFIER)
+        note("✅", dst, "Valid", outcome="valid")
+        dst_tags.add(TAG_VALID)
     except Exception as e:
-        print(f"🛑 {dst.name} 👉 {e}")
-        add_tag(TAG_CORRUPT, dst)
+        note("🛑", dst, str(e), outcome="corrupt")
+        dst_tags.add(TAG_CORRUPT)
+    tag_writer.commit(dst_tags)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # 🗑️ Remove the source directory
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        if dst.exists() and has_tag(TAG_VALID, dst):
-            try:
-                send2trash(src)
-            except Exception as e:
-                remove(src)
+        if dst.exists() and dst_tags.has(TAG_VALID):
+            with span("trash", src):
+                try:
+                    send2trash(src)
+                except Exception as e:
+                    remove(src)
     except Exception as e:
-        print(f"🛑 {src.name} 👉 {e}")
-        add_tag(TAG_CLEANUP_FAILED, file=src)
+        note("🛑", src, str(e), outcome="cleanup_failed")
+        src_tags.add(TAG_CLEANUP_FAILED)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # 🏷️ Queue writing the tags of the source directory (if it's still there)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    if src.exists():
+        tag_writer.commit(src_tags)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("cbz_create_from_folder", main)
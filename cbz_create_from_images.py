@@ -2,8 +2,11 @@
 # Comic: Create From Images
 #
 # Notes:
-#   * patool cannot list the contents of an archive in a way that can be captured and
-#     put into a variable. That is by design because it would be difficult.
+#   * One CBZ per folder (`Folder/Folder.cbz`), from the images selected in it; the
+#     paths are indexed by their case- and Unicode-folded names (see `srss.batch`),
+#     so tens of thousands of them can be given at once.
+#   * Every collision is reported (and tagged) before anything is written, and the
+#     folders are written several at once (`SRSS_BATCH_WORKERS`).
 #
 # External Dependencies
 #   * https://pypi.org/project/macos-tags/
@@ -12,112 +15,84 @@
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike, chdir, environ, pathsep, remove
-from os.path import relpath
-from pathlib import Path, PurePath
-from sys import argv
-from typing import Sequence, Union
+from os import remove
+from pathlib import Path
 
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from patoolib import create_archive, test_archive
-from send2trash import send2trash
+from srss.atomic import sweep_once
+from srss.batch import plan_batch, write_batch
+from srss.client import run_script
+from srss.lazy import lazy_import
+from srss.tags import Color, Tag, add_tag
+from srss.trace import count, note, span
+from srss.verified import test_verified
+from srss.verify import VERIFIER, test_zip
 
-# MARK: PATH Additions
+# MARK: Lazy Imports
 
-# Allow `patoolib` to find the binaries from Homebrew
-environ["PATH"] += pathsep + "/usr/local/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/sbin"
+send2trash = lazy_import("send2trash", "send2trash")
 
 # MARK: Constants
 
 GREEN, RED, YELLOW = itemgetter("GREEN", "RED", "YELLOW")(Color)
-# To share the tags between scripts, copy+paste becase each script must be standalone
 TAG_VALID = Tag(name="Valid Comic", color=GREEN)
 TAG_CORRUPT = Tag(name="Corrupt Comic", color=RED)
 TAG_COLLISION = Tag(name="Collision", color=YELLOW)
 
-# MARK: Functions
-
-
-# Extend `macos_tags.add` to accept a `PathLike` object
-def add_tag(tag: Tag, file: Union[str, PathLike]) -> None:
-    add_tag_original(tag, file=str(file))
-
-
-# So this doens't handle the same path with different cases
-# macOS is case-insensitive but case-preserving by default
-# e.g.
-#   print(Path("/Applications/").samefile(Path("/Applications/"))) # True
-#   print(Path("/Applications/").samefile(Path("/applications/"))) # Also True!
-# (FYI: `os.path.realpath` does not get the correct case)
-# (FYI: `chdir` and `getcwd` do not get the correct case either)
-# (Conclusion: Iterating+checking all keys with `samefile` woud work, but not worth it)
-# So that is a bit of a problem, but not one I solve here
-# Because this is intended to be used in a Shortcut
-# And thus the paths should come directly from macoS/Finder
-# (Except during testing)
-def group_files_by_parent(
-    files: Sequence[Union[PathLike, str]]
-) -> dict[Union[PathLike, str], list[Union[PathLike, str]]]:
-    groups = {}
-    for file in files:
-        fp = Path(file).resolve()
-        if not fp.is_file():
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    # Group the files by their parent directory (see `srss.batch`), and find every
+    # collision before anything is written
+    with span("index"):
+        plan = plan_batch(args)
+    for collision in plan.collisions:
+        reason = f"Collision ({collision.reason})"
+        note("🛑", collision.path, reason, outcome="collision")
+        add_tag(TAG_COLLISION, file=collision.path)
+    for path in plan.missing:
+        note("🛑", path, "Not a file", outcome="skipped")
+    for path in plan.duplicates:
+        count("duplicate", path)
+    # What an interrupted run left (see `srss.atomic`)
+    for group in plan.groups:
+        sweep_once(group.folder)
+
+    # Create an archive for each group (several at once)
+    failed = 0
+    for group, error in write_batch(plan.groups):
+        dst, files = Path(group.dst), [path for _, path in group.pages]
+        if error is not None:
+            note("❗️", dst, "Creation failed", error=error, outcome="creation_failed")
+            failed += 1
             continue
-        pp = fp.parent
-        if pp not in groups:
-            groups[pp] = []
-        groups[pp].append(fp)
-    return groups
-
-
-# Group the files by their parent directory
-# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-args = argv[1:]
-grouped = group_files_by_parent(args)
-# print(grouped)
-# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+        note("📦", dst, f"Created ({len(files)} pages)", outcome="created")
 
-# Create an archive for each group
-# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-for parent, files in grouped.items():
-    ppp = PurePath(parent)
-    # `with_suffix` not used below because the directory may have a dot in the name
-    dst = Path(ppp.joinpath(f"{ppp.name}.cbz"))
-
-    if dst.is_file():
-        print(f"🛑 COLLISION! {dst.name} 👉 Already exists")
-        add_tag(TAG_COLLISION, file=dst)
-        continue
-
-    print(f"📦 Creating: {dst}")
-    print(f"📁 Source: {files}")
-
-    chdir(ppp)  # Change to the parent directory here, for using `relpath` below
-    create_archive(
-        dst,
-        [relpath(fn, ppp) for fn in files],
-    )
-    print(f"📦 Created: {dst}")
-
-    try:
-        test_archive(dst)
-        print(f"✅ Verified: {dst}")
-        add_tag(TAG_VALID, file=dst)
-        print(f"🗑️ Deleting: {files}")
-        try:
-            send2trash(files)
-        except Exception as e:
-            for file in files:
-                remove(file)
-    except Exception as e:
-        print(f"❗️ Error: {e}")
-        add_tag(TAG_CORRUPT, file=dst)
-        print(f"🗑️ Deleting: {dst}")
         try:
-            send2trash(dst)
+            with span("validate", dst, bytes=dst.stat().st_size):
+                # Tested as it was written (see `srss.cbz`), so only looked up
+                test_verified(dst, test_zip, VERIFIER)
+            note("✅", dst, "Verified", outcome="valid")
+            add_tag(TAG_VALID, file=dst)
+            note("🗑️", Path(group.folder), f"Deleting {len(files)} pages")
+            with span("trash", group.folder):
+                try:
+                    send2trash(files)
+                except Exception as e:
+                    for file in files:
+                        remove(file)
         except Exception as e:
-            remove(dst)
-# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+            note("❗️", dst, "Corrupt", error=e, outcome="corrupt")
+            add_tag(TAG_CORRUPT, file=dst)
+            note("🗑️", dst, "Deleting")
+            with span("trash", dst):
+                try:
+                    send2trash(dst)
+                except Exception as e:
+                    remove(dst)
+    if failed:
+        raise RuntimeError(f"{failed} of {len(plan.groups)} CBZs couldn't be created")
+
+
+if __name__ == "__main__":
+    run_script("cbz_create_from_images", main)
@@ -10,27 +10,33 @@
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike, environ, pathsep, remove, rename
+from os import PathLike, remove, rename
 from pathlib import Path
-from sys import argv
 from typing import Union
-from zipfile import is_zipfile
 
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
-from patoolib import repack_archive as repack_archive_original
-from patoolib import test_archive as test_archive_original
-from rarfile import is_rarfile
-from send2trash import send2trash
+from srss.atomic import sweep_once
+from srss.cbz import repack_rar
+from srss.client import run_script
+from srss.comicinfo import COMICINFO, is_comicinfo, write_comicinfo
+from srss.homebrew import add_homebrew_to_path
+from srss.lazy import lazy_import
+from srss.pages import PAGES_VERIFIER, is_deep, test_pages
+from srss.probe import NotAnArchiveError, get_probe, move_probe
+from srss.tags import Color, Tag, TagRules, TagSession, add_tag
+from srss.trace import count, note, span
+from srss.verified import record, test_verified
+from srss.verify import VERIFIER, CorruptArchiveError, Verification, test_zip
+from srss.writer import get_tag_writer
+
+# MARK: Lazy Imports
+
+test_archive_original = lazy_import("patoolib", "test_archive")
+send2trash = lazy_import("send2trash", "send2trash")
 
 # MARK: PATH
 # To allow patoolib to find the binaries from Homebrew
 
-environ["PATH"] += pathsep + "/usr/local/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/sbin"
+add_homebrew_to_path()
 
 # MARK: Constants
 
@@ -41,53 +47,47 @@ TAG_CORRUPT = Tag(name="Corrupt Comic", color=RED)
 TAG_COLLISION = Tag(name="Collision", color=YELLOW)
 TAG_REPACK_FAILED = Tag(name="Repack Failed", color=ORANGE)
 
-# MARK: Functions
-
-
-# Extend `macos_tags.add` to accept a `PathLike` object
-def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    add_tag_original(tag, file=str(file))
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(tags=[TAG_VALID, TAG_CORRUPT, TAG_COLLISION, TAG_REPACK_FAILED])
 
+# How a `PatoolError` says the tool (`rar`, `7z`, …) ran and failed the archive, as
+# opposed to not being found at all
+PATOOL_FAILED = "returned non-zero exit status"
 
-# Extend `macos_tags.get_all_tags` to accept a `PathLike` object
-def get_all_tags(file: Union[PathLike, str]) -> list[Tag]:
-    return get_all_tags_original(file=str(file))
-
-
-# Extend `macos_tags.remove` to accept a `PathLike` object
-def remove_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    remove_tag_original(file=str(file), tag=tag)
-
+# MARK: Functions
 
-# Extend `macos_tags.remove` to accept `PathLike` objects
-def remove_tags(tags: list[Tag], file: Union[PathLike, str]) -> None:
-    for tag in get_all_tags(file):
-        if tag in tags:
-            remove_tag(tag, file)
 
+# Extend `patoolib.test_archive` to accept `PathLike` objects, and raise a failed test
+# as a `CorruptArchiveError` (so it's remembered, see `srss.verified`)
+def test_archive(archive: Union[PathLike, str]) -> None:
+    try:
+        test_archive_original(archive=str(archive))
+    except Exception as e:
+        if PATOOL_FAILED not in str(e):
+            raise
+        result = Verification(str(archive), 0, 0, [], error=str(e))
+        raise CorruptArchiveError(result) from e
 
-# Extend `patoolib.repack_archive` to accept `PathLike` objects
-def repack_archive(
-    archive: Union[PathLike, str], archive_new: Union[PathLike, str]
-) -> None:
-    repack_archive_original(archive=str(archive), archive_new=str(archive_new))
 
+# MARK: Process One Path
 
-# Extend `patoolib.test_archive` to accept `PathLike` objects
-def test_archive(archive: Union[PathLike, str]) -> None:
-    test_archive_original(archive=str(archive))
+tag_writer = get_tag_writer()
 
 
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
+def process(arg: str) -> None:
     src = Path(arg).resolve()
 
     # Skip if not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not src.is_file():
-        print(f"🛑 {src.name} 👉 Not a file")
-        continue
+        note("🛑", src, "Not a file", outcome="skipped")
+        return
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Sweep what an interrupted run left next to it (half-written CBZs, the journals
+    # of appends, see `srss.atomic`)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    sweep_once(src.parent)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Enfore a lowercase suffix
@@ -103,9 +103,9 @@ for arg in args:
             src.rename(dst)
             src = dst
         except FileExistsError:
-            print(f"⚠️ {src.name} 👉 Collision (Downcase) ({dst.name})")
+            note("⚠️", src, f"Collision (Downcase) ({dst.name})", outcome="collision")
             add_tag(TAG_COLLISION, file=src)
-            continue
+            return
         # if not dst.exists():
         #     print(f"⬇️ {src.name} 👉 Downcased suffix ({src.suffix})")
         #     rename(src, dst)
@@ -113,81 +113,145 @@ for arg in args:
         # else:
         #     print(f"⚠️ {src.name} 👉 Collision (Downcase) ({dst.name})")
         #     add_tag(TAG_COLLISION, file=src)
-        #     continue
+        #     return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Skip if suffix is not a `.cbz` or `.cbr`
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not src.suffix in [".cbz", ".cbr"]:
-        print(f"🛑 {src.name} 👉 Unrecognized suffix ({src.suffix})")
-        continue
+        note("🛑", src, f"Unrecognized suffix ({src.suffix})", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # Remove existing tags
+    # Read the existing tags (the ones from this script are replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tags([TAG_VALID, TAG_CORRUPT, TAG_COLLISION, TAG_REPACK_FAILED], file=src)
+    tags = TagSession(src, owned=OWNED_TAGS)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Look at what the archive actually is (the rest goes by this)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    with span("probe", src) as probing:
+        probe = get_probe(src)
+        probing.bytes = probe.size
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Fix extension if necessary
     # This could be combined with the CBR repack, but it's not
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    if ".cbr" == src.suffix and is_zipfile(src):
+    if ".cbr" == src.suffix and "zip" == probe.format:
         dst = src.with_suffix(".cbz")
         if dst.exists():
-            add_tag(TAG_COLLISION, file=src)
-            print(f"⚠️ {src.name} 👉 Collision (Extant CBZ) ({dst.name})")
-            continue
+            tags.add(TAG_COLLISION)
+            tag_writer.commit(tags)
+            note("⚠️", src, f"Collision (Extant CBZ) ({dst.name})", outcome="collision")
+            return
         else:
             rename(src, dst)
-            print(f"🔧 {src.name} 👉 Fixed extension (.cbr ➡️ .cbz)")
+            tags.rename(dst)
+            probe = move_probe(probe, dst)
+            note("🔧", src, "Fixed extension (.cbr ➡️ .cbz)", outcome="renamed")
             src = dst
-    elif ".cbz" == src.suffix and is_rarfile(src):
+    elif ".cbz" == src.suffix and probe.is_rar:
         dst = src.with_suffix(".cbr")
         if dst.exists():
-            add_tag(TAG_COLLISION, file=src)
-            print(f"⚠️ {src.name} 👉 Collision (Extant CBR) {dst.name}")
-            continue
+            tags.add(TAG_COLLISION)
+            tag_writer.commit(tags)
+            note("⚠️", src, f"Collision (Extant CBR) ({dst.name})", outcome="collision")
+            return
         else:
             rename(src, dst)
-            print(f"🔧 {src.name}  👉 Fixed extension (.cbz ➡️ .cbr)")
+            tags.rename(dst)
+            probe = move_probe(probe, dst)
+            note("🔧", src, "Fixed extension (.cbz ➡️ .cbr)", outcome="renamed")
             src = dst
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Repack CBRs
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    if ".cbr" == src.suffix and is_rarfile(src):
+    if ".cbr" == src.suffix and probe.is_rar:
         dst = src.with_suffix(".cbz")
         if dst.exists():
-            add_tag(TAG_COLLISION, file=src)
-            print(f"⚠️ Collision (Repack) 👉 {src.name} 💥 ({dst.name})")
-            continue
+            tags.add(TAG_COLLISION)
+            tag_writer.commit(tags)
+            note("⚠️", src, f"Collision (Repack) ({dst.name})", outcome="collision")
+            return
         else:
             try:
-                test_archive(src)
-                repack_archive(src, dst)
+                # Streamed member by member (each one's CRC checked as it's read)
+                with span("convert", src, bytes=src.stat().st_size):
+                    repack_rar(src, dst)
                 # TODO: Handle network operations where there is no trash
-                try:
-                    send2trash(src)
-                except Exception as e:
-                    print(f"🛑 {src.name} 👉 Couldn't move to trash")
-                    print(e)
-                    remove(src)
+                with span("trash", src):
+                    try:
+                        send2trash(src)
+                    except Exception as e:
+                        note("🛑", src, "Couldn't move to trash", error=e)
+                        remove(src)
                 src = dst
+                probe = get_probe(src)
+                # The repacked comic is a new file, so start over with its tags
+                tags.reset(src)
+                note("📦", src, "Repacked (.cbr ➡️ .cbz)", outcome="repacked")
             except Exception as e:
-                add_tag(TAG_REPACK_FAILED, file=src)
-                print(f"🛑 {src.name} 👉 Repack failed")
-                print(e)
-                continue
+                tags.add(TAG_REPACK_FAILED)
+                tag_writer.commit(tags)
+                note("🛑", src, "Repack failed", error=e, outcome="repack_failed")
+                return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Tag the comic as valid or corrupt
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        test_archive(src)
-        add_tag(TAG_VALID, file=src)
-        print(f"✅ {src.name} 👉 Valid")
+        with span("validate", src, bytes=probe.size):
+            # Skipped when this very file was tested before (see `srss.verified`)
+            if "zip" == probe.format and is_deep():
+                # Every page decoded too (see `srss.pages`)
+                cached = test_verified(src, test_pages, PAGES_VERIFIER)
+            elif "zip" == probe.format:
+                cached = test_verified(src, test_zip, VERIFIER)
+            elif "7z" == probe.format or probe.is_rar:
+                cached = test_verified(src, test_archive, "patool")
+            else:
+                # Truncated, or not an archive at all (e.g. a PDF or an error page)
+                raise NotAnArchiveError(probe)
+        if cached:
+            count("verified_before", src)
+        tags.add(TAG_VALID)
+        note("✅", src, "Valid", outcome="valid")
     except Exception as e:
-        add_tag(TAG_CORRUPT, file=src)
-        print(f"🛑 {src.name} 👉 Corrupt ")
-        print(e)
+        tags.add(TAG_CORRUPT)
+        note("🛑", src, "Corrupt", error=e, outcome="corrupt")
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Add a ComicInfo.xml to the valid CBZs without one (if asked to)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    if "zip" == probe.format and tags.has(TAG_VALID) and is_comicinfo():
+        try:
+            with span("convert", src):
+                added = write_comicinfo(src)
+            if added:
+                # Appended in place (and read back), so the rest is still verified
+                record(src, PAGES_VERIFIER if is_deep() else VERIFIER)
+                note("📝", src, f"Added {COMICINFO}", outcome="comicinfo")
+        except Exception as e:
+            note("🛑", src, f"Couldn't add {COMICINFO}", error=e)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("comic_process", main)
@@ -0,0 +1,90 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# Comic: Transcode
+#
+# Notes:
+#   * Writes a smaller copy of each CBZ next to it for a reading device (e.g.
+#     `Comic.cbz` 👉 `Comic [eink].cbz`), see `srss.transcode` for the profiles.
+#   * The CBRs have to be repacked first (`comic_process`).
+#   * `SRSS_TRANSCODE_PROFILE` (or `--profile`) picks the profile (default: `eink`).
+#
+# External Dependencies
+#   * https://pypi.org/project/pillow/
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from pathlib import Path
+
+from srss.atomic import sweep_once
+from srss.client import run_script
+from srss.probe import get_probe
+from srss.trace import note, span
+from srss.transcode import PROFILES, get_destination, get_profile, transcode_cbz
+
+# MARK: Process One Path
+
+
+def process(arg: str) -> None:
+    src = Path(arg).resolve()
+    profile = get_profile()
+
+    # Skip if not a file
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    if not src.is_file():
+        note("🛑", src, "Not a file", outcome="skipped")
+        return
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Skip if suffix is not a `.cbz`
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    if ".cbz" != src.suffix.lower():
+        note("🛑", src, f"Unrecognized suffix ({src.suffix})", outcome="skipped")
+        return
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Skip the copies this script made (e.g. on a second recursive run)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    if any(src.stem.endswith(f" [{name}]") for name in PROFILES):
+        note("🛑", src, "Already transcoded", outcome="skipped")
+        return
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Skip if the archive isn't actually a ZIP
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    with span("probe", src) as probing:
+        probe = get_probe(src)
+        probing.bytes = probe.size
+    if "zip" != probe.format:
+        note("🛑", src, f"Not a ZIP ({probe})", outcome="skipped")
+        return
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Transcode the pages into a new CBZ (never over an existing one)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    dst = get_destination(src, profile)
+    sweep_once(dst.parent)
+    if dst.exists():
+        note("⚠️", src, f"Collision (Extant CBZ) ({dst.name})", outcome="collision")
+        return
+    try:
+        with span("convert", src, bytes=probe.size):
+            report = transcode_cbz(src, dst, profile)
+    except Exception as e:
+        note("🛑", src, "Transcode failed", error=e, outcome="transcode_failed")
+        return
+    for bad in report.errors:
+        note("⚠️", src, f"Copied as is ({bad.name}: {bad.error})")
+    note("📉", src, f"Transcoded ({profile.name}) ({report})", outcome="transcoded")
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+
+
+if __name__ == "__main__":
+    run_script("comic_transcode", main)
@@ -9,148 +9,78 @@
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike, remove
-from pathlib import Path, PurePath
-from re import Pattern
-from re import compile as re_compile
-from re import search as re_search
-from sys import argv
-from typing import Union
-
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag
-from macos_tags import get_all as get_all_tags
-from macos_tags import remove as remove_tag
-from PIL import Image
+from pathlib import Path
 
-# MARK: Tags
-
-(
-    RED,
-    ORANGE,
-    GREEN,
-    PURPLE,
-    GRAY,
-) = itemgetter(
-    "RED",
-    "ORANGE",
-    "GREEN",
-    "PURPLE",
-    "GRAY",
-)(Color)
-
-TAG_CORRUPT = Tag(name="Corrupt", color=RED)
-
-ORIENTATION_TAGS = {
-    Tag(name="Portrait", color=ORANGE): lambda ratio: ratio < 1,
-    Tag(name="Square", color=GRAY): lambda ratio: 1 == ratio,
-    Tag(name="Landscape", color=PURPLE): lambda ratio: 1 < ratio,
-}
-
-IMAGE_SUFFIXES = [
-    ".bmp",
-    ".gif",
-    ".jpeg",
-    ".jpg",
-    ".png",
-    ".tiff",
-    ".webp",
-]
-
-# MARK: Functions
+from srss.client import run_script
+from srss.lazy import lazy_import
+from srss.media import IMAGE_SUFFIXES, ORIENTATION_TAGS, get_aspect_ratio
+from srss.tags import Color, Tag, TagRules, TagSession
+from srss.trace import note, span
+from srss.writer import get_tag_writer
 
+# MARK: Lazy Imports
 
-def get_aspect_ratio(w: int, h: int) -> float:
-    return w / h
-
-
-def remove_tag_by_name(tag_name: str, file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    for tag in get_all_tags(file=str(file)):
-        if tag.name == tag_name:
-            remove_tag(tag, file=str(file))
-            break
+Image = lazy_import("PIL.Image")
 
+# MARK: Tags
 
-def remove_tag_by_re(pattern: Union[Pattern, str], file: Union[PathLike, str]) -> None:
-    if isinstance(pattern, str):
-        pattern = re_compile(pattern)
-    file = PurePath(file)
-    for tag in get_all_tags(file=str(file)):
-        results = re_search(pattern, tag.name)
-        if results:
-            remove_tag(tag, file=str(file))
+RED, GREEN = itemgetter("RED", "GREEN")(Color)
 
+TAG_CORRUPT = Tag(name="Corrupt", color=RED)
 
-def remove_tags_by_name(tag_names: list[str], file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_name(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=str(file)):
-        if tag.name in tag_names:
-            remove_tag(tag, file=str(file))
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(
+    tags=[TAG_CORRUPT, *ORIENTATION_TAGS.keys()],
+    patterns=[
+        (r"\d+x\d+", GREEN),  # e.g. `1920x1080`
+    ],
+)
 
+# MARK: Process One Path
 
-def remove_tags_by_name_re(tag_names: list[str], file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_re(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=str(file)):
-        for tag_name in tag_names:
-            if re_search(tag_name, tag.name):
-                remove_tag(tag, file=str(file))
+tag_writer = get_tag_writer()
 
 
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
-
+def process(arg: str) -> None:
     path = Path(arg.strip())
 
     # Skip if the path is not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.is_file():
-        print(f"🛑 {path.name} 👉 Not a file")
-        continue
+        note("🛑", path, "Not a file", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Skip if the path suffix is not a recognized image
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.suffix.lower() in IMAGE_SUFFIXES:
-        print(f"🛑 {path.name} 👉 Not an image")
-        continue
+        note("🛑", path, "Not an image", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # Remove any pre-existing tags (that look like they were set by this script)
+    # Read the existing tags (the ones that look like they were set by this script are
+    # replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tags_by_name(
-        [
-            TAG_CORRUPT.name,
-            *[mv_tag.name for mv_tag in ORIENTATION_TAGS.keys()],
-        ],
-        file=path,
-    )
-    remove_tag_by_re(r"\d+x\d+", file=path)
+    tags = TagSession(path, owned=OWNED_TAGS)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Try to get the dimensinos or tag+skip if the image is corrupt
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        with Image.open(path) as img:
-            img.verify()
-        # The image needs to be re-opened after the `verify` call
-        with Image.open(path) as img:
-            # Some corrupted image need to be manipulated to be detected
-            img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
-            # Get the image resolution
-            img_width, img_height = img.size
+        with span("validate", path, bytes=path.stat().st_size):
+            with Image.open(path) as img:
+                img.verify()
+            # The image needs to be re-opened after the `verify` call
+            with Image.open(path) as img:
+                # Some corrupted image need to be manipulated to be detected
+                img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+                # Get the image resolution
+                img_width, img_height = img.size
     except Exception as e:
-        print(f"🚫 {path.name} 👉 Corrupt")
-        print(e)
-        add_tag(TAG_CORRUPT, file=str(path))
-        continue
+        note("🚫", path, "Corrupt", error=e, outcome="corrupt")
+        tags.add(TAG_CORRUPT)
+        tag_writer.commit(tags)
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Add the appropriate tags
@@ -160,12 +90,31 @@ for arg in args:
     # Set the orientation tags
     for tag, test in ORIENTATION_TAGS.items():
         if test(img_ratio):
-            add_tag(tag, file=str(path))
-            print(f"〘{tag.name}〛👉 {path.name} ({img_ratio})")
+            tags.add(tag)
+            note("🏷️", path, f"{tag.name} ({img_ratio})")
             break
 
     # Set the resolution tag
     res_tag = Tag(name=f"{img_width}x{img_height}", color=GREEN)
-    add_tag(res_tag, file=str(path))
-    print(f"〘{res_tag.name}〛👉 {path.name}")
+    tags.add(res_tag)
+    note("🏷️", path, res_tag.name, outcome="valid")
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("image_tag_info", main)
@@ -7,28 +7,38 @@
 # - No `folder.jpg`
 # - No `series.json`
 #
+# With `SRSS_MYLAR_COVERS=1` (or `--covers`), a missing `cover.jpg` / `folder.jpg` is
+# made from the first page of the first issue (see `srss.covers`), instead of only
+# being tagged.
+#
 # ## External Dependencies
 #   * https://pypi.org/project/macos-tags/
+#   * https://pypi.org/project/pillow/ (`--covers` only)
+#   * https://pypi.org/project/rarfile/ (`--covers` only, for CBRs)
 # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike, scandir
+from os import environ, scandir
 from os.path import join as path_join
-from pathlib import Path, PurePath
+from pathlib import Path
 from re import search as re_search
-from sys import argv
-from typing import Union
 
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
+from srss.atomic import sweep_once
+from srss.client import run_script
+from srss.covers import get_first_issue, write_covers
+from srss.media import COMIC_SUFFIXES
+from srss.tags import Color, Tag, TagRules, TagSession
+from srss.trace import note, span
+from srss.writer import get_tag_writer
 
 # MARK: Constants
 
-COMIC_FILE_SUFFIXES = [".cbz", ".cbr"]
+OFF = ["", "0", "false", "no", "off"]
+
+# The files made from the first page of the first issue
+COVER_FILES = ["cover.jpg", "folder.jpg"]
 
 SERIES_TYPES = [
     "Digital",
@@ -57,12 +67,21 @@ TAG_HAS_COMICS = Tag(name="Has comics", color=BLUE)
 # Curiosities (no action required, but maybe take a look)
 TAG_HAS_SERIES_TYPE_MISMATCH = Tag(name="Has series type mismatch", color=YELLOW)
 
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(
+    tags=[
+        *MYLAR_METADATA_FILES_TAGS.keys(),
+        TAG_HAS_COMICS,
+        TAG_HAS_SERIES_TYPE_MISMATCH,
+    ]
+)
+
 # MARK: Functions
 
 
-# Extend `add_tag` to accept `PathLike` objects
-def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    add_tag_original(tag, file=str(file))
+# Read each time, since `--covers` sets it after the imports
+def is_covers() -> bool:
+    return environ.get("SRSS_MYLAR_COVERS", "").strip().lower() not in OFF
 
 
 def get_series_type(p: Path) -> str:
@@ -70,75 +89,89 @@ def get_series_type(p: Path) -> str:
     return m.group(1) if m else ""
 
 
-def get_all_tags(file: Union[PathLike, str]) -> list[Tag]:
-    return get_all_tags_original(file=str(file))
-
+# MARK: Process One Path
 
-def remove_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    remove_tag_original(tag, file=str(file))
+tag_writer = get_tag_writer()
 
 
-def remove_tag_by_name(tag_name: str, file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    for tag in get_all_tags(file=str(file)):
-        if tag.name == tag_name:
-            remove_tag(tag, file=str(file))
-            break
-
-
-def remove_tags_by_name(tag_names: list[str], file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_name(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=str(file)):
-        if tag.name in tag_names:
-            remove_tag(tag, file=str(file))
-
-
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
-
-    print(f"Checking {arg}")
-
+def process(arg: str) -> None:
     series_path = Path(arg)
+    note("🔎", series_path, "Checking")
 
     # Ensure a directory
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not series_path.is_dir():
-        print("Not a directory")
-        continue
+        note("🛑", series_path, "Not a directory", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # Remove existing tags
+    # Read the existing tags (the ones from this script are replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tags_by_name(
-        [
-            *[tag.name for tag in MYLAR_METADATA_FILES_TAGS.keys()],
-            TAG_HAS_COMICS.name,
-            TAG_HAS_SERIES_TYPE_MISMATCH.name,
-        ],
-        file=series_path,
-    )
-
+    tags = TagSession(series_path, owned=OWNED_TAGS)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Check for the presence of various files and series type mismatches
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     series_type = get_series_type(series_path)
-    with scandir(series_path) as it:
+    comics = []
+    found = set()
+    with span("probe", series_path), scandir(series_path) as it:
         for entry in it:
             P_entry = Path(path_join(series_path, entry.name))
             if not P_entry.is_file():
                 continue
             for tag, filename in MYLAR_METADATA_FILES_TAGS.items():
                 if P_entry.name.lower() == filename:
-                    add_tag(tag, file=str(series_path))
+                    found.add(filename)
+                    tags.add(tag)
                     break
-            if P_entry.suffix.lower() in COMIC_FILE_SUFFIXES:
-                if not TAG_HAS_COMICS in get_all_tags(str(series_path)):
-                    add_tag(TAG_HAS_COMICS, file=str(series_path))
+            if P_entry.suffix.lower() in COMIC_SUFFIXES:
+                comics.append(P_entry)
+                tags.add(TAG_HAS_COMICS)
                 if series_type != get_series_type(P_entry):
-                    add_tag(TAG_HAS_SERIES_TYPE_MISMATCH, file=str(series_path))
+                    tags.add(TAG_HAS_SERIES_TYPE_MISMATCH)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Make the missing covers from the first issue (if asked to)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    missing = {
+        filename: tag
+        for tag, filename in MYLAR_METADATA_FILES_TAGS.items()
+        if filename in COVER_FILES and filename not in found
+    }
+    first_issue = get_first_issue(comics)
+    if is_covers() and missing and first_issue is not None:
+        # What an interrupted run left (see `srss.atomic`)
+        sweep_once(series_path)
+        try:
+            with span("convert", first_issue):
+                write_covers(first_issue, [series_path / name for name in missing])
+            made = f"Made {', '.join(missing)} ({Path(first_issue).name})"
+            note("🖼️", series_path, made, outcome="covered")
+        except Exception as e:
+            note("🛑", series_path, "Cover failed", error=e, outcome="cover_failed")
+        # Tagged by what's there now (e.g. `cover.jpg` was made, then `folder.jpg`
+        # failed)
+        for filename, tag in missing.items():
+            if (series_path / filename).is_file():
+                tags.add(tag)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("mylar_tag_series_folder", main)
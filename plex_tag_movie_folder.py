@@ -20,15 +20,13 @@
 
 from glob import glob
 from operator import itemgetter
-from os import PathLike
-from pathlib import Path, PurePath
-from sys import argv
-from typing import Union
+from pathlib import Path
 
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
+from srss.client import run_script
+from srss.media import MOVIE_SUFFIXES
+from srss.tags import Color, Tag, TagRules, TagSession
+from srss.trace import count, note, span
+from srss.writer import get_tag_writer
 
 # MARK: Constants
 
@@ -43,23 +41,6 @@ IGNORE_FILES = [
 # TODO: Find if ther is an official list of image suffixes for Plex
 # IMAGE_SUFFIXES = [".jpg", ".jpeg", ".png", ".tiff", ".webp"]
 
-# TODO: Find if there is an official list of movie suffixes for Plex
-MOVIE_SUFFIXES = [
-    ".avi",
-    ".divx",
-    ".flv",
-    ".m4v",
-    ".mkv",
-    ".mov",
-    ".mp4",
-    ".mpg",
-    ".mpeg",
-    ".ts",
-    ".vob",
-    ".webm",
-]
-
-
 # MARK: Tags
 
 BLUE, RED = itemgetter("BLUE", "RED")(Color)
@@ -106,51 +87,23 @@ HAS_EXTRAS_TAGS = {
     ],
 }
 
-
-# MARK: Functions
-
-
-# `macos_tags` Extensions adding `PathLike` Support
-# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-# Extend `macos_tags.add` to accept a `PathLike` object
-def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    add_tag_original(tag, file=str(file))
-
-
-# Extend `macos_tags.get_all_tags` to accept a `PathLike` object
-def get_all_tags(file: Union[PathLike, str]) -> list[Tag]:
-    return get_all_tags_original(file=str(file))
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(
+    tags=[
+        *HAS_EXTRAS_TAGS.keys(),
+        TAG_HAS_NO_MOVIES,
+        TAG_HAS_MULTIPLE_MOVIES,
+    ]
+)
 
 
-# Extend `macos_tags.remove` to accept a `PathLike` object
-def remove_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    remove_tag_original(file=str(file), tag=tag)
-
+# MARK: Functions
 
-# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
 # def has_movie_suffix(path: Path) -> bool:
 #     return path.suffix.lower() in MOVIE_SUFFIXES
 
 
-def remove_tag_by_name(tag_name: str, file: PathLike) -> None:
-    file = PurePath(file)
-    for tag in get_all_tags(file=file):
-        if tag.name == tag_name:
-            remove_tag(tag, file=file)
-            break
-
-
-def remove_tags_by_name(tag_names: list[str], file: PathLike) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_name(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=file):
-        if tag.name in tag_names:
-            remove_tag(tag, file=file)
-
-
 # TODO: Figure out if this is even true
 # i.e. Can an extra with a suffix be in any subdirectory of the movie folder?
 # i.e. Can an extra in an extras subdirectory be at any depth?
@@ -171,31 +124,27 @@ def is_extra(path: Path, sub_path: Path, suffix: str, parent_dir_name: str) -> b
 #     return path.stem.lower() == "poster"
 
 
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
+# MARK: Process One Path
+
+tag_writer = get_tag_writer()
+
 
+def process(arg: str) -> None:
     P_movie_dir = Path(arg)
 
     # Ensure a directory
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not P_movie_dir.is_dir():
-        print(f"🛑 {P_movie_dir.name} 👉 Not a directory")
-        continue
+        note("🛑", P_movie_dir, "Not a directory", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # print(glob(str(P_movie_dir / "**/*"), recursive=True))
     # exit()
 
-    # 🏷️ Remove existing tags
+    # 🏷️ Read the existing tags (this script's tags are replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    for tag in get_all_tags(file=P_movie_dir):
-        if tag in [
-            *HAS_EXTRAS_TAGS.keys(),
-            TAG_HAS_NO_MOVIES,
-            TAG_HAS_MULTIPLE_MOVIES,
-        ]:
-            remove_tag(tag, file=P_movie_dir)
+    tags = TagSession(P_movie_dir, owned=OWNED_TAGS)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # 📁 Loop through the directory and determine the appropriate tags
@@ -205,33 +154,55 @@ for arg in args:
     cnt_movies = 0
     cnt_extras = 0
 
-    for sub_path in glob(str(P_movie_dir / "**/*"), recursive=True):
-        print(f"🔎 Checking 👉 {sub_path}")
-        P_sub = Path(sub_path)
-        # Skip anything not a file
-        if not P_sub.is_file():
-            print(f"🛑 {P_sub.name} 👉 Not a file")
-            continue
-        # Skip files that should be ignored (copy+paste from global `.gitignore`)
-        if P_sub.name in IGNORE_FILES:
-            print(f"🛑 {P_sub.name} 👉 Ignored")
-            continue
-        # Skip if it's not a movie
-        if not P_sub.suffix.lower() in MOVIE_SUFFIXES:
-            continue
-        else:
-            cnt_movies += 1
-        for tag, [stem_suffix, parent_dir_name] in HAS_EXTRAS_TAGS.items():
-            if is_extra(P_movie_dir, P_sub, stem_suffix, parent_dir_name):
-                cnt_extras += 1
-                add_tag(tag, file=P_movie_dir)
-                print(f"〘{tag.name}〛👉 {P_movie_dir.name}")
+    with span("probe", P_movie_dir):
+        for sub_path in glob(str(P_movie_dir / "**/*"), recursive=True):
+            note("🔎", "Checking", sub_path)
+            P_sub = Path(sub_path)
+            # Skip anything not a file
+            if not P_sub.is_file():
+                note("🛑", P_sub, "Not a file")
+                continue
+            # Skip files that should be ignored (copy+paste from global `.gitignore`)
+            if P_sub.name in IGNORE_FILES:
+                note("🛑", P_sub, "Ignored")
                 continue
+            # Skip if it's not a movie
+            if not P_sub.suffix.lower() in MOVIE_SUFFIXES:
+                continue
+            else:
+                cnt_movies += 1
+            for tag, [stem_suffix, parent_dir_name] in HAS_EXTRAS_TAGS.items():
+                if is_extra(P_movie_dir, P_sub, stem_suffix, parent_dir_name):
+                    cnt_extras += 1
+                    tags.add(tag)
+                    note("🏷️", P_movie_dir, tag.name)
+                    continue
 
     cnt_movies_not_extras = cnt_movies - cnt_extras
 
     if 0 == cnt_movies_not_extras:
-        add_tag(TAG_HAS_NO_MOVIES, file=P_movie_dir)
+        tags.add(TAG_HAS_NO_MOVIES)
+        count("no_movies", P_movie_dir)
     elif 1 < cnt_movies_not_extras:
-        add_tag(TAG_HAS_MULTIPLE_MOVIES, file=P_movie_dir)
+        tags.add(TAG_HAS_MULTIPLE_MOVIES)
+        count("multiple_movies", P_movie_dir)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # 🏷️ Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("plex_tag_movie_folder", main)
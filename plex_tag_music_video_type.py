@@ -19,33 +19,15 @@
 
 # MARK: Imports
 
-from ast import Str
 from operator import itemgetter
 from os import PathLike
 from pathlib import Path, PurePath
-from sys import argv
-
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag
-from macos_tags import get_all as get_all_tags
-from macos_tags import remove as remove_tag
-
-# Probably a list of these out there somewhere
-MV_FILE_SUFFIXES = [
-    ".avi",
-    ".divx",
-    ".flv",
-    ".m4v",
-    ".mkv",
-    ".mov",
-    ".mp4",
-    ".mpg",
-    ".mpeg",
-    ".ts",
-    ".vob",
-    ".webm",
-]
 
+from srss.client import run_script
+from srss.media import MOVIE_SUFFIXES
+from srss.tags import Color, Tag, TagRules, TagSession
+from srss.trace import count, note
+from srss.writer import get_tag_writer
 
 # MARK: Tags
 
@@ -77,6 +59,9 @@ MV_TAGS = {
     Tag(name="Video", color=PURPLE): "-video",
 }
 
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(tags=MV_TAGS.keys())
+
 # MARK: Functions
 
 
@@ -88,53 +73,57 @@ def get_stem_suffix(file: PathLike) -> str:
     return "-" + partitoned_stem[2]
 
 
-def remove_tag_by_name(tag_name: str, file: PathLike) -> None:
-    file = PurePath(file)
-    for tag in get_all_tags(file=str(file)):
-        if tag.name == tag_name:
-            remove_tag(tag, file=str(file))
-            break
-
+# MARK: Process One Path
 
-def remove_tags_by_name(tag_names: list[str], file: PathLike) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_name(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=str(file)):
-        if tag.name in tag_names:
-            remove_tag(tag, file=str(file))
+tag_writer = get_tag_writer()
 
 
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
-
+def process(arg: str) -> None:
     path = Path(arg)
 
     # Skip if not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.is_file():
-        print(f"🛑 {path.name} 👉 Not a file")
-        continue
+        note("🛑", path, "Not a file", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Skip if not a movie
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    if not path.suffix.lower() in MV_FILE_SUFFIXES:
-        print(f"🛑 {path.name} 👉 Unrecognized suffix ({path.suffix})")
-        continue
+    if not path.suffix.lower() in MOVIE_SUFFIXES:
+        note("🛑", path, f"Unrecognized suffix ({path.suffix})", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # Remove existing tags from the tags defined in this script
+    # Read the existing tags (the ones defined in this script are replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tags_by_name([mv_tag.name for mv_tag in MV_TAGS.keys()], file=path)
+    tags = TagSession(path, owned=OWNED_TAGS)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Add the applicable tags. Each is exclusive (one-per-file)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     for tag, tag_stem_suffix in MV_TAGS.items():
         if get_stem_suffix(path) == tag_stem_suffix:
-            add_tag(tag, file=str(path))
+            tags.add(tag)
+            count(tag_stem_suffix.lstrip("-"), path)
             break  # Because only one tag per file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("plex_tag_music_video_type", main)
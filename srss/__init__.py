@@ -0,0 +1,6 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Shared Code for the Shortcuts Run Shell Scripts
+#
+# The scripts in the root of the repository import from here, so run them from a
+# checkout of the repository (i.e. `python3 /path/to/srss/comic_process.py`)
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
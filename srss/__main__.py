@@ -0,0 +1,6 @@
+# SRSS: `python3 -m srss` (see `srss.cli`)
+
+from srss.cli import main
+
+if __name__ == "__main__":
+    main()
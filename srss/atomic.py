@@ -0,0 +1,242 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Atomic
+#
+# Puts new files (CBZs, covers) in place all at once, so an interrupted run (killed,
+# crashed, unplugged) never leaves a half-written one where the finished one goes:
+#   * The file is written to a temporary file next to it (hidden, and on the same
+#     volume, so the rename doesn't copy anything), e.g.
+#     `.Comic.cbz.1a2b3c4d.srss-tmp`
+#   * It's fsynced (see below), then given its name with a hard link, which fails if
+#     the name is taken, so an existing file is never overwritten (`FileExistsError`)
+#   * Whatever goes wrong before that, the temporary file is removed
+#   * The temporary files a killed run couldn't remove are swept away on the next run
+#     (`sweep`), once they're old enough not to belong to a run still going; so are
+#     the journals of interrupted appends (`srss.comicinfo`), which first put their
+#     CBZs back the way they were
+#
+# Usage:
+#   python3 -m srss.atomic FOLDER ...
+#
+# Notes:
+#   * `SRSS_DURABILITY` sets how much is fsynced before the rename:
+#       * `none` 👉 Nothing (the file system's own ordering; fastest)
+#       * `file` 👉 The new file (default), so a crash leaves the finished file or none
+#       * `full` 👉 The new file (with `F_FULLFSYNC` on macOS, to the platters rather
+#         than the drive's cache) and then its folder, so the new name survives too
+#   * `SRSS_ORPHAN_MINUTES` sets how old a temporary file has to be to be swept
+#     (default: 60); `python3 -m srss -r` sweeps the folders it descends into, and the
+#     scripts writing archives sweep the folder they write to first.
+#   * On a volume without hard links (e.g. exFAT, some SMB shares), the name is
+#     checked and then renamed to, which only races with another writer of the same
+#     name.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import os
+from contextlib import contextmanager
+from os import PathLike, environ, fspath, fsync, scandir, unlink, walk
+from os.path import basename, dirname, join, lexists
+from secrets import token_hex
+from threading import Lock
+from time import time
+from typing import BinaryIO, Iterable, Iterator, Literal, Optional, Union
+
+__all__ = [
+    "JOURNAL_SUFFIX",
+    "TEMP_SUFFIX",
+    "atomic_path",
+    "commit",
+    "get_durability",
+    "get_temp_path",
+    "is_temp",
+    "sweep",
+    "sweep_once",
+    "sync_folder",
+]
+
+# MARK: Constants
+
+TEMP_SUFFIX = ".srss-tmp"
+
+# e.g. `.Comic.cbz.journal` (see `srss.comicinfo`)
+JOURNAL_SUFFIX = ".journal"
+
+Durability = Literal["none", "file", "full"]
+
+DURABILITIES = ("none", "file", "full")
+
+DEFAULT_DURABILITY = "file"
+
+ORPHAN_AGE = float(environ.get("SRSS_ORPHAN_MINUTES", "60")) * 60
+
+# MARK: Functions
+
+
+def get_durability() -> Durability:
+    name = environ.get("SRSS_DURABILITY", "").strip().lower() or DEFAULT_DURABILITY
+    if name not in DURABILITIES:
+        raise ValueError(f"Unknown durability: {name}")
+    return name
+
+
+# e.g. `Comic.cbz` 👉 `.Comic.cbz.1a2b3c4d.srss-tmp`
+def get_temp_path(dst: Union[PathLike, str]) -> str:
+    dst = fspath(dst)
+    return join(dirname(dst), f".{basename(dst)}.{token_hex(4)}{TEMP_SUFFIX}")
+
+
+def is_temp(name: str) -> bool:
+    return name.startswith(".") and name.endswith(TEMP_SUFFIX)
+
+
+def is_journal(name: str) -> bool:
+    return name.startswith(".") and name.endswith(JOURNAL_SUFFIX)
+
+
+def sync_folder(path: str) -> None:
+    # So the new (or removed) name survives a crash too
+    fd = os.open(dirname(path) or ".", os.O_RDONLY)
+    try:
+        fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_file(file: BinaryIO, durability: Durability) -> None:
+    file.flush()
+    if "full" == durability and hasattr(os, "F_FULLFSYNC"):
+        from fcntl import fcntl
+
+        # (macOS' `fsync` stops at the drive's cache)
+        fcntl(file.fileno(), os.F_FULLFSYNC)
+    else:
+        fsync(file.fileno())
+
+
+# Give the finished temporary file `tmp` the name `dst` (never over an existing file)
+def commit(tmp: Union[PathLike, str], dst: Union[PathLike, str]) -> None:
+    tmp, dst = fspath(tmp), fspath(dst)
+    durability = get_durability()
+    if "none" != durability:
+        with open(tmp, "rb") as file:
+            sync_file(file, durability)
+    try:
+        os.link(tmp, dst)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hard links on this volume
+        if lexists(dst):
+            raise FileExistsError(f"File exists: {dst!r}") from None
+        os.rename(tmp, dst)
+    else:
+        unlink(tmp)
+    if "full" == durability:
+        sync_folder(dst)
+
+
+# Write `dst` by writing the yielded temporary path, which is then committed (or
+# removed, if anything goes wrong)
+@contextmanager
+def atomic_path(dst: Union[PathLike, str]) -> Iterator[str]:
+    dst = fspath(dst)
+    # Fail before anything is written
+    if lexists(dst):
+        raise FileExistsError(f"File exists: {dst!r}")
+    tmp = get_temp_path(dst)
+    try:
+        yield tmp
+        commit(tmp, dst)
+    except BaseException:
+        if lexists(tmp):
+            unlink(tmp)
+        raise
+
+
+# Remove the temporary files in `folder` left by runs that were killed, and replay
+# (then remove) the journals (only the ones older than `ORPHAN_AGE`); `names` saves
+# listing the folder when they're known (returns the paths swept)
+def sweep(
+    folder: Union[PathLike, str],
+    names: Optional[Iterable[str]] = None,
+    age: float = ORPHAN_AGE,
+) -> list[str]:
+    folder = fspath(folder)
+    if names is None:
+        try:
+            with scandir(folder) as entries:
+                names = [entry.name for entry in entries]
+        except OSError:
+            return []
+    removed = []
+    cutoff = time() - age
+    for name in names:
+        temp, journal = is_temp(name), is_journal(name)
+        if not temp and not journal:
+            continue
+        path = join(folder, name)
+        try:
+            if cutoff <= os.lstat(path).st_mtime:
+                continue
+            if temp:
+                unlink(path)
+            else:
+                # (Imported only when there's one, since it imports this)
+                from srss.comicinfo import recover
+
+                # e.g. `.Comic.cbz.journal` 👉 `Comic.cbz`
+                comic = join(folder, name[1 : -len(JOURNAL_SUFFIX)])
+                if lexists(comic):
+                    recover(comic)
+                else:
+                    unlink(path)
+            removed.append(path)
+        except OSError:
+            # Gone in the meantime, or not ours to remove (the next run tries again)
+            pass
+    return removed
+
+
+_swept: set[str] = set()
+_swept_lock = Lock()
+
+
+# `sweep`, the first time a folder is written to by this process (e.g. before each
+# comic of a folder, but only sweeping it once)
+def sweep_once(folder: Union[PathLike, str]) -> list[str]:
+    folder = fspath(folder)
+    with _swept_lock:
+        if folder in _swept:
+            return []
+        _swept.add(folder)
+    return sweep(folder)
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.atomic",
+        description="Remove the temporary files left by interrupted runs",
+    )
+    parser.add_argument("folders", nargs="+", metavar="FOLDER")
+    parser.add_argument(
+        "--age",
+        type=float,
+        default=ORPHAN_AGE / 60,
+        metavar="MINUTES",
+        help=f"Only older ones (default: {ORPHAN_AGE / 60:g})",
+    )
+    ns = parser.parse_args(args)
+    for folder in ns.folders:
+        for parent, _, files in walk(folder):
+            for path in sweep(parent, files, ns.age * 60):
+                print(f"🧹 {path} 👉 Swept")
+
+
+if __name__ == "__main__":
+    main()
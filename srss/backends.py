@@ -0,0 +1,237 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Tag Storage Backends
+#
+# Where the tags are actually read from and written to
+#   * `macos` 👉 `macos_tags` (only works on macOS)
+#   * `xattr` 👉 `os.getxattr` / `os.setxattr` with the same plist as Finder, for
+#     running next to the disks on Linux (where only `user.*` xattrs are allowed and
+#     which is the only platform Python has `os.getxattr` on)
+#   * `memory` 👉 A dictionary, for benchmarks
+#
+# The backend is picked with the `SRSS_TAG_BACKEND` environment variable, defaulting
+# to `macos` on macOS and `xattr` everywhere else.
+#
+# Notes:
+#   * `macos_tags` raises a `RuntimeError` when imported off of macOS (and pulls in
+#     `mdfind`, `xattr` and `cffi` when it is), so its (tiny) `Color` / `Tag` data
+#     model is mirrored here and `macos_tags` is only imported by its backend.
+#   * Samba (`vfs_fruit` + `vfs_streams_xattr`) stores the xattrs of macOS clients
+#     under a different name, so the xattr name can be changed with `SRSS_TAG_XATTR`
+#     (e.g. `user.DosStream.com.apple.metadata:_kMDItemUserTags:$DATA`).
+#
+# External Dependencies
+#   * https://pypi.org/project/macos-tags/ (macOS only)
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import errno
+import os
+from enum import Enum, unique
+from os import PathLike, environ, fspath
+from sys import platform
+from typing import Iterable, Optional, Union
+
+__all__ = [
+    "Color",
+    "MacOSTagsBackend",
+    "MemoryTagBackend",
+    "Tag",
+    "TagBackend",
+    "XattrTagBackend",
+    "get_backend",
+    "set_backend",
+]
+
+# MARK: Constants
+
+XATTR_TAGS = environ.get("SRSS_TAG_XATTR", "user.com.apple.metadata:_kMDItemUserTags")
+
+# There is no `ENOATTR` on Linux; it's `ENODATA` there
+XATTR_MISSING = {getattr(errno, "ENOATTR", errno.ENODATA), errno.ENODATA}
+
+# MARK: Tags
+
+
+# Mirror of `macos_tags.Color`
+@unique
+class Color(Enum):
+    NONE = 0
+    GRAY = 1
+    GREEN = 2
+    PURPLE = 3
+    BLUE = 4
+    YELLOW = 5
+    RED = 6
+    ORANGE = 7
+
+    def __str__(self) -> str:
+        return str(self.value)
+
+
+# Mirror of `macos_tags.Tag` (immutable, and equality ignores the color)
+#
+# Written out instead of a `@dataclass(frozen=True)`, since importing `dataclasses`
+# (and, with it, `inspect`) is a good part of the startup time of every script
+class Tag:
+    __slots__ = ("name", "color")
+
+    name: str
+    color: Color
+
+    def __init__(self, name: str, color: Color = Color.NONE) -> None:
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "color", color)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"cannot assign to field '{name}'")
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.name == other.name
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    # So it can be pickled (and copied) despite `__setattr__`
+    def __reduce__(self) -> tuple:
+        return (self.__class__, (self.name, self.color))
+
+    def __repr__(self) -> str:
+        return f"Tag(name={self.name!r}, color={self.color!r})"
+
+    def __str__(self) -> str:
+        return f"{self.name}\n{self.color}"
+
+    @classmethod
+    def from_string(cls, tag: str) -> "Tag":
+        if "\n" in tag:
+            name, color = tag.splitlines()
+            return cls(name, Color(int(color)))
+        else:
+            return cls(tag, Color.NONE)
+
+
+# MARK: Functions
+
+
+# Like ["tag-one\n4", "tag-two\n6", "tag-three"]
+def decode_tags(plist: bytes) -> list[Tag]:
+    import plistlib  # Only when there are tags to read
+
+    return [Tag.from_string(tag) for tag in plistlib.loads(plist)]
+
+
+# Finder writes a binary plist, so do the same
+def encode_tags(tags: Iterable[Tag]) -> bytes:
+    import plistlib
+
+    return plistlib.dumps([str(tag) for tag in tags], fmt=plistlib.FMT_BINARY)
+
+
+# MARK: Classes
+
+
+class TagBackend:
+    name = ""
+
+    def get_all(self, file: Union[PathLike, str]) -> list[Tag]:
+        raise NotImplementedError
+
+    def set_all(self, tags: Iterable[Tag], file: Union[PathLike, str]) -> None:
+        raise NotImplementedError
+
+
+class MacOSTagsBackend(TagBackend):
+    name = "macos"
+
+    def __init__(self) -> None:
+        # Imported here so the other backends work without it
+        from macos_tags import get_all, set_all
+
+        self._get_all = get_all
+        self._set_all = set_all
+
+    # Converted through `str` (which `macos_tags` parses) to the mirrored `Tag`
+    def get_all(self, file: Union[PathLike, str]) -> list[Tag]:
+        return [Tag.from_string(str(tag)) for tag in self._get_all(file=fspath(file))]
+
+    def set_all(self, tags: Iterable[Tag], file: Union[PathLike, str]) -> None:
+        self._set_all([str(tag) for tag in tags], file=fspath(file))
+
+
+class XattrTagBackend(TagBackend):
+    name = "xattr"
+
+    def __init__(self, attribute: str = XATTR_TAGS) -> None:
+        self.attribute = attribute
+
+    def get_all(self, file: Union[PathLike, str]) -> list[Tag]:
+        try:
+            plist = os.getxattr(file, self.attribute)
+        except OSError as e:
+            # No tags (yet)
+            if e.errno in XATTR_MISSING:
+                return []
+            raise
+        # Samba's `vfs_streams_xattr` pads its streams with a NUL
+        if "DosStream" in self.attribute and plist.endswith(b"\0"):
+            plist = plist[:-1]
+        return decode_tags(plist)
+
+    def set_all(self, tags: Iterable[Tag], file: Union[PathLike, str]) -> None:
+        plist = encode_tags(tags)
+        if "DosStream" in self.attribute:
+            plist += b"\0"
+        os.setxattr(file, self.attribute, plist)
+
+
+# Keeps the tags (encoded, like the xattr) in a dictionary keyed by path
+class MemoryTagBackend(TagBackend):
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+        self.reads = 0
+        self.writes = 0
+
+    def get_all(self, file: Union[PathLike, str]) -> list[Tag]:
+        self.reads += 1
+        plist = self.files.get(fspath(file))
+        return decode_tags(plist) if plist else []
+
+    def set_all(self, tags: Iterable[Tag], file: Union[PathLike, str]) -> None:
+        self.writes += 1
+        self.files[fspath(file)] = encode_tags(tags)
+
+
+BACKENDS = {
+    MacOSTagsBackend.name: MacOSTagsBackend,
+    XattrTagBackend.name: XattrTagBackend,
+    MemoryTagBackend.name: MemoryTagBackend,
+}
+
+_backend: Optional[TagBackend] = None
+
+
+# The backend from `SRSS_TAG_BACKEND` (or the default for the platform)
+def get_backend() -> TagBackend:
+    global _backend
+    if _backend is None:
+        default = XattrTagBackend.name
+        if "darwin" == platform:
+            default = MacOSTagsBackend.name
+        name = environ.get("SRSS_TAG_BACKEND", default).strip().lower()
+        if name not in BACKENDS:
+            names = ", ".join(BACKENDS)
+            raise ValueError(f"Unknown tag backend: {name} (try: {names})")
+        _backend = BACKENDS[name]()
+    return _backend
+
+
+# Override the backend (e.g. with a `MemoryTagBackend` for a benchmark)
+def set_backend(backend: Union[TagBackend, str]) -> TagBackend:
+    global _backend
+    _backend = BACKENDS[backend]() if isinstance(backend, str) else backend
+    return _backend
@@ -0,0 +1,264 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Batch
+#
+# Turns a (possibly huge) selection of images into one CBZ per folder, the way
+# `cbz_create_from_images` does, without a `resolve` / `is_file` / `samefile` per path:
+#   * Every path is folded (NFC, then casefolded, so `Page.JPG`, `page.jpg` and a
+#     decomposed `é` from macOS are one and the same) and indexed by its folder, so
+#     the same file given twice collapses in one pass
+#   * Each folder is listed once (`scandir`), which says which names are files and
+#     gives each page its name as it actually is on disk
+#   * Everything that would collide is found before anything is written: a CBZ that
+#     already exists, two files whose names only differ in case (on a case-sensitive
+#     volume) when neither is named exactly as given, and two folders that only
+#     differ in case
+#   * The pages are in natural order (see `srss.cbz`), and the CBZs are written on a
+#     pool of threads, several folders at once
+#
+# Usage:
+#   python3 -m srss.batch FILE ...
+#
+# Notes:
+#   * `SRSS_BATCH_WORKERS` sets how many CBZs are written at once (default: up to 4;
+#     each of them also deflates on the pool of `srss.cbz`).
+#   * The CBZ of a folder is `Folder/Folder.cbz`.
+#   * The paths aren't resolved, so a folder reached through a symlink as well as
+#     directly counts as two folders.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from collections import deque
+from os import DirEntry, PathLike, cpu_count, environ, fspath, scandir, stat
+from os.path import abspath, basename, join, split
+from threading import Lock
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Optional, Union
+from unicodedata import normalize
+
+from srss.cbz import Member, natural_key, write_cbz
+from srss.trace import span
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+__all__ = [
+    "BATCH_WORKERS",
+    "Collision",
+    "Group",
+    "Plan",
+    "fold",
+    "plan_batch",
+    "write_batch",
+]
+
+# MARK: Constants
+
+BATCH_WORKERS = int(environ.get("SRSS_BATCH_WORKERS", str(min(4, cpu_count() or 4))))
+
+# MARK: Classes
+
+
+# The pages of one folder, and the CBZ they go into
+class Group(NamedTuple):
+    folder: str
+    dst: str
+    pages: list[Member]
+    # Bytes (of all of the pages)
+    size: int
+
+
+class Collision(NamedTuple):
+    # What to tag (the existing CBZ, or the paths given)
+    path: str
+    reason: str
+
+
+class Plan(NamedTuple):
+    groups: list[Group]
+    collisions: list[Collision]
+    # Given more than once (only the first one counts)
+    duplicates: list[str]
+    # Not (or no longer) files
+    missing: list[str]
+
+
+# MARK: Functions
+
+
+# e.g. `Page.JPG` 👉 `page.jpg` (the same for the composed and decomposed `é`)
+def fold(name: str) -> str:
+    return normalize("NFC", normalize("NFC", name).casefold())
+
+
+# The entries of a folder, by their folded names
+def list_folder(folder: str) -> Optional[dict[str, list[DirEntry]]]:
+    listing: dict[str, list[DirEntry]] = {}
+    try:
+        with scandir(folder) as entries:
+            for entry in entries:
+                listing.setdefault(fold(entry.name), []).append(entry)
+    except OSError:
+        return None
+    return listing
+
+
+# Whether the spellings of a folder (e.g. `Saga` and `saga`) are the same folder
+def is_one_folder(spellings: Iterable[str]) -> bool:
+    found = set()
+    for spelling in spellings:
+        try:
+            st = stat(spelling)
+        except OSError:
+            continue
+        found.add((st.st_dev, st.st_ino))
+    return len(found) <= 1
+
+
+# Group `files` by folder, in natural order, with everything that would collide
+def plan_batch(files: Iterable[Union[PathLike, str]]) -> Plan:
+    # folded folder 👉 (its spellings, folded name 👉 the path given)
+    index: dict[str, tuple[dict[str, None], dict[str, str]]] = {}
+    duplicates = []
+    for file in files:
+        path = abspath(fspath(file))
+        folder, name = split(path)
+        spellings, wanted = index.setdefault(fold(folder), ({}, {}))
+        spellings[folder] = None
+        key = fold(name)
+        if key in wanted:
+            duplicates.append(path)
+        else:
+            wanted[key] = path
+
+    groups, collisions, missing = [], [], []
+    for spellings, wanted in index.values():
+        # (Only stat-ed when given in more than one spelling)
+        if 1 < len(spellings) and not is_one_folder(spellings):
+            reason = f"Folders differing only in case ({', '.join(spellings)})"
+            collisions.extend(Collision(path, reason) for path in wanted.values())
+            continue
+        folder = next(iter(spellings))
+        listing = list_folder(folder)
+        if listing is None:
+            missing.extend(wanted.values())
+            continue
+        dst = join(folder, f"{basename(folder)}.cbz")
+        existing = listing.get(fold(basename(dst)))
+        if existing:
+            reason = f"Already exists ({existing[0].name})"
+            collisions.append(Collision(existing[0].path, reason))
+            continue
+        pages, clashes = [], []
+        for key, path in wanted.items():
+            entries = [entry for entry in listing.get(key, []) if entry.is_file()]
+            # The one named exactly as given, if there's one (e.g. `a.jpg` next to an
+            # `A.jpg` that wasn't selected)
+            exact = [entry for entry in entries if basename(path) == entry.name]
+            if exact:
+                pages.append(exact[0])
+            elif not entries:
+                missing.append(path)
+            elif 1 < len(entries):
+                names = ", ".join(entry.name for entry in entries)
+                clashes.extend(
+                    Collision(entry.path, f"Names differing only in case ({names})")
+                    for entry in entries
+                )
+            else:
+                pages.append(entries[0])
+        if clashes:
+            # Which one was meant can't be told, so none of the folder is written
+            collisions.extend(clashes)
+            continue
+        if not pages:
+            continue
+        pages.sort(key=lambda entry: natural_key(entry.name))
+        size = sum(entry.stat().st_size for entry in pages)
+        members = [(entry.name, entry.path) for entry in pages]
+        groups.append(Group(folder, dst, members, size))
+
+    groups.sort(key=lambda group: natural_key(group.folder))
+    return Plan(groups, collisions, duplicates, missing)
+
+
+_pool: Optional["ThreadPoolExecutor"] = None
+_pool_lock = Lock()
+
+
+def get_pool() -> "ThreadPoolExecutor":
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, BATCH_WORKERS), thread_name_prefix="srss-batch"
+            )
+        return _pool
+
+
+def write_group(group: Group) -> None:
+    with span("convert", group.dst, bytes=group.size):
+        write_cbz(group.dst, group.pages)
+
+
+def finish(group: Group, future: "Future") -> tuple[Group, Optional[Exception]]:
+    try:
+        future.result()
+    except Exception as e:
+        return group, e
+    return group, None
+
+
+# Write the CBZ of each group, several at once; yields each group (in order) with
+# what went wrong writing it, if anything, so the output stays in the calling thread
+def write_batch(
+    groups: Iterable[Group], workers: int = BATCH_WORKERS
+) -> Iterator[tuple[Group, Optional[Exception]]]:
+    pending: deque[tuple[Group, "Future"]] = deque()
+    try:
+        for group in groups:
+            if 1 < workers:
+                pending.append((group, get_pool().submit(write_group, group)))
+                # Only a few ahead, so a huge batch isn't all queued at once
+                if 2 * workers <= len(pending):
+                    yield finish(*pending.popleft())
+            else:
+                try:
+                    write_group(group)
+                    yield group, None
+                except Exception as e:
+                    yield group, e
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        # e.g. the caller stopped early
+        for _, future in pending:
+            future.cancel()
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.batch",
+        description="Show the CBZs a selection of images would make (nothing written)",
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    ns = parser.parse_args(args)
+    plan = plan_batch(ns.files)
+    for collision in plan.collisions:
+        print(f"⚠️ {collision.path} 👉 Collision ({collision.reason})")
+    for path in plan.missing:
+        print(f"🛑 {path} 👉 Not a file")
+    for path in plan.duplicates:
+        print(f"⏭️ {path} 👉 Given more than once")
+    for group in plan.groups:
+        print(f"📦 {group.dst} 👉 {len(group.pages)} pages ({group.size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
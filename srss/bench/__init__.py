@@ -0,0 +1,3 @@
+# SRSS: Benchmarks
+#
+# Run from a checkout, e.g. `python3 -m srss.bench.startup`
@@ -0,0 +1,281 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Benchmark Corpus
+#
+# Builds a synthetic (but realistically shaped) library offline, the same bytes for the
+# same seed and scale, so benchmark runs can be compared between commits:
+#   * `images/` 👉 JPEG, PNG and WebP in portrait, landscape and square (+ corrupt)
+#   * `comics/` 👉 CBZs, "CBR"s that are really ZIPs (the usual mislabel) and
+#     truncated ones
+#   * `folders/` 👉 Folders of pages (for `cbz-from-folder`)
+#   * `loose/` 👉 Loose pages, grouped by folder (for `cbz-from-images`)
+#   * `videos/` 👉 Tiny MP4 / MKV test patterns rendered with the `ffmpeg` bundled in
+#     `imageio_ffmpeg` (+ truncated), with and without the resolution in the name
+#   * `plex/movies/` + `plex/music/` 👉 Plex-shaped trees (extras, empty folders, …)
+#   * `mylar/` 👉 Mylar-shaped series folders (`[TPB] Series (2001)`, `series.json`)
+#
+# Usage:
+#   python3 -m srss.bench.corpus [--seed 0] [--scale 1] [DIR]
+#
+# Notes:
+#   * A `manifest.json` (size + SHA-256 of every file) is written last; a corpus with
+#     the same seed, scale and version is reused as is.
+#   * The videos are skipped (with a warning) without `imageio_ffmpeg`. The Plex
+#     trees only need the names, so their "videos" are just a few bytes.
+#
+# External Dependencies
+#   * https://pypi.org/project/pillow/
+#   * https://pypi.org/project/imageio_ffmpeg/ (optional)
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import json
+from argparse import ArgumentParser
+from hashlib import sha256
+from io import BytesIO
+from os import PathLike, environ
+from pathlib import Path
+from random import Random
+from shutil import rmtree
+from subprocess import run
+from sys import platform
+from typing import Iterable, Optional, Union
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+__all__ = [
+    "build_corpus",
+    "get_default_corpus_path",
+]
+
+# MARK: Constants
+
+# Bump when the corpus changes, so old ones are rebuilt
+VERSION = 1
+
+# (width, height) for each orientation
+SIZES = [(320, 240), (240, 320), (256, 256), (640, 360), (360, 640), (400, 300)]
+
+PAGE_SIZE = (200, 300)
+
+# A fixed timestamp for everything in the archives
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+SERIES_TYPES = ["Digital", "GN", "HC", "One-Shot", "Series", "TPB"]
+
+MV_SUFFIXES = ["-behindthescenes", "-concert", "-interview", "-live", "-lyrics", ""]
+
+EXTRAS = ["Behind The Scenes", "Deleted Scenes", "Featurettes", "Trailers"]
+
+# MARK: Functions
+
+
+def get_default_corpus_path(seed: int = 0, scale: int = 1) -> Path:
+    if "darwin" == platform:
+        cache = Path.home() / "Library" / "Caches"
+    else:
+        cache = Path(environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return cache / "srss" / f"bench-corpus-{VERSION}-{seed}-{scale}"
+
+
+def write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+# Noise compresses about as badly as a scan does
+def render_image(rng: Random, size: tuple[int, int], fmt: str) -> bytes:
+    from PIL import Image
+
+    w, h = size
+    # Blocky noise (upscaled), so it's not all high frequency
+    small_size = (w // 8, h // 8)
+    small = Image.frombytes("RGB", small_size, rng.randbytes(w // 8 * h // 8 * 3))
+    img = small.resize(size, Image.Resampling.BILINEAR)
+    buffer = BytesIO()
+    options = {"JPEG": {"quality": 85}, "WEBP": {"quality": 80, "method": 0}}
+    img.save(buffer, fmt, **options.get(fmt, {}))
+    return buffer.getvalue()
+
+
+def render_cbz(rng: Random, pages: int) -> bytes:
+    buffer = BytesIO()
+    with ZipFile(buffer, "w") as zf:
+        for i in range(1, pages + 1):
+            info = ZipInfo(f"{i:03}.jpg", ZIP_DATE)
+            info.compress_type = ZIP_STORED
+            zf.writestr(info, render_image(rng, PAGE_SIZE, "JPEG"))
+        info = ZipInfo("ComicInfo.xml", ZIP_DATE)
+        info.compress_type = ZIP_DEFLATED
+        zf.writestr(info, f"<ComicInfo><PageCount>{pages}</PageCount></ComicInfo>")
+    return buffer.getvalue()
+
+
+def truncate(data: bytes) -> bytes:
+    return data[: len(data) * 3 // 5]
+
+
+def build_images(root: Path, rng: Random, cnt: int) -> None:
+    formats = [("JPEG", ".jpg"), ("PNG", ".png"), ("WEBP", ".webp")]
+    for i in range(cnt):
+        fmt, suffix = formats[i % len(formats)]
+        data = render_image(rng, SIZES[rng.randrange(len(SIZES))], fmt)
+        # Every 10th is broken: cut short, or not an image at all
+        if 7 == i % 10:
+            data = truncate(data)
+        elif 9 == i % 10:
+            data = rng.randbytes(len(data))
+        write(root / "images" / f"image-{i:04}{suffix}", data)
+
+
+def build_comics(root: Path, rng: Random, cnt: int) -> None:
+    for i in range(cnt):
+        data = render_cbz(rng, rng.randint(3, 8))
+        suffix = ".cbr" if 1 == i % 4 else ".cbz"
+        if 3 == i % 8:
+            data = truncate(data)
+        write(root / "comics" / f"Comic {i:03}{suffix}", data)
+
+
+def build_folders(root: Path, rng: Random, cnt: int) -> None:
+    for i in range(cnt):
+        for page in range(1, rng.randint(3, 8) + 1):
+            data = render_image(rng, PAGE_SIZE, "JPEG")
+            write(root / "folders" / f"Issue {i:03}" / f"{page:03}.jpg", data)
+        for page in range(1, rng.randint(3, 8) + 1):
+            data = render_image(rng, PAGE_SIZE, "JPEG")
+            write(root / "loose" / f"Set {i:03}" / f"page-{page:03}.jpg", data)
+
+
+def build_videos(root: Path, rng: Random, cnt: int) -> None:
+    try:
+        from imageio_ffmpeg import get_ffmpeg_exe
+    except ImportError:
+        print("⚠️ Corpus 👉 No imageio_ffmpeg, so no videos")
+        return
+    ffmpeg = get_ffmpeg_exe()
+    (root / "videos").mkdir(parents=True, exist_ok=True)
+    for i in range(cnt):
+        w, h = SIZES[rng.randrange(len(SIZES))]
+        # Even dimensions for yuv420p, half the size to keep it quick
+        w, h = w // 4 * 2, h // 4 * 2
+        suffix = ".mkv" if i % 2 else ".mp4"
+        # Some with the resolution in the name (some of them wrong)
+        name = f"Clip {i:03}"
+        if 1 == i % 3:
+            name += f" [{h}p]"
+        elif 2 == i % 3:
+            name += f" [{h + 2}p]"
+        path = root / "videos" / f"{name}{suffix}"
+        # fmt: off
+        command = [
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=size={w}x{h}:rate=10:duration={1 + i % 3}",
+            "-c:v", "mpeg4", "-q:v", "5", "-pix_fmt", "yuv420p",
+            "-fflags", "+bitexact", "-flags:v", "+bitexact", "-map_metadata", "-1",
+            str(path),
+        ]
+        # fmt: on
+        run(command, check=True)
+        if 4 == i % 5:
+            path.write_bytes(truncate(path.read_bytes()))
+
+
+def build_plex(root: Path, rng: Random, cnt: int) -> None:
+    placeholder = b"\0" * 64
+    for i in range(cnt):
+        title = f"Movie {i:03} ({1980 + i % 40})"
+        folder = root / "plex" / "movies" / title
+        folder.mkdir(parents=True, exist_ok=True)
+        # Mostly one movie, sometimes none or two
+        movies = [0, 1, 1, 1, 2][i % 5]
+        for n in range(movies):
+            part = f" - pt{n + 1}" if 1 < movies else ""
+            write(folder / f"{title}{part}.mkv", placeholder)
+        if 0 == i % 3:
+            write(folder / f"{title}-trailer.mp4", placeholder)
+        if 1 == i % 4:
+            extra = EXTRAS[rng.randrange(len(EXTRAS))]
+            write(folder / extra / "Extra.mkv", placeholder)
+        write(folder / "poster.jpg", placeholder)
+    for i in range(cnt * 2):
+        suffix = MV_SUFFIXES[i % len(MV_SUFFIXES)]
+        folder = root / "plex" / "music" / f"Artist {i % 7:02}"
+        write(folder / f"Song {i:03}{suffix}.mp4", placeholder)
+
+
+def build_mylar(root: Path, rng: Random, cnt: int) -> None:
+    for i in range(cnt):
+        series_type = SERIES_TYPES[i % len(SERIES_TYPES)]
+        folder = root / "mylar" / f"[{series_type}] Series {i:03} ({2000 + i % 20})"
+        folder.mkdir(parents=True, exist_ok=True)
+        for n in range(1, rng.randint(1, 4) + 1):
+            # Now and then, an issue of another type
+            issue_type = SERIES_TYPES[(i + (n == 3)) % len(SERIES_TYPES)]
+            issue = folder / f"[{issue_type}] Series {i:03} {n:03}.cbz"
+            write(issue, render_cbz(rng, 2))
+        for n, name in enumerate(["series.json", "cover.jpg", "cvinfo", "folder.jpg"]):
+            if (i + n) % 3:
+                write(folder / name, b"{}" if name.endswith(".json") else b"\0" * 16)
+
+
+def get_manifest(root: Path) -> dict[str, dict[str, Union[int, str]]]:
+    files = {}
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and "manifest.json" != path.name:
+            data = path.read_bytes()
+            files[path.relative_to(root).as_posix()] = {
+                "size": len(data),
+                "sha256": sha256(data).hexdigest(),
+            }
+    return files
+
+
+# Build the corpus in `root` (or reuse it, if it's already there)
+def build_corpus(
+    root: Optional[Union[PathLike, str]] = None, seed: int = 0, scale: int = 1
+) -> Path:
+    root = Path(root) if root else get_default_corpus_path(seed, scale)
+    manifest = root / "manifest.json"
+    key = {"version": VERSION, "seed": seed, "scale": scale}
+    if manifest.is_file():
+        existing = json.loads(manifest.read_text())
+        if key == {k: existing.get(k) for k in key}:
+            return root
+    if root.exists():
+        rmtree(root)
+    root.mkdir(parents=True)
+    # One generator per part, so changing one doesn't shift the bytes of the others
+    parts = [
+        (build_images, 60),
+        (build_comics, 16),
+        (build_folders, 6),
+        (build_videos, 10),
+        (build_plex, 12),
+        (build_mylar, 8),
+    ]
+    for i, (build, cnt) in enumerate(parts):
+        build(root, Random(seed * 100 + i), cnt * scale)
+    manifest.write_text(json.dumps({**key, "files": get_manifest(root)}, indent=2))
+    return root
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog="python3 -m srss.bench.corpus",
+        description="Build the synthetic media library the benchmarks run on",
+    )
+    parser.add_argument("root", nargs="?", type=Path, metavar="DIR")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the counts")
+    ns = parser.parse_args(args)
+    root = build_corpus(ns.root, seed=ns.seed, scale=ns.scale)
+    files = json.loads((root / "manifest.json").read_text())["files"]
+    size = sum(file["size"] for file in files.values())
+    print(f"📦 {root} 👉 {len(files)} files, {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
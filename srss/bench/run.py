@@ -0,0 +1,281 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Throughput Benchmark
+#
+# Runs every script over its part of the synthetic corpus (see `srss.bench.corpus`)
+# and reports, per script:
+#   * files/s and MB/s (the bytes of the files it was given)
+#   * the time of each stage: `start` (interpreter), `load` (imports), `discover`
+#     (walking the folders) and `run` (processing + waiting for the tag writes)
+#   * the peak RSS of the run (the largest process, the workers included)
+#   * the tag reads / writes (in the process running the script, so not those made
+#     in the worker processes of the `cpu` scripts)
+#
+# Usage:
+#   python3 -m srss.bench.run [--runs 3] [-j N] [--json FILE] [--baseline FILE]
+#                             [--seed 0] [--scale 1] [--corpus DIR] [COMMAND ...]
+#
+# Notes:
+#   * Each run gets a fresh copy of the corpus (not timed), since the scripts rename,
+#     repack and trash files. The trash goes into the copy too (`XDG_DATA_HOME`).
+#   * The tags go to the `memory` backend, the tag index is off and the daemon isn't
+#     used, so the numbers are for the scripts themselves (not the disk they tag).
+#   * The median of the `--runs` is reported. `--baseline` compares the `run` times
+#     with those of an earlier `--json`.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import json
+from argparse import ArgumentParser
+from os import environ, scandir
+from os.path import getsize, isdir
+from pathlib import Path
+from platform import platform as get_platform
+from platform import python_version
+from shutil import copytree
+from statistics import median
+from subprocess import DEVNULL, PIPE, run
+from sys import executable, platform
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Iterable, Optional
+
+from srss.bench.corpus import build_corpus
+from srss.executor import JOBS
+from srss.scripts import ROOT, SCRIPTS, Script
+
+__all__ = [
+    "measure",
+    "run_child",
+]
+
+# MARK: Constants
+
+ENV = {
+    **environ,
+    "SRSS_DAEMON": "off",
+    "SRSS_TAG_BACKEND": "memory",
+    "SRSS_TAG_INDEX": "off",
+    # Every run tests everything (and leaves the real cache alone)
+    "SRSS_VERIFY_CACHE": "off",
+    "SRSS_VERIFY_XATTR": "off",
+}
+
+# The part of the corpus each script is run on
+INPUTS = {
+    "archive_tag_contents": "comics",
+    "cbz_create_from_folder": "folders",
+    "cbz_create_from_images": "loose",
+    "comic_process": "comics",
+    "image_tag_info": "images",
+    "mylar_tag_series_folder": "mylar",
+    "plex_tag_movie_folder": "plex/movies",
+    "plex_tag_music_video_type": "plex/music",
+    "video-rename-with-resolution": "videos",
+    "video-tag-wrong-resolution-in-file-name": "videos",
+    "video_tag_info": "videos",
+}
+
+CHILD = "import sys; from srss.bench.run import run_child; run_child(*sys.argv[1:])"
+
+STAGES = ["start", "load", "discover", "run"]
+
+# MARK: Functions
+
+
+# `ru_maxrss` is in KB on Linux and in bytes on macOS
+def get_peak_rss() -> float:
+    from resource import RUSAGE_CHILDREN, RUSAGE_SELF, getrusage
+
+    peak = max(getrusage(RUSAGE_SELF).ru_maxrss, getrusage(RUSAGE_CHILDREN).ru_maxrss)
+    return peak / (1 << 20) if "darwin" == platform else peak / (1 << 10)
+
+
+def get_size(path: str) -> int:
+    if not isdir(path):
+        return getsize(path)
+    size = 0
+    for entry in scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            size += get_size(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            size += entry.stat().st_size
+    return size
+
+
+# What the child process runs: one script over `root`, timing each stage
+def run_child(name: str, root: str, jobs: str, result: str) -> None:
+    started = perf_counter()
+    from srss.backends import get_backend
+    from srss.discovery import iter_paths
+    from srss.executor import ScriptExecutor
+    from srss.scripts import load_script
+
+    script = SCRIPTS[name]
+    times = {}
+    load_script(name)
+    times["load"] = perf_counter() - started
+
+    started = perf_counter()
+    if "dirs" == script.target:
+        # The folders a user would select (not the `Trailers` in them)
+        args = sorted(entry.path for entry in scandir(root) if entry.is_dir())
+    else:
+        args = list(iter_paths([root], script.target, recursive=True))
+    size = sum(get_size(arg) for arg in args)
+    times["discover"] = perf_counter() - started
+
+    started = perf_counter()
+    with ScriptExecutor(int(jobs)) as executor:
+        failed = executor.run(script, args)
+    times["run"] = perf_counter() - started
+
+    backend = get_backend()
+    with open(result, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "times": times,
+                "files": len(args),
+                "bytes": size,
+                "failed": failed,
+                "rss_mb": get_peak_rss(),
+                "tag_reads": getattr(backend, "reads", None),
+                "tag_writes": getattr(backend, "writes", None),
+            },
+            f,
+        )
+
+
+def run_once(script: Script, corpus: Path, jobs: int) -> dict:
+    with TemporaryDirectory(prefix="srss-bench-") as scratch:
+        root = Path(scratch) / "corpus"
+        copytree(corpus / INPUTS[script.name], root)
+        result = Path(scratch) / "result.json"
+        env = {**ENV, "XDG_DATA_HOME": str(Path(scratch) / "data")}
+        command = [executable, "-c", CHILD, script.name, str(root), str(jobs)]
+        started = perf_counter()
+        completed = run(
+            [*command, str(result)],
+            cwd=ROOT,
+            env=env,
+            stdout=DEVNULL,
+            stderr=PIPE,
+            text=True,
+        )
+        elapsed = perf_counter() - started
+        if completed.returncode or not result.exists():
+            raise RuntimeError(f"{script.command} 👉 {completed.stderr.strip()}")
+        measured = json.loads(result.read_text())
+    times = measured["times"]
+    times["start"] = max(0.0, elapsed - sum(times.values()))
+    measured["total"] = elapsed
+    return measured
+
+
+# The median (of each number) of `runs` runs
+def measure(script: Script, corpus: Path, jobs: int, runs: int) -> dict:
+    results = [run_once(script, corpus, jobs) for _ in range(max(1, runs))]
+    first = results[0]
+    total = median(result["total"] for result in results)
+    run_time = median(result["times"]["run"] for result in results)
+    return {
+        "files": first["files"],
+        "bytes": first["bytes"],
+        "failed": first["failed"],
+        "times": {
+            stage: median(result["times"][stage] for result in results)
+            for stage in STAGES
+        },
+        "total": total,
+        "files_per_s": first["files"] / run_time if run_time else None,
+        "mb_per_s": first["bytes"] / 1e6 / run_time if run_time else None,
+        "rss_mb": max(result["rss_mb"] for result in results),
+        "tag_reads": first["tag_reads"],
+        "tag_writes": first["tag_writes"],
+    }
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        result = run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog="python3 -m srss.bench.run",
+        description="Measure the throughput of each script on the synthetic corpus",
+    )
+    parser.add_argument("commands", nargs="*", metavar="COMMAND")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per script")
+    parser.add_argument("-j", "--jobs", type=int, default=JOBS, help="Paths at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the corpus")
+    parser.add_argument("--corpus", type=Path, metavar="DIR", help="Where to keep it")
+    parser.add_argument("--json", type=Path, metavar="FILE", help="Save the results")
+    parser.add_argument(
+        "--baseline", type=Path, metavar="FILE", help="Compare with an earlier --json"
+    )
+    ns = parser.parse_args(args)
+
+    commands = {script.command: script for script in SCRIPTS.values()}
+    for command in ns.commands:
+        if command not in commands:
+            parser.error(f"Unknown command {command} (one of {', '.join(commands)})")
+    baseline = {}
+    if ns.baseline:
+        baseline = json.loads(ns.baseline.read_text())["results"]
+
+    corpus = build_corpus(ns.corpus, seed=ns.seed, scale=ns.scale)
+
+    results = {}
+    width = max(len(command) for command in ns.commands or commands)
+    print(
+        f"{'':{width}}  {'files':>5}  {'files/s':>8}  {'MB/s':>6}  {'start':>6}  "
+        f"{'load':>6}  {'disc.':>6}  {'run':>7}  {'RSS MB':>6}  {'tags r/w':>9}"
+    )
+    for command in ns.commands or commands:
+        result = measure(commands[command], corpus, ns.jobs, ns.runs)
+        results[command] = result
+        times = {stage: ms * 1000 for stage, ms in result["times"].items()}
+        tags = f"{result['tag_reads'] or 0}/{result['tag_writes'] or 0}"
+        line = (
+            f"{command:{width}}  {result['files']:5}  "
+            f"{result['files_per_s'] or 0:8.1f}  {result['mb_per_s'] or 0:6.2f}  "
+            f"{times['start']:6.0f}  {times['load']:6.0f}  "
+            f"{times['discover']:6.0f}  {times['run']:7.0f}  "
+            f"{result['rss_mb']:6.1f}  {tags:>9}"
+        )
+        if command in baseline:
+            before = baseline[command]["times"]["run"]
+            line += f"  ({result['times']['run'] / before:.2f}x)" if before else ""
+        if result["failed"]:
+            line += f"  ⚠️ {result['failed']} failed"
+        print(line)
+
+    if ns.json:
+        meta = {
+            "commit": get_git_commit(),
+            "python": python_version(),
+            "platform": get_platform(),
+            "seed": ns.seed,
+            "scale": ns.scale,
+            "runs": ns.runs,
+            "jobs": ns.jobs,
+        }
+        with ns.json.open("w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Startup Benchmark
+#
+# How long each script takes to start (interpreter + imports), which is most of the
+# wait after a Quick Action click. Each script is run with no arguments (so the loop
+# does nothing), `--runs` times, in a fresh interpreter.
+#
+# Usage:
+#   python3 -m srss.bench.startup [--runs 10] [--imports 5] [--json FILE] [SCRIPT ...]
+#
+# Notes:
+#   * `(python)` is the bare interpreter (`python3 -c pass`), i.e. the floor.
+#   * `--imports` lists the slowest imports of each script (from `-X importtime`,
+#     cumulative, in ms).
+#   * The tags go to the `memory` backend, the tag index is off and the daemon isn't
+#     used, so nothing on the disk is touched and the numbers are for a cold start.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from argparse import ArgumentParser
+from json import dump as json_dump
+from os import environ
+from pathlib import Path
+from statistics import median
+from subprocess import run
+from sys import executable
+from time import perf_counter
+from typing import Iterable, Optional, Sequence
+
+from srss.scripts import ROOT, SCRIPTS
+
+__all__ = [
+    "get_scripts",
+    "measure",
+]
+
+# MARK: Constants
+
+ENV = {
+    **environ,
+    "SRSS_DAEMON": "off",
+    "SRSS_TAG_BACKEND": "memory",
+    "SRSS_TAG_INDEX": "off",
+}
+
+# MARK: Functions
+
+
+def get_scripts() -> list[Path]:
+    return [script.file for script in SCRIPTS.values()]
+
+
+def run_once(command: Sequence[str]) -> float:
+    start = perf_counter()
+    result = run(command, cwd=ROOT, env=ENV, capture_output=True, text=True)
+    elapsed = perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f"{' '.join(command)} 👉 {result.stderr.strip()}")
+    return elapsed
+
+
+# The slowest imports (cumulative) as [(module, ms)]
+def get_slowest_imports(command: Sequence[str], cnt: int) -> list[tuple[str, float]]:
+    command = [command[0], "-X", "importtime", *command[1:]]
+    result = run(command, cwd=ROOT, env=ENV, capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        # e.g. `import time:       808 |      12951 |   pathlib`
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        imports.append((module.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:cnt]
+
+
+def measure(command: Sequence[str], runs: int) -> dict[str, float]:
+    times = [run_once(command) * 1000 for _ in range(runs)]
+    return {"min": min(times), "median": median(times), "max": max(times)}
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog="python3 -m srss.bench.startup",
+        description="Measure the startup time (interpreter + imports) of each script",
+    )
+    parser.add_argument("scripts", nargs="*", type=Path, metavar="SCRIPT")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per script")
+    parser.add_argument(
+        "--imports", type=int, default=0, metavar="N", help="List the N slowest imports"
+    )
+    parser.add_argument("--json", type=Path, metavar="FILE", help="Save the results")
+    ns = parser.parse_args(args)
+
+    commands = {"(python)": [executable, "-c", "pass"]}
+    for script in ns.scripts or get_scripts():
+        commands[script.name] = [executable, str(script.resolve())]
+
+    results = {}
+    width = max(len(name) for name in commands)
+    print(f"{'':{width}}  {'min':>8}  {'median':>8}  {'max':>8}  (ms)")
+    for name, command in commands.items():
+        result = measure(command, ns.runs)
+        results[name] = result
+        print(
+            f"{name:{width}}  {result['min']:8.1f}  "
+            f"{result['median']:8.1f}  {result['max']:8.1f}"
+        )
+        if ns.imports:
+            result["imports"] = get_slowest_imports(command, ns.imports)
+            for module, ms in result["imports"]:
+                print(f"{'':{width}}    ↳ {module} ({ms:.1f})")
+
+    if ns.json:
+        with ns.json.open("w", encoding="utf-8") as f:
+            json_dump({"runs": ns.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: CBZ
+#
+# Writes CBZs with `zipfile`, in this process, instead of `patoolib.create_archive`
+# (which needs the working directory changed and runs `zip`):
+#   * The pages (JPEG, PNG, WebP, …) are stored as they are; deflating them costs a lot
+#     of CPU and saves next to nothing
+#   * Everything else (`ComicInfo.xml`, text, BMP, TIFF, …) is deflated
+#   * Each file is streamed in, 1 MiB at a time, so no page is ever in memory whole
+#   * The pages are in natural order (`2.jpg` before `10.jpg`), which is the order
+#     most readers show them in
+#   * Nothing depends on the working directory, so several can be written at once
+#   * The members worth deflating (e.g. BMP / TIFF scans) are deflated on a pool of
+#     threads (`zlib` lets go of the GIL), each into its own spooled buffer, and then
+#     written in order, as if `zipfile` had deflated them itself (same bytes)
+#
+# With `SRSS_REPRODUCIBLE=1` (or `--reproducible`), the same pages make the same bytes,
+# whoever writes them, wherever and whenever (so backups can dedupe and rsync can send
+# only what changed):
+#   * Every member is dated `SOURCE_DATE_EPOCH` (or 1980-01-01, the earliest a ZIP can
+#     hold) instead of its mtime
+#   * Every member is a Unix file with `rw-r--r--` instead of its own permissions
+#   * The names are NFC (macOS hands out NFD ones), and two that are the same once NFC
+#     are refused (`ValueError`) rather than both written
+#   * No extra fields or comments (`zipfile` writes none, other than for ZIP64), the
+#     natural order (ties broken by the names themselves), and the same compression
+#     (by suffix, at zlib's default level) either way
+#
+# `repack_rar` turns a CBR into a CBZ the same way, streaming each member out of the
+# RAR (with `rarfile`) and into the ZIP, instead of `patoolib.repack_archive` (which
+# extracts everything to a temporary folder first, then runs `zip` on it).
+#
+# Notes:
+#   * Each CBZ is written to a temporary file next to it, tested (`srss.verify`), and
+#     only then renamed into place (see `srss.atomic`), so an interrupted one never
+#     shows up under its name; an existing one is never overwritten
+#     (`FileExistsError`).
+#   * The test is recorded (see `srss.verified`), so the CBZ isn't tested again.
+#   * `rarfile` checks the CRC of each member as it's read to the end, so a repack
+#     that succeeds has also tested the RAR.
+#   * The stored members of a RAR are read by `rarfile` itself; the compressed ones
+#     are piped out of `unrar` (or `unar`, `bsdtar`, …), one member at a time. A solid
+#     RAR (where that would decompress every member before it, again and again) is
+#     extracted to a temporary folder in one pass instead (with `patool`), and tested
+#     by the tool as it goes.
+#   * `SRSS_DEFLATE_WORKERS` sets the number of threads (default: up to 8; `1` deflates
+#     in the calling thread) and `SRSS_DEFLATE_MEMORY` how many MiB the buffers of the
+#     members being deflated can take (default: 256), beyond which they spill to disk
+#     and the next members wait.
+#   * The same bytes assume the same zlib (the deflated members only; the pages are
+#     stored).
+#   * A member deflated on the pool is written the way `ZipFile.open(info, "w")` would
+#     have (it can't take deflated data), with `zipfile`'s internals; that's only done
+#     on the Pythons it was checked against, and only once the same member written
+#     both ways came out the same (checked once per process, see
+#     `can_write_deflated`); otherwise everything is deflated in the calling thread.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import sys
+from collections import deque
+from functools import partial
+from io import BytesIO
+from os import PathLike, cpu_count, environ, fspath, walk
+from os.path import join, relpath
+from pathlib import PurePath
+from re import compile as re_compile
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile, TemporaryDirectory
+from threading import Lock
+from time import gmtime
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
+from unicodedata import normalize
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+from zlib import DEFLATED, MAX_WBITS, Z_DEFAULT_COMPRESSION, compressobj, crc32
+
+from srss.atomic import atomic_path
+from srss.verified import record
+from srss.verify import VERIFIER, test_zip
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+__all__ = [
+    "get_compress_type",
+    "get_members",
+    "is_reproducible",
+    "natural_key",
+    "repack_rar",
+    "write_cbz",
+    "write_entries",
+]
+
+# MARK: Constants
+
+OFF = ["", "0", "false", "no", "off"]
+
+BUFFER_SIZE = 1 << 20
+
+DEFLATE_WORKERS = int(
+    environ.get("SRSS_DEFLATE_WORKERS", str(min(8, cpu_count() or 4)))
+)
+
+DEFLATE_MEMORY = int(environ.get("SRSS_DEFLATE_MEMORY", "256")) << 20
+
+# Smaller members are deflated in the calling thread, where threads would only add
+# overhead
+THREADED_SIZE = 64 << 10
+
+# Already compressed, so stored as is
+STORED_SUFFIXES = {
+    ".7z",
+    ".avif",
+    ".cbr",
+    ".cbz",
+    ".gif",
+    ".gz",
+    ".heic",
+    ".jp2",
+    ".jpeg",
+    ".jpg",
+    ".jxl",
+    ".png",
+    ".rar",
+    ".webp",
+    ".zip",
+}
+
+DIGITS = re_compile(r"(\d+)")
+
+# The earliest timestamp a ZIP can hold
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# `create_system` of a member made on Unix
+UNIX = 3
+
+# A regular file, `rw-r--r--` (`external_attr` holds the mode in its upper half)
+REPRODUCIBLE_MODE = 0o100644
+
+# (name in the archive, file)
+Member = tuple[str, Union[PathLike, str]]
+
+# (the member's `ZipInfo`, a function opening its data)
+Entry = tuple[ZipInfo, Callable[[], BinaryIO]]
+
+# (a member's `ZipInfo`, the function opening its data, its deflating, if threaded)
+Pending = tuple[ZipInfo, Callable[[], BinaryIO], Optional["Future"]]
+
+# (the deflated data, CRC, size, deflated size)
+Deflated = tuple[SpooledTemporaryFile, int, int, int]
+
+# The Pythons whose `zipfile` internals `write_deflated` matches
+DEFLATED_PYTHONS = ((3, 9), (3, 13))
+
+# MARK: Functions
+
+
+# e.g. `sorted(names, key=natural_key)` 👉 `["1.jpg", "2.jpg", "10.jpg"]`
+def natural_key(name: str) -> tuple[list[Union[int, str]], str, str]:
+    nfc = normalize("NFC", name)
+    # The numbers are always at the odd indexes, so ints are only compared with ints
+    # (and NFC, so an `é` sorts the same from macOS as from Linux)
+    parts = [
+        int(part) if i % 2 else part.casefold()
+        for i, part in enumerate(DIGITS.split(nfc))
+    ]
+    # Then the names themselves (e.g. `A.jpg` / `a.jpg`), so the order never depends
+    # on the order they were listed in
+    return parts, nfc, name
+
+
+# Read each time, since `--reproducible` sets it after the imports
+def is_reproducible() -> bool:
+    return environ.get("SRSS_REPRODUCIBLE", "").strip().lower() not in OFF
+
+
+# The date of every member of a reproducible CBZ
+def get_reproducible_date_time() -> tuple[int, int, int, int, int, int]:
+    epoch = environ.get("SOURCE_DATE_EPOCH", "").strip()
+    if not epoch:
+        return ZIP_EPOCH
+    return max(gmtime(int(epoch))[:6], ZIP_EPOCH)
+
+
+# The member, with nothing that depends on the file system, the platform or the clock
+# (`seen` being the names so far, since two names can be the same once NFC)
+def get_reproducible_info(info: ZipInfo, date_time: tuple, seen: set[str]) -> ZipInfo:
+    name = normalize("NFC", info.filename)
+    if name in seen:
+        raise ValueError(f"Two members named {name!r} (once NFC)")
+    seen.add(name)
+    entry = ZipInfo(name, date_time)
+    entry.file_size = info.file_size
+    entry.create_system = UNIX
+    entry.external_attr = REPRODUCIBLE_MODE << 16
+    return entry
+
+
+def get_compress_type(name: str) -> int:
+    if PurePath(name).suffix.lower() in STORED_SUFFIXES:
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+
+# Every file below `folder`, as members named by their relative paths, in order
+def get_members(folder: Union[PathLike, str]) -> list[Member]:
+    folder = fspath(folder)
+    members = []
+    for parent, _, files in walk(folder):
+        for file in files:
+            path = join(parent, file)
+            members.append((PurePath(relpath(path, folder)).as_posix(), path))
+    return sorted(members, key=lambda member: natural_key(member[0]))
+
+
+_pool: Optional["ThreadPoolExecutor"] = None
+_pool_lock = Lock()
+
+
+def get_pool() -> "ThreadPoolExecutor":
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, DEFLATE_WORKERS), thread_name_prefix="srss-deflate"
+            )
+        return _pool
+
+
+# Deflate a member the way `zipfile` does (same level, same raw stream)
+def deflate(open_data: Callable[[], BinaryIO], spool_size: int) -> Deflated:
+    spool = SpooledTemporaryFile(max_size=spool_size)
+    try:
+        compressor = compressobj(Z_DEFAULT_COMPRESSION, DEFLATED, -MAX_WBITS)
+        crc = size = 0
+        with open_data() as src:
+            while chunk := src.read(BUFFER_SIZE):
+                crc, size = crc32(chunk, crc), size + len(chunk)
+                spool.write(compressor.compress(chunk))
+        spool.write(compressor.flush())
+        compress_size = spool.tell()
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, crc, size, compress_size
+
+
+def write_member(zf: ZipFile, info: ZipInfo, open_data: Callable[[], BinaryIO]) -> None:
+    large = ZIP64_LIMIT < info.file_size
+    with open_data() as src:
+        with zf.open(info, "w", force_zip64=large) as out:
+            copyfileobj(src, out, BUFFER_SIZE)
+
+
+# Write a member that's already deflated, as `ZipFile.open(info, "w")` would have
+# (it has no way of taking deflated data, hence its internals)
+def write_deflated(zf: ZipFile, info: ZipInfo, deflated: Deflated) -> None:
+    spool, crc, size, compress_size = deflated
+    with spool:
+        info.compress_size, info.CRC, info.file_size = compress_size, crc, size
+        info.flag_bits = 0x00
+        if not info.external_attr:
+            info.external_attr = 0o600 << 16
+        # The same as `write_member` (i.e. `force_zip64` when it's that large)
+        zip64 = ZIP64_LIMIT < info.file_size * 1.05
+        if not zip64 and ZIP64_LIMIT < compress_size:
+            raise RuntimeError("Compressed size larger than uncompressed size")
+        with zf._lock:
+            zf.fp.seek(zf.start_dir)
+            info.header_offset = zf.fp.tell()
+            zf._writecheck(info)
+            zf._didModify = True
+            zf.fp.write(info.FileHeader(zip64))
+            copyfileobj(spool, zf.fp, BUFFER_SIZE)
+            zf.start_dir = zf.fp.tell()
+            zf.filelist.append(info)
+            zf.NameToInfo[info.filename] = info
+
+
+_can_write_deflated: Optional[bool] = None
+
+
+# Whether `write_deflated` writes the same bytes as `zipfile` on this Python (it uses
+# its internals, which aren't guaranteed to stay the same)
+def can_write_deflated() -> bool:
+    global _can_write_deflated
+    if _can_write_deflated is None:
+        low, high = DEFLATED_PYTHONS
+        _can_write_deflated = low <= sys.version_info[:2] <= high and check_deflated()
+    return _can_write_deflated
+
+
+def check_deflated() -> bool:
+    data = bytes(range(256)) * 512
+    written = []
+    try:
+        for threaded in (False, True):
+            buffer = BytesIO()
+            with ZipFile(buffer, "w", compression=ZIP_DEFLATED) as zf:
+                info = ZipInfo("check.bmp", ZIP_EPOCH)
+                info.compress_type, info.file_size = ZIP_DEFLATED, len(data)
+                if threaded:
+                    deflated = deflate(partial(BytesIO, data), len(data))
+                    write_deflated(zf, info, deflated)
+                else:
+                    write_member(zf, info, partial(BytesIO, data))
+            written.append(buffer.getvalue())
+    except Exception:
+        return False
+    return written[0] == written[1]
+
+
+# What the buffers of the members being deflated take: up to `spool_size` each until
+# they're done, then what's actually in memory (nothing, once it spilled to disk)
+def get_held(pending: Iterable[Pending], spool_size: int) -> int:
+    held = 0
+    for info, _, future in pending:
+        if future is None or future.cancelled():
+            continue
+        if not future.done():
+            held += min(info.file_size, spool_size)
+        elif future.exception() is None:
+            compress_size = future.result()[3]
+            held += compress_size if compress_size <= spool_size else 0
+    return held
+
+
+def write_entries(
+    dst: Union[PathLike, str],
+    entries: Iterable[Entry],
+    workers: int = DEFLATE_WORKERS,
+    memory: int = DEFLATE_MEMORY,
+    reproducible: Optional[bool] = None,
+    verify: bool = True,
+) -> None:
+    if reproducible is None:
+        reproducible = is_reproducible()
+    date_time = get_reproducible_date_time() if reproducible else None
+    seen: set[str] = set()
+    # Being deflated (in order)
+    pending: deque[Pending] = deque()
+    if not can_write_deflated():
+        workers = 1
+    spool_size = memory // max(1, workers)
+    try:
+        with atomic_path(dst) as tmp:
+            file = open(tmp, "xb", buffering=BUFFER_SIZE)
+            with file, ZipFile(file, "w", compression=ZIP_DEFLATED) as zf:
+
+                # Write the oldest member (waiting for it to be deflated, if need be)
+                def write_next() -> None:
+                    info, open_data, future = pending.popleft()
+                    if future is None:
+                        write_member(zf, info, open_data)
+                    else:
+                        write_deflated(zf, info, future.result())
+
+                for info, open_data in entries:
+                    if reproducible:
+                        info = get_reproducible_info(info, date_time, seen)
+                    info.compress_type = get_compress_type(info.filename)
+                    future = None
+                    threaded = 1 < workers and THREADED_SIZE <= info.file_size
+                    if ZIP_DEFLATED == info.compress_type and threaded:
+                        future = get_pool().submit(deflate, open_data, spool_size)
+                    pending.append((info, open_data, future))
+                    # Nothing to wait for, too many at once, or too much in memory
+                    while pending and (
+                        pending[0][2] is None
+                        or 2 * workers < len(pending)
+                        or memory < get_held(pending, spool_size)
+                    ):
+                        write_next()
+                while pending:
+                    write_next()
+            if verify:
+                # Before it has its name, so a bad one never does
+                test_zip(tmp)
+    except BaseException:
+        for _, _, future in pending:
+            if future is not None and not future.cancel():
+                try:
+                    future.result()[0].close()
+                except BaseException:
+                    pass
+        raise
+    if verify:
+        record(dst, VERIFIER)
+
+
+def write_cbz(dst: Union[PathLike, str], members: Iterable[Member]) -> None:
+    # (Clamped to 1980–2107, like `repack_rar`, rather than failing on an old page)
+    entries = (
+        (
+            ZipInfo.from_file(path, name, strict_timestamps=False),
+            partial(open, path, "rb"),
+        )
+        for name, path in members
+    )
+    write_entries(dst, entries)
+
+
+# Repack the CBR `src` as the CBZ `dst` (the pages in natural order)
+def repack_rar(src: Union[PathLike, str], dst: Union[PathLike, str]) -> None:
+    from rarfile import RarFile
+
+    with RarFile(fspath(src)) as rf:
+        infos = [info for info in rf.infolist() if not info.is_dir()]
+        infos.sort(key=lambda info: natural_key(info.filename))
+        solid = rf.is_solid()
+
+        # Read out of the RAR, or out of `folder` once it was extracted there
+        def entries(folder: Optional[str] = None) -> Iterator[Entry]:
+            for info in infos:
+                entry = ZipInfo(info.filename, max(info.date_time, ZIP_EPOCH))
+                entry.file_size = info.file_size
+                if folder is None:
+                    yield entry, partial(rf.open, info)
+                else:
+                    yield entry, partial(open, join(folder, info.filename), "rb")
+
+        if not solid:
+            write_entries(dst, entries())
+            return
+
+    # Each member of a solid RAR is only read by decompressing all of the ones before
+    # it, so they're extracted in one pass (in the order of the archive), and only the
+    # ZIP is in natural order
+    from patoolib import extract_archive
+
+    with TemporaryDirectory(prefix="srss-") as tmp:
+        extract_archive(fspath(src), outdir=tmp, verbosity=-1, interactive=False)
+        write_entries(dst, entries(tmp))
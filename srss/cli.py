@@ -0,0 +1,152 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Command Line
+#
+# One entry point for all of the scripts, for running them over a whole library (as
+# opposed to a Finder selection) without a `find | xargs` pipeline.
+#
+# Usage:
+#   python3 -m srss COMMAND [-r] [--include GLOB] [--exclude GLOB] [-j N] PATH ...
+#
+# e.g.
+#   python3 -m srss comic-process -r -j 8 --include "*.cb?" /Volumes/Library/Comics
+#   find /Volumes/Library/Movies -mtime -1 | python3 -m srss video-tag-info -
+#
+# Notes:
+#   * A `-` for a path reads the paths from stdin (one per line).
+#   * `--trace FILE` records what happened (see `srss.trace`), with a summary at the
+#     end (the time of each stage and the slowest files).
+#   * `--reverify` tests the archives again, even the unchanged ones that were already
+#     tested (see `srss.verified`).
+#   * `--deep` also decodes every page of the comics (see `srss.pages`).
+#   * `--reproducible` writes CBZs that are byte for byte the same for the same pages
+#     (see `srss.cbz`).
+#   * `--comicinfo` adds a `ComicInfo.xml` to the valid CBZs without one (see
+#     `srss.comicinfo`).
+#   * `--covers` makes the missing covers of the Mylar series folders (see
+#     `srss.covers`).
+#   * `--profile NAME` picks the device `comic-transcode` is for (see
+#     `srss.transcode`).
+#   * The temporary files left by interrupted runs (an hour old or more) are removed
+#     from the folders on the way (see `srss.atomic`); `SRSS_DURABILITY` sets how
+#     much of what's written is fsynced.
+#   * The exit code is 1 when any path failed.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import sys
+from argparse import ArgumentParser
+from os import environ
+from typing import Iterable, Iterator, Optional
+
+from srss.discovery import iter_paths
+from srss.executor import JOBS, ScriptExecutor
+from srss.scripts import SCRIPTS
+from srss.transcode import PROFILES
+from srss.trace import get_tracer, timed
+
+__all__ = [
+    "main",
+]
+
+# MARK: Constants
+
+COMMANDS = {script.command: script for script in SCRIPTS.values()}
+
+# MARK: Functions
+
+
+def read_args(args: Iterable[str]) -> Iterator[str]:
+    for arg in args:
+        if "-" == arg:
+            yield from (line.rstrip("\n") for line in sys.stdin if line.strip())
+        else:
+            yield arg
+
+
+def get_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        prog="python3 -m srss", description="Run the SRSS scripts over many paths"
+    )
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    # The same options for every command
+    common = ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="+", metavar="PATH", help="`-` reads stdin")
+    common.add_argument(
+        "-r", "--recursive", action="store_true", help="Descend into folders"
+    )
+    common.add_argument(
+        "--include", action="append", default=[], metavar="GLOB", help="Only these"
+    )
+    common.add_argument(
+        "--exclude", action="append", default=[], metavar="GLOB", help="Not these"
+    )
+    common.add_argument(
+        "-j", "--jobs", type=int, default=JOBS, help=f"At once (default: {JOBS})"
+    )
+    common.add_argument(
+        "--trace", metavar="FILE", help="Append the events to FILE (JSON Lines)"
+    )
+    common.add_argument(
+        "--reverify", action="store_true", help="Test archives tested before again"
+    )
+    common.add_argument(
+        "--deep", action="store_true", help="Also decode every page of the comics"
+    )
+    common.add_argument(
+        "--reproducible", action="store_true", help="Write byte-identical CBZs"
+    )
+    common.add_argument(
+        "--comicinfo", action="store_true", help="Add ComicInfo.xml to valid CBZs"
+    )
+    common.add_argument(
+        "--covers", action="store_true", help="Make the missing series covers"
+    )
+    common.add_argument(
+        "--profile", choices=sorted(PROFILES), help="The device to transcode for"
+    )
+
+    for command, script in COMMANDS.items():
+        commands.add_parser(
+            command,
+            parents=[common],
+            help=script.help,
+            description=f"{script.help} ({script.workload}, {script.target})",
+        )
+    return parser
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    ns = get_parser().parse_args(args)
+    script = COMMANDS[ns.command]
+    if ns.trace:
+        # Before the tracer (or a worker process) is started
+        environ["SRSS_TRACE"] = ns.trace
+    if ns.reverify:
+        # Inherited by the worker processes
+        environ["SRSS_REVERIFY"] = "1"
+    if ns.deep:
+        environ["SRSS_DEEP_VERIFY"] = "1"
+    if ns.reproducible:
+        environ["SRSS_REPRODUCIBLE"] = "1"
+    if ns.comicinfo:
+        environ["SRSS_COMICINFO"] = "1"
+    if ns.covers:
+        environ["SRSS_MYLAR_COVERS"] = "1"
+    if ns.profile:
+        environ["SRSS_TRANSCODE_PROFILE"] = ns.profile
+    paths = iter_paths(
+        read_args(ns.paths),
+        target=script.target,
+        recursive=ns.recursive,
+        include=ns.include,
+        exclude=ns.exclude,
+        sweep=True,
+    )
+    with ScriptExecutor(ns.jobs) as executor:
+        failed = executor.run(script, timed(paths, "discovery"))
+    get_tracer().close()
+    if failed:
+        print(f"🛑 {script.command} 👉 {failed} failed")
+        sys.exit(1)
@@ -0,0 +1,95 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Daemon Client
+#
+# What the scripts run as `__main__`: when an `srss.daemon` is listening, the paths are
+# handed to it and its output is printed as it arrives (so a Quick Action looks the
+# same); otherwise the script just runs in this process, like it always did.
+#
+# Notes:
+#   * `SRSS_DAEMON=off` always runs the script in this process.
+#   * `SRSS_DAEMON_SOCKET` sets the socket (default: `~/Library/Caches/srss/daemon.sock`
+#     on macOS and `$XDG_RUNTIME_DIR/srss/daemon.sock` elsewhere).
+#   * Only the standard library is imported here; connecting to a socket that isn't
+#     there costs next to nothing.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import json
+import socket
+import sys
+from os import environ
+from os.path import abspath, expanduser, join
+from typing import Callable, Iterable, Optional
+
+from srss.trace import get_tracer
+
+__all__ = [
+    "forward",
+    "get_socket_path",
+    "run_script",
+]
+
+# MARK: Constants
+
+OFF = ["", "0", "false", "no", "off"]
+
+# MARK: Functions
+
+
+def get_socket_path() -> str:
+    if "SRSS_DAEMON_SOCKET" in environ:
+        return environ["SRSS_DAEMON_SOCKET"]
+    if "darwin" == sys.platform:
+        runtime = expanduser("~/Library/Caches")
+    else:
+        runtime = environ.get("XDG_RUNTIME_DIR") or expanduser("~/.cache")
+    return join(runtime, "srss", "daemon.sock")
+
+
+# Run `name` with `args` on the daemon; returns its exit code, or `None` when there is
+# no daemon (or it can't run the script) and the script should run here instead
+def forward(name: str, args: Iterable[str]) -> Optional[int]:
+    if environ.get("SRSS_DAEMON", "on").strip().lower() in OFF:
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(get_socket_path())
+    except OSError:
+        sock.close()
+        return None
+    with sock, sock.makefile("r", encoding="utf-8") as messages:
+        # The daemon has its own working directory
+        request = {"script": name, "args": [abspath(arg) for arg in args]}
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        for line in messages:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+            elif "error" in message:
+                # Sent before anything ran, so it's safe to run it here instead
+                print(f"⚠️ srss daemon 👉 {message['error']}", file=sys.stderr)
+                return None
+    print("🛑 srss daemon 👉 Connection lost", file=sys.stderr)
+    return 1
+
+
+# The `__main__` of every script
+def run_script(
+    name: str, main: Callable[[list[str]], None], args: Optional[Iterable[str]] = None
+) -> None:
+    args = sys.argv[1:] if args is None else list(args)
+    code = forward(name, args)
+    if code is None:
+        tracer = get_tracer()
+        tracer.script = name
+        main(args)
+        tracer.close()
+    elif code:
+        sys.exit(code)
@@ -0,0 +1,308 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: ComicInfo
+#
+# Puts a `ComicInfo.xml` (the series, the number and the year from the file name, and
+# the number and size of the pages) into a CBZ, without rewriting the CBZ:
+#   * The new member is written where the central directory was (i.e. right after the
+#     data of the last member), then the central directory and the end record after
+#     it (`zipfile`'s append mode), so it's a few KB of writing whatever the size
+#     of the CBZ
+#   * An existing `ComicInfo.xml` is dropped from the central directory (and
+#     overwritten, when it's the last member; otherwise its data is left where it was)
+#   * Before anything is written, the end of the CBZ that's about to change is copied
+#     to a journal next to it (`.Comic.cbz.journal`), and fsynced; if the append is
+#     interrupted, the journal puts the CBZ back the way it was (on the next append,
+#     the next sweep of its folder, see `srss.atomic`, or
+#     `python3 -m srss.comicinfo --recover`)
+#   * Afterwards, only the new member is read back (its CRC checked); if it doesn't
+#     come back, the CBZ is put back the way it was
+#
+# The size of the pages comes from the first few KB of each of them (see
+# `srss.listing`).
+#
+# Usage:
+#   python3 -m srss.comicinfo [--replace] FILE ...
+#   python3 -m srss comic-process --comicinfo -r /Volumes/Library/Comics
+#
+# Notes:
+#   * `SRSS_COMICINFO=1` (or `--comicinfo`) has `comic_process` add one to the valid
+#     CBZs that don't have one (an existing one is never replaced there).
+#   * The members before the new one aren't touched, so `comic_process` carries the
+#     verification of the CBZ over (see `srss.verified`).
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from mmap import ACCESS_READ, mmap
+from os import PathLike, environ, fspath, fstat, fsync, unlink
+from os.path import basename, dirname, exists, join
+from pathlib import PurePath
+from re import compile as re_compile
+from struct import Struct
+from time import localtime
+from typing import BinaryIO, Iterable, NamedTuple, Optional, Union
+from xml.etree.ElementTree import Element, SubElement, indent, tostring
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+from zlib import crc32
+
+from srss.atomic import JOURNAL_SUFFIX, sync_folder
+from srss.cbz import get_reproducible_date_time, is_reproducible, natural_key
+from srss.listing import is_hidden, is_page, iter_zip_members, read_page_size
+from srss.probe import NotAnArchiveError, get_probe
+
+__all__ = [
+    "COMICINFO",
+    "Page",
+    "find_comicinfo",
+    "is_comicinfo",
+    "make_comicinfo",
+    "recover",
+    "write_comicinfo",
+]
+
+# MARK: Constants
+
+OFF = ["", "0", "false", "no", "off"]
+
+COMICINFO = "ComicInfo.xml"
+
+# e.g. `[TPB] Saga 054 (2018)` 👉 `Saga`, `054`
+NAME = re_compile(r"^(?:\[[^\]]*\]\s*)?(?P<series>.+?)\s+#?(?P<number>\d+(?:\.\d+)?)\b")
+
+YEAR = re_compile(r"\((?P<year>(?:19|20)\d\d)\)")
+
+# (magic, where the saved end starts, the size of the CBZ, CRC of the saved end)
+JOURNAL_HEADER = Struct("<8sQQL")
+
+JOURNAL_MAGIC = b"SRSSJNL1"
+
+# MARK: Classes
+
+
+class Page(NamedTuple):
+    name: str
+    # Bytes (uncompressed)
+    size: int
+    width: Optional[int]
+    height: Optional[int]
+
+
+# MARK: Functions
+
+
+# Read each time, since `--comicinfo` sets it after the imports
+def is_comicinfo() -> bool:
+    return environ.get("SRSS_COMICINFO", "").strip().lower() not in OFF
+
+
+# The pages of a CBZ (in the order they're read), with their sizes from their headers
+def get_pages(path: Union[PathLike, str]) -> list[Page]:
+    pages = []
+    with open(fspath(path), "rb") as file:
+        size = fstat(file.fileno()).st_size
+        with mmap(file.fileno(), 0, access=ACCESS_READ) as mapped:
+            for name, file_size, read_head in iter_zip_members(mapped, size):
+                if is_hidden(name) or not is_page(name):
+                    continue
+                found = read_page_size(read_head)
+                pages.append(Page(name, file_size, *(found or (None, None))))
+    return sorted(pages, key=lambda page: natural_key(page.name))
+
+
+# The ComicInfo.xml (schema v2) of the CBZ at `path`
+def make_comicinfo(path: Union[PathLike, str]) -> bytes:
+    stem = PurePath(path).stem
+    pages = get_pages(path)
+    root = Element(
+        "ComicInfo",
+        {
+            "xmlns:xsd": "http://www.w3.org/2001/XMLSchema",
+            "xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance",
+        },
+    )
+    found = NAME.search(stem)
+    if found:
+        SubElement(root, "Series").text = found["series"]
+        SubElement(root, "Number").text = found["number"].lstrip("0") or "0"
+    year = YEAR.search(stem)
+    if year:
+        SubElement(root, "Year").text = year["year"]
+    SubElement(root, "PageCount").text = str(len(pages))
+    elements = SubElement(root, "Pages")
+    for i, page in enumerate(pages):
+        attributes = {"Image": str(i), "ImageSize": str(page.size)}
+        if page.width is not None:
+            attributes["ImageWidth"] = str(page.width)
+            attributes["ImageHeight"] = str(page.height)
+            if page.height < page.width:
+                attributes["DoublePage"] = "True"
+        if not i:
+            attributes["Type"] = "FrontCover"
+        SubElement(elements, "Page", attributes)
+    indent(root)
+    return tostring(root, encoding="utf-8", xml_declaration=True) + b"\n"
+
+
+# The ComicInfo.xml of a CBZ (at its root, in any case), if it has one
+def find_comicinfo(zf: ZipFile) -> Optional[ZipInfo]:
+    for info in zf.infolist():
+        if COMICINFO.lower() == info.filename.lower():
+            return info
+    return None
+
+
+# e.g. `Comic.cbz` 👉 `.Comic.cbz.journal`
+def get_journal_path(path: str) -> str:
+    return join(dirname(path), f".{basename(path)}{JOURNAL_SUFFIX}")
+
+
+# Save the end of `file` (from `offset`), before it's written over
+def write_journal(path: str, file: BinaryIO, offset: int) -> None:
+    journal = get_journal_path(path)
+    size = fstat(file.fileno()).st_size
+    file.seek(offset)
+    tail = file.read()
+    with open(journal, "xb") as out:
+        out.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, offset, size, crc32(tail)))
+        out.write(tail)
+        out.flush()
+        fsync(out.fileno())
+    sync_folder(journal)
+
+
+# Put the CBZ back the way it was before an interrupted append; returns whether it
+# had to be
+def recover(path: Union[PathLike, str]) -> bool:
+    path = fspath(path)
+    journal = get_journal_path(path)
+    if not exists(journal):
+        return False
+    with open(journal, "rb") as file:
+        header = file.read(JOURNAL_HEADER.size)
+        tail = file.read()
+    restored = False
+    if JOURNAL_HEADER.size == len(header):
+        magic, offset, size, crc = JOURNAL_HEADER.unpack(header)
+        # A journal cut short means the CBZ wasn't touched yet
+        if JOURNAL_MAGIC == magic and offset + len(tail) == size:
+            if crc32(tail) == crc:
+                with open(path, "r+b") as file:
+                    file.seek(offset)
+                    file.write(tail)
+                    file.truncate(size)
+                    file.flush()
+                    fsync(file.fileno())
+                restored = True
+    unlink(journal)
+    sync_folder(journal)
+    return restored
+
+
+# Whether the member `name` of the CBZ reads back as `data` (its CRC checked)
+def check_member(path: str, name: str, data: bytes, count: int) -> bool:
+    try:
+        with ZipFile(path) as zf:
+            return len(zf.infolist()) == count and zf.read(name) == data
+    except Exception:
+        return False
+
+
+# Add `data` to the CBZ as `name` (or replace it), in place (see above)
+def append_member(path: Union[PathLike, str], name: str, data: bytes) -> None:
+    path = fspath(path)
+    recover(path)
+    probe = get_probe(path)
+    if "zip" != probe.format:
+        # (`zipfile` would start a new ZIP after it)
+        raise NotAnArchiveError(probe)
+    try:
+        count = write_member(path, name, data)
+    except BaseException:
+        # Whatever was written (if anything)
+        recover(path)
+        raise
+    if not check_member(path, name, data, count):
+        recover(path)
+        raise OSError(f"{name} didn't read back, so the CBZ was put back")
+    unlink(get_journal_path(path))
+    sync_folder(path)
+
+
+# The append itself (journal first); returns how many members the CBZ now has
+def write_member(path: str, name: str, data: bytes) -> int:
+    with open(path, "r+b") as file:
+        with ZipFile(file, "a") as zf:
+            infos = zf.infolist()
+            old = next((info for info in infos if info.filename == name), None)
+            offset = zf.start_dir
+            # The last member is written over, the others are left as they are
+            last = old is not None and old is max(infos, key=lambda i: i.header_offset)
+            if last:
+                offset = old.header_offset
+            write_journal(path, file, offset)
+            if old is not None:
+                zf.filelist.remove(old)
+                del zf.NameToInfo[old.filename]
+            if last:
+                zf.start_dir = offset
+            if is_reproducible():
+                date_time = get_reproducible_date_time()
+            else:
+                date_time = localtime()[:6]
+            info = ZipInfo(name, date_time)
+            info.compress_type = ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zf.writestr(info, data)
+            count = len(zf.filelist)
+        file.flush()
+        fsync(file.fileno())
+    return count
+
+
+# Add a ComicInfo.xml to the CBZ (or replace the one it has); returns whether it did
+def write_comicinfo(path: Union[PathLike, str], replace: bool = False) -> bool:
+    with ZipFile(fspath(path)) as zf:
+        old = find_comicinfo(zf)
+    if old is not None and not replace:
+        return False
+    name = COMICINFO if old is None else old.filename
+    append_member(path, name, make_comicinfo(path))
+    return True
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.comicinfo", description="Add ComicInfo.xml to CBZs"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    parser.add_argument(
+        "--replace", action="store_true", help="Replace an existing ComicInfo.xml"
+    )
+    parser.add_argument(
+        "--recover", action="store_true", help="Only undo interrupted appends"
+    )
+    ns = parser.parse_args(args)
+    failed = False
+    for file in ns.files:
+        try:
+            if ns.recover:
+                if recover(file):
+                    print(f"↩️ {file} 👉 Put back")
+            elif write_comicinfo(file, replace=ns.replace):
+                print(f"📝 {file} 👉 {COMICINFO}")
+            else:
+                print(f"⏭️ {file} 👉 Already has a {COMICINFO}")
+        except Exception as e:
+            failed = True
+            print(f"🛑 {file} 👉 {e}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Covers
+#
+# The cover of a series (Mylar's `cover.jpg`, Plex / Kodi's `folder.jpg`), made from
+# the first page of its first issue:
+#   * The first page (in natural order) is streamed out of the CBZ (`zipfile`) or CBR
+#     (`rarfile`) straight into Pillow, so nothing is extracted
+#   * A JPEG is decoded at 1/2, 1/4 or 1/8 of its size when that's still bigger than
+#     the cover (`Image.draft`), so a 4K scan costs about as much as a thumbnail
+#   * The cover is scaled down to `COVER_SIZE` and written to a temporary file next to
+#     it, then renamed into place, so it's never seen half-written (see `srss.atomic`)
+#
+# Usage:
+#   python3 -m srss.covers COMIC FILE ...
+#   python3 -m srss mylar-tag-series-folder --covers -r -j 16 /Volumes/Library/Comics
+#
+# Notes:
+#   * The kind of archive is found from its magic bytes (`srss.probe`), not its suffix.
+#   * Hidden files (e.g. `__MACOSX/._001.jpg`) aren't pages.
+#   * An existing cover is never overwritten (`FileExistsError`).
+#   * The covers are written one after the other, so when one fails, the ones before
+#     it are there (and the caller should go by what's on disk).
+#
+# External Dependencies
+#   * https://pypi.org/project/pillow/
+#   * https://pypi.org/project/rarfile/ (CBR only)
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from contextlib import contextmanager
+from os import PathLike, fspath
+from pathlib import PurePath
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+from zipfile import ZipFile
+
+from srss.atomic import atomic_path
+from srss.cbz import natural_key
+from srss.lazy import lazy_import
+from srss.listing import is_hidden
+from srss.media import IMAGE_SUFFIXES
+from srss.probe import NotAnArchiveError, get_probe
+
+__all__ = [
+    "COVER_SIZE",
+    "get_first_issue",
+    "open_first_page",
+    "write_covers",
+]
+
+# MARK: Lazy Imports
+
+Image = lazy_import("PIL.Image")
+
+# MARK: Constants
+
+# The largest cover (about what Mylar gets from Comic Vine)
+COVER_SIZE = (600, 900)
+
+QUALITY = 85
+
+# MARK: Functions
+
+
+def is_page(name: str) -> bool:
+    path = PurePath(name)
+    return path.suffix.lower() in IMAGE_SUFFIXES and not is_hidden(path)
+
+
+def get_first_page(names: Iterable[str]) -> str:
+    pages = [name for name in names if is_page(name)]
+    if not pages:
+        raise ValueError("No pages")
+    return min(pages, key=natural_key)
+
+
+# The first issue of a series (in natural order), or `None` if there are none
+def get_first_issue(comics: Iterable[Union[PathLike, str]]) -> Optional[str]:
+    return min(map(fspath, comics), key=natural_key, default=None)
+
+
+# The first page of a comic, as a stream
+@contextmanager
+def open_first_page(comic: Union[PathLike, str]) -> Iterator[BinaryIO]:
+    probe = get_probe(comic)
+    if "zip" == probe.format:
+        with ZipFile(probe.path) as zf:
+            names = [info.filename for info in zf.infolist() if not info.is_dir()]
+            with zf.open(get_first_page(names)) as page:
+                yield page
+    elif probe.is_rar:
+        from rarfile import RarFile
+
+        with RarFile(probe.path) as rf:
+            names = [info.filename for info in rf.infolist() if not info.is_dir()]
+            with rf.open(get_first_page(names)) as page:
+                yield page
+    else:
+        raise NotAnArchiveError(probe)
+
+
+# Write `image` to `dst` through a temporary file next to it (see `srss.atomic`)
+def save_atomic(image: "Image.Image", dst: str) -> None:
+    with atomic_path(dst) as tmp, open(tmp, "xb") as file:
+        image.save(file, "JPEG", quality=QUALITY, optimize=True)
+
+
+# Make the cover of `comic` and write it to each of `dsts`
+def write_covers(
+    comic: Union[PathLike, str],
+    dsts: Iterable[Union[PathLike, str]],
+    size: tuple[int, int] = COVER_SIZE,
+) -> None:
+    with open_first_page(comic) as page, Image.open(page) as im:
+        # Decode a JPEG at a fraction of its size, when that's still big enough
+        im.draft("RGB", size)
+        cover = im.convert("RGB")
+    cover.thumbnail(size, Image.Resampling.LANCZOS)
+    for dst in dsts:
+        save_atomic(cover, fspath(dst))
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.covers", description="Make a cover from a comic"
+    )
+    parser.add_argument("comic", metavar="COMIC")
+    parser.add_argument("files", nargs="+", metavar="FILE", help="e.g. `cover.jpg`")
+    ns = parser.parse_args(args)
+    try:
+        write_covers(ns.comic, ns.files)
+    except Exception as e:
+        print(f"🛑 {ns.comic} 👉 {e}")
+        raise SystemExit(1)
+    print(f"🖼️ {ns.comic} 👉 {', '.join(ns.files)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Daemon
+#
+# A long-lived worker, with everything already imported, that the scripts hand their
+# paths to over a Unix socket (see `srss.client`), instead of starting a fresh Python
+# (and importing Pillow, patool, …) for every Quick Action click.
+#
+#   * The requests that arrive within `--window` (default: 50 ms) of each other are
+#     merged into one batch per script (a path selected twice is processed once).
+#   * The paths of a batch are processed on a pool of threads (`--workers`); the
+#     scripts that need all of the paths at once (`main`) run one batch at a time.
+#   * Whatever gets printed while processing a path is streamed back to the client(s)
+#     that asked for it (`sys.stdout` / `sys.stderr` are per thread here).
+#   * So are the tags that couldn't be written (each path's updates are tracked on
+#     their own, see `srss.writer.TagBatch`), so one batch never waits for another's.
+#
+# Usage:
+#   python3 -m srss.daemon [--socket PATH] [--window MS] [--workers N]
+#
+# Protocol (one JSON object per line):
+#   * Client 👉 `{"script": "comic_process", "args": ["/abs/path", …]}`
+#   * Daemon 👉 `{"out": "…"}` / `{"err": "…"}` as it goes, then `{"exit": 0}`, or
+#     `{"error": "…"}` (before anything ran) to have the client run it itself
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import json
+import socket
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
+from contextlib import contextmanager, nullcontext
+from os import chmod, cpu_count, environ, unlink
+from os.path import abspath, dirname
+from pathlib import Path
+from queue import Empty, Queue
+from signal import SIGTERM, signal
+from threading import Event, Lock, Thread, local
+from time import monotonic
+from traceback import print_exc
+from typing import Iterable, Iterator, Optional, TextIO
+
+from srss.client import get_socket_path
+from srss.scripts import SCRIPTS, Script, load_script
+from srss.trace import get_tracer
+from srss.writer import TagBatch, get_tag_writer, report_failures
+
+__all__ = [
+    "Daemon",
+]
+
+# MARK: Constants
+
+WINDOW = float(environ.get("SRSS_DAEMON_WINDOW", "0.05"))
+
+WORKERS = int(environ.get("SRSS_DAEMON_WORKERS", str(cpu_count() or 4)))
+
+# MARK: Classes
+
+
+# Stands in for `sys.stdout` / `sys.stderr`, writing to the stream of the current thread
+class ThreadLocalStream:
+    def __init__(self, default: TextIO) -> None:
+        self.default = default
+        self.local = local()
+
+    @property
+    def current(self) -> TextIO:
+        return getattr(self.local, "stream", None) or self.default
+
+    def write(self, text: str) -> int:
+        return self.current.write(text)
+
+    def flush(self) -> None:
+        self.current.flush()
+
+    def __getattr__(self, attr: str):
+        return getattr(self.current, attr)
+
+    @contextmanager
+    def redirect(self, stream: TextIO) -> Iterator[None]:
+        previous = getattr(self.local, "stream", None)
+        self.local.stream = stream
+        try:
+            yield
+        finally:
+            self.local.stream = previous
+
+
+# One connected client (i.e. one click)
+class Request:
+    def __init__(self, conn: socket.socket, script: Script, args: list[str]) -> None:
+        self.conn = conn
+        self.script = script
+        self.args = args
+        self.paths = {abspath(arg) for arg in args}
+        self.folders = {dirname(path) for path in self.paths}
+        self.exit_code = 0
+        self.done = Event()
+        self.lock = Lock()
+        self.gone = False
+
+    def send(self, message: dict) -> None:
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        with self.lock:
+            if self.gone:
+                return
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                # The Quick Action was cancelled; finish the work anyway
+                self.gone = True
+
+    # Whether the tags of `path` are this client's business (one of its paths, or a
+    # file made next to them, e.g. the CBZ of `cbz_create_from_images`)
+    def owns(self, path: str) -> bool:
+        return path in self.paths or dirname(path) in self.folders
+
+    def finish(self) -> None:
+        self.send({"exit": self.exit_code})
+        self.done.set()
+
+
+# A file-like object sending what's written to one or more clients, a line at a time
+class Channel:
+    def __init__(self, requests: Iterable[Request], kind: str) -> None:
+        self.requests = list(requests)
+        self.kind = kind
+        self.buffer = ""
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        if "\n" in self.buffer:
+            lines, _, self.buffer = self.buffer.rpartition("\n")
+            self.send(lines + "\n")
+        return len(text)
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.send(self.buffer)
+            self.buffer = ""
+
+    def send(self, text: str) -> None:
+        for request in self.requests:
+            request.send({self.kind: text})
+
+    def isatty(self) -> bool:
+        return False
+
+
+class Daemon:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        window: float = WINDOW,
+        workers: int = WORKERS,
+    ) -> None:
+        self.path = Path(path or get_socket_path())
+        self.window = window
+        self.pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="srss-daemon"
+        )
+        self.queue: Queue[Optional[Request]] = Queue()
+        # For the scripts that need all of the paths at once, so two batches don't
+        # plan (and write) the same folders side by side
+        self.main_locks = {name: Lock() for name in SCRIPTS}
+        self.stdout = ThreadLocalStream(sys.stdout)
+        self.stderr = ThreadLocalStream(sys.stderr)
+        self.sock: Optional[socket.socket] = None
+
+    def bind(self) -> None:
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+            except OSError:
+                # Left behind by a daemon that didn't shut down cleanly
+                self.path.unlink()
+            else:
+                raise RuntimeError(f"Already running ({self.path})")
+            finally:
+                probe.close()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(str(self.path))
+        chmod(self.path, 0o600)
+        self.sock.listen(64)
+
+    def serve_forever(self) -> None:
+        self.bind()
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        Thread(target=self.dispatch, name="srss-dispatch", daemon=True).start()
+        print(f"👂 srss daemon 👉 {self.path}")
+        try:
+            while True:
+                conn, _ = self.sock.accept()
+                Thread(target=self.handle, args=(conn,), daemon=True).start()
+        except (KeyboardInterrupt, OSError):
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.queue.put(None)
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self.pool.shutdown()
+        get_tag_writer().wait()
+        get_tracer().close()
+
+    # Send what's printed by the current thread to `requests`
+    @contextmanager
+    def redirect(self, requests: list[Request]) -> Iterator[None]:
+        out, err = Channel(requests, "out"), Channel(requests, "err")
+        try:
+            with self.stdout.redirect(out), self.stderr.redirect(err):
+                yield
+        finally:
+            out.flush()
+            err.flush()
+
+    def handle(self, conn: socket.socket) -> None:
+        with conn:
+            try:
+                with conn.makefile("r", encoding="utf-8") as lines:
+                    message = json.loads(lines.readline())
+                script = SCRIPTS[message["script"]]
+                args = [str(arg) for arg in message["args"]]
+                load_script(script.name)
+            except Exception as e:
+                error = f"Unknown script {e}" if isinstance(e, KeyError) else str(e)
+                try:
+                    conn.sendall(json.dumps({"error": error}).encode("utf-8") + b"\n")
+                except OSError:
+                    pass
+                return
+            request = Request(conn, script, args)
+            self.queue.put(request)
+            request.done.wait()
+
+    # Collect the requests arriving within the window of the first one, per script
+    def dispatch(self) -> None:
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = monotonic() + self.window
+            while (remaining := deadline - monotonic()) > 0:
+                try:
+                    request = self.queue.get(timeout=remaining)
+                except Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                batch.append(request)
+            by_script: dict[str, list[Request]] = {}
+            for request in batch:
+                by_script.setdefault(request.script.name, []).append(request)
+            for requests in by_script.values():
+                Thread(target=self.run_batch, args=(requests,), daemon=True).start()
+
+    def run_batch(self, requests: list[Request]) -> None:
+        script = requests[0].script
+        try:
+            module = load_script(script.name)
+            if hasattr(module, "process"):
+                self.run_paths(script, module.process, requests)
+            else:
+                self.run_main(script, module.main, requests)
+        except Exception:
+            with self.redirect(requests):
+                print_exc()
+            for request in requests:
+                request.exit_code = 1
+        finally:
+            for request in requests:
+                request.finish()
+
+    def run_paths(self, script: Script, process, requests: list[Request]) -> None:
+        # Each path once, for every client that asked for it
+        owners: dict[str, list[Request]] = {}
+        for request in requests:
+            for arg in request.args:
+                asked = owners.setdefault(arg, [])
+                if request not in asked:
+                    asked.append(request)
+
+        # The tag updates of each path, reported to the clients that asked for it
+        batches = {arg: TagBatch() for arg in owners}
+
+        def run(arg: str, asked: list[Request]) -> None:
+            with self.redirect(asked), get_tag_writer().tracking(batches[arg]):
+                try:
+                    process(arg)
+                except Exception:
+                    print_exc()
+                    for request in asked:
+                        request.exit_code = 1
+
+        futures_wait([self.pool.submit(run, *item) for item in owners.items()])
+        for arg, asked in owners.items():
+            self.report_tags(batches[arg], asked)
+
+    # For the scripts that need all of the paths at once (e.g. to group them)
+    def run_main(self, script: Script, main, requests: list[Request]) -> None:
+        args = list(dict.fromkeys(arg for request in requests for arg in request.args))
+        batch = TagBatch()
+        with self.main_locks[script.name]:
+            with self.redirect(requests), get_tag_writer().tracking(batch):
+                main(args)
+        # (`main` had the paths of every client at once, so each failure goes to the
+        # ones it's about, or only to the log of the daemon)
+        for path, errors in get_tag_writer().wait_batch(batch, report=False).items():
+            asked = [request for request in requests if request.owns(path)]
+            with self.redirect(asked) if asked else nullcontext():
+                report_failures({path: errors})
+
+    # Like the `tag_writer.wait()` at the end of the scripts, but only for the updates
+    # of `batch` (i.e. of one path), and to the clients that asked for it
+    def report_tags(self, batch: TagBatch, requests: list[Request]) -> None:
+        failures = get_tag_writer().wait_batch(batch, report=False)
+        if failures:
+            with self.redirect(requests):
+                report_failures(failures)
+
+
+# MARK: Command Line
+
+
+def stop(*_) -> None:
+    raise KeyboardInterrupt
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    parser = ArgumentParser(
+        prog="python3 -m srss.daemon",
+        description="Run the scripts for srss.client from one warm process",
+    )
+    parser.add_argument(
+        "--socket", help="Path of the socket (default: SRSS_DAEMON_SOCKET)"
+    )
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=WINDOW * 1000,
+        metavar="MS",
+        help="Merge the requests arriving this close together",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=WORKERS, help="Paths processed at once"
+    )
+    ns = parser.parse_args(args)
+
+    daemon = Daemon(ns.socket, window=ns.window / 1000, workers=ns.workers)
+    # Clean up the socket on `kill` too
+    signal(SIGTERM, stop)
+    try:
+        daemon.serve_forever()
+    except RuntimeError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Path Discovery
+#
+# Turns the paths given on the command line into the ones a script works on, lazily
+# (so the first ones are being processed while the rest are still being found):
+#   * A folder with `recursive` 👉 Every file (or, for the folder scripts, every
+#     folder) below it
+#   * `include` / `exclude` 👉 Globs matched against the name or the whole path
+#     (e.g. `*.cbz`, `*/Extras/*`); an excluded folder isn't descended into
+#
+# Notes:
+#   * Hidden files and folders (`.DS_Store`, `._*`, `.Trash`, …) are skipped when
+#     descending, but not when they're given explicitly.
+#   * Each path is only yielded once.
+#   * With `sweep`, the temporary files left by interrupted runs are removed from the
+#     folders on the way (see `srss.atomic`): the ones descended into, and those of
+#     the paths given explicitly.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from fnmatch import fnmatch
+from os import PathLike, walk
+from os.path import abspath, basename, dirname, isdir, join
+from typing import Iterable, Iterator, Sequence, Union
+
+from srss.atomic import sweep as sweep_folder
+
+__all__ = [
+    "iter_paths",
+    "matches",
+]
+
+# MARK: Functions
+
+
+def is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+def matches(
+    path: str, include: Sequence[str] = (), exclude: Sequence[str] = ()
+) -> bool:
+    name = basename(path)
+    if include and not any(fnmatch(name, g) or fnmatch(path, g) for g in include):
+        return False
+    return not any(fnmatch(name, g) or fnmatch(path, g) for g in exclude)
+
+
+def walk_dir(
+    root: str,
+    target: str,
+    include: Sequence[str],
+    exclude: Sequence[str],
+    sweep: bool = False,
+) -> Iterator[str]:
+    for dir_path, dir_names, file_names in walk(root):
+        if sweep:
+            sweep_folder(dir_path, file_names)
+        # Prune (in place, so `walk` doesn't descend) and keep the order stable
+        dir_names[:] = sorted(
+            name
+            for name in dir_names
+            if not is_hidden(name) and matches(join(dir_path, name), exclude=exclude)
+        )
+        if "dirs" == target:
+            names = dir_names
+        else:
+            names = sorted(name for name in file_names if not is_hidden(name))
+        for name in names:
+            path = join(dir_path, name)
+            if matches(path, include, exclude):
+                yield path
+
+
+def iter_paths(
+    args: Iterable[Union[PathLike, str]],
+    target: str = "files",
+    recursive: bool = False,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    sweep: bool = False,
+) -> Iterator[str]:
+    seen = set()
+    swept = set()
+    for arg in args:
+        path = abspath(arg)
+        if recursive and isdir(path):
+            paths = walk_dir(path, target, include, exclude, sweep)
+        else:
+            paths = [path] if matches(path, include, exclude) else []
+            if sweep and dirname(path) not in swept:
+                swept.add(dirname(path))
+                sweep_folder(dirname(path))
+        for path in paths:
+            if path not in seen:
+                seen.add(path)
+                yield path
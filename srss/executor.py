@@ -0,0 +1,156 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Executor
+#
+# Runs a script over a (possibly huge, possibly still being discovered) stream of
+# paths, `jobs` at a time, on the kind of pool its workload calls for:
+#   * `cpu` 👉 Processes (the GIL would keep Pillow & co. on one core)
+#   * `subprocess` / `metadata` 👉 Threads (they mostly wait)
+#
+# Notes:
+#   * The paths are submitted as they come, with only a few per job in flight, so a
+#     whole library doesn't have to be discovered (or held) up front.
+#   * A path that blows up is reported and counted, instead of stopping the run.
+#   * Each worker process loads the script itself (by name, see `srss.scripts`) and
+#     waits for its own tag writes after each path, since the pool doesn't run
+#     `atexit` in its processes.
+#   * The scripts without `process` get all of the paths at once (every script can
+#     take several paths at once otherwise, since none of them changes the working
+#     directory anymore, see `srss.cbz`).
+#   * The worker processes send what they traced (see `srss.trace`) back with each
+#     path, for the summary at the end of the run.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from concurrent.futures import FIRST_COMPLETED, Executor, Future
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
+from os import cpu_count
+from pathlib import PurePath
+from traceback import print_exc
+from typing import Iterable, Optional
+
+from srss.scripts import Script, load_script
+from srss.trace import get_tracer
+from srss.writer import get_tag_writer
+
+__all__ = [
+    "ScriptExecutor",
+]
+
+# MARK: Constants
+
+JOBS = cpu_count() or 4
+
+# Paths submitted ahead of the workers, per job
+IN_FLIGHT = 4
+
+# MARK: Functions
+
+
+# What a worker process runs (a module-level function, so it can be pickled)
+def process_in_worker(name: str, arg: str):
+    tracer = get_tracer()
+    tracer.script = name
+    try:
+        load_script(name).process(arg)
+        get_tag_writer().wait()
+    finally:
+        recorded = tracer.take()
+    return recorded
+
+
+def report_error(arg: str, e: BaseException) -> None:
+    print(f"🛑 {PurePath(arg).name} 👉 {type(e).__name__}: {e}")
+
+
+# MARK: Classes
+
+
+# One per run; the pools are only started when a script needs them
+class ScriptExecutor:
+    def __init__(self, jobs: int = JOBS) -> None:
+        self.jobs = max(1, jobs)
+        self.threads: Optional[ThreadPoolExecutor] = None
+        self.processes: Optional[ProcessPoolExecutor] = None
+        self.failed = 0
+
+    def __enter__(self) -> "ScriptExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for pool in (self.threads, self.processes):
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        self.threads = self.processes = None
+
+    def get_pool(self, script: Script) -> Executor:
+        if "cpu" == script.workload:
+            if self.processes is None:
+                self.processes = ProcessPoolExecutor(max_workers=self.jobs)
+            return self.processes
+        if self.threads is None:
+            self.threads = ThreadPoolExecutor(
+                max_workers=self.jobs, thread_name_prefix="srss-jobs"
+            )
+        return self.threads
+
+    # Run `script` on every path; returns how many of them failed
+    def run(self, script: Script, args: Iterable[str]) -> int:
+        self.failed = 0
+        get_tracer().script = script.name
+        module = load_script(script.name)
+        if not hasattr(module, "process"):
+            self.run_main(module.main, list(args))
+        elif 1 == self.jobs:
+            for arg in args:
+                self.run_one(module.process, arg)
+        else:
+            self.run_pool(script, module.process, args)
+        # Like the end of the scripts' `main`
+        get_tag_writer().wait()
+        return self.failed
+
+    def run_main(self, main, args: list[str]) -> None:
+        try:
+            main(args)
+        except Exception:
+            print_exc()
+            self.failed += 1
+
+    def run_one(self, process, arg: str) -> None:
+        try:
+            process(arg)
+        except Exception as e:
+            report_error(arg, e)
+            self.failed += 1
+
+    def run_pool(self, script: Script, process, args: Iterable[str]) -> None:
+        pool = self.get_pool(script)
+        in_process = pool is self.processes
+        pending: dict[Future, str] = {}
+
+        def collect(done: Iterable[Future]) -> None:
+            for future in done:
+                arg = pending.pop(future)
+                e = future.exception()
+                if e is not None:
+                    report_error(arg, e)
+                    self.failed += 1
+                elif in_process:
+                    get_tracer().merge(future.result())
+
+        for arg in args:
+            if in_process:
+                future = pool.submit(process_in_worker, script.name, arg)
+            else:
+                future = pool.submit(process, arg)
+            pending[future] = arg
+            if self.jobs * IN_FLIGHT <= len(pending):
+                done, _ = futures_wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        done, _ = futures_wait(pending)
+        collect(done)
@@ -0,0 +1,160 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Geometry
+#
+# The size of the pages of a comic, from the first few KB of each page (instead of
+# decoding them with Pillow):
+#   * JPEG 👉 The start of frame (SOF) marker, skipping the segments before it
+#   * PNG 👉 The IHDR chunk
+#   * WebP 👉 The VP8 / VP8L / VP8X chunk
+#   * GIF / BMP 👉 Their (fixed) headers
+#
+# And what they say about the comic:
+#   * The most common page size (e.g. `1988x3056`) and its orientation (see
+#     `ORIENTATION_TAGS`), which shows the low-resolution scans
+#   * The spreads 👉 Landscape pages, in a comic whose pages are portrait
+#   * The outliers 👉 Pages that are neither the common size nor a spread of it
+#     (e.g. pages from another scan, in a mixed release)
+#
+# Notes:
+#   * The sizes are the stored ones (like `Image.size`), i.e. the EXIF orientation is
+#     ignored.
+#   * A page whose size can't be read from its header (e.g. a TIFF) isn't counted.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from collections import Counter
+from struct import error as StructError
+from struct import unpack_from
+from typing import Iterable, NamedTuple, Optional
+
+from srss.media import ORIENTATION_TAGS, get_aspect_ratio
+
+__all__ = [
+    "HEADER_SIZE",
+    "PageStats",
+    "get_image_size",
+    "get_page_stats",
+]
+
+# MARK: Constants
+
+# Enough for the segments in front of nearly every JPEG's SOF (EXIF, ICC, …)
+HEADER_SIZE = 64 << 10
+
+# How far from the common size a page can be and still be that size
+TOLERANCE = 0.1
+
+# The start of frame markers (i.e. not DHT, JPG, DAC)
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# The markers without a length
+STANDALONE_MARKERS = {0x01, 0xD8, *range(0xD0, 0xD8)}
+
+# MARK: Classes
+
+
+class PageStats(NamedTuple):
+    # The pages whose size could be read
+    pages: int
+    # The most common size
+    size: tuple[int, int]
+    # e.g. `{"Portrait": 22, "Landscape": 2}`
+    orientations: dict[str, int]
+    spreads: int
+    # The names of the pages that are neither the common size nor a spread of it
+    outliers: list[str]
+
+    def __str__(self) -> str:
+        w, h = self.size
+        text = f"{w}x{h} ({self.pages} pages, {self.spreads} spreads"
+        return f"{text}, {len(self.outliers)} outliers)"
+
+
+# MARK: Functions
+
+
+def get_jpeg_size(data: bytes) -> Optional[tuple[int, int]]:
+    pos = 2
+    while pos + 9 <= len(data):
+        if 0xFF != data[pos]:
+            return None
+        marker = data[pos + 1]
+        if 0xFF == marker:
+            # Fill byte
+            pos += 1
+        elif marker in STANDALONE_MARKERS:
+            pos += 2
+        elif marker in SOF_MARKERS:
+            h, w = unpack_from(">HH", data, pos + 5)
+            return w, h
+        else:
+            (length,) = unpack_from(">H", data, pos + 2)
+            pos += 2 + length
+    return None
+
+
+def get_webp_size(data: bytes) -> Optional[tuple[int, int]]:
+    chunk = bytes(data[12:16])
+    if b"VP8 " == chunk and 30 <= len(data):
+        w, h = unpack_from("<HH", data, 26)
+        return w & 0x3FFF, h & 0x3FFF
+    if b"VP8L" == chunk and 25 <= len(data):
+        b0, b1, b2, b3 = data[21:25]
+        return 1 + (b0 | (b1 & 0x3F) << 8), 1 + (b1 >> 6 | b2 << 2 | (b3 & 0x0F) << 10)
+    if b"VP8X" == chunk and 30 <= len(data):
+        w = int.from_bytes(data[24:27], "little")
+        h = int.from_bytes(data[27:30], "little")
+        return 1 + w, 1 + h
+    return None
+
+
+# (width, height) from the start of an image, or `None` if it can't be told
+def get_image_size(data: bytes) -> Optional[tuple[int, int]]:
+    head = bytes(data[:16])
+    try:
+        if head.startswith(b"\xff\xd8"):
+            return get_jpeg_size(data)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and 24 <= len(data):
+            return unpack_from(">II", data, 16)
+        if head.startswith(b"RIFF") and b"WEBP" == head[8:12]:
+            return get_webp_size(data)
+        if head.startswith((b"GIF87a", b"GIF89a")):
+            return unpack_from("<HH", data, 6)
+        if head.startswith(b"BM") and 26 <= len(data):
+            w, h = unpack_from("<ii", data, 18)
+            # Negative when the rows are stored top to bottom
+            return w, abs(h)
+    except (IndexError, StructError):
+        # Cut short
+        pass
+    return None
+
+
+def is_close(value: int, target: int) -> bool:
+    return abs(value - target) <= TOLERANCE * target
+
+
+# The stats of `(name, width, height)` pages, or `None` if there are none
+def get_page_stats(sizes: Iterable[tuple[str, int, int]]) -> Optional[PageStats]:
+    sizes = [(name, w, h) for name, w, h in sizes if w and h]
+    if not sizes:
+        return None
+    common = Counter((w, h) for _, w, h in sizes).most_common(1)[0][0]
+    cw, ch = common
+    portrait = cw < ch
+    orientations: Counter[str] = Counter()
+    spreads = 0
+    outliers = []
+    for name, w, h in sizes:
+        ratio = get_aspect_ratio(w, h)
+        for tag, test in ORIENTATION_TAGS.items():
+            if test(ratio):
+                orientations[tag.name] += 1
+                break
+        spread = portrait and 1 < ratio
+        spreads += spread
+        # A spread is two pages side by side
+        if not (is_close(h, ch) and is_close(w, 2 * cw if spread else cw)):
+            outliers.append(name)
+    return PageStats(len(sizes), common, dict(orientations), spreads, outliers)
@@ -0,0 +1,33 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Homebrew
+#
+# Quick Actions run with a bare `PATH`, so `patool` (`rar`, `7z`, …) and
+# `imageio_ffmpeg` (`ffmpeg`) can't find the binaries installed with Homebrew.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from os import environ, pathsep
+
+__all__ = [
+    "HOMEBREW_PATHS",
+    "add_homebrew_to_path",
+]
+
+# MARK: Constants
+
+HOMEBREW_PATHS = [
+    "/usr/local/bin",  # Intel
+    "/opt/homebrew/bin",  # Apple Silicon
+    "/opt/homebrew/sbin",
+]
+
+# MARK: Functions
+
+
+# Append the Homebrew directories to `PATH` (once, however often it's called)
+def add_homebrew_to_path() -> None:
+    paths = environ.get("PATH", "").split(pathsep)
+    missing = [path for path in HOMEBREW_PATHS if path not in paths]
+    if missing:
+        environ["PATH"] = pathsep.join([*filter(None, paths), *missing])
@@ -0,0 +1,360 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Tag Index
+#
+# A local SQLite mirror of the tags written by the scripts (keyed by path, with the
+# inode and mtime to notice when a file was replaced), so finding every "Corrupt
+# Comic" doesn't take a Finder search or a crawl reading the xattrs of every file.
+#
+# Usage:
+#   python3 -m srss.index query --tag "Corrupt Comic"
+#   python3 -m srss.index query --color RED --prefix /Volumes/Library/Comics
+#   python3 -m srss.index reconcile [--prefix PATH] [--full] [--walk DIR ...]
+#
+# The index lives at `SRSS_TAG_INDEX` (default: `~/Library/Caches/srss/tags.sqlite3`
+# on macOS and `$XDG_CACHE_HOME/srss/tags.sqlite3` elsewhere). Set it to `off` to
+# turn it off.
+#
+# Notes:
+#   * Only tagged files are indexed; a file whose last tag is removed is forgotten.
+#   * A commit that wrote nothing is only mirrored when the index doesn't have the file
+#     yet (e.g. it was tagged before the index), so it costs a lookup, not a write.
+#   * `reconcile` forgets the files that are gone, and skips (and reports) the ones it
+#     can't read (e.g. a volume that isn't mounted), so they're kept.
+#   * Anything that goes wrong with the index is reported and ignored, so it never
+#     gets in the way of the tagging itself.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import sqlite3
+from os import PathLike, environ, stat_result
+from os import walk as os_walk
+from os.path import abspath, join
+from pathlib import Path
+from sys import platform
+from threading import Lock
+from time import time
+from typing import Iterable, Optional, Sequence, Union
+
+from srss.backends import Color, Tag, TagBackend, get_backend
+
+__all__ = [
+    "TagIndex",
+    "get_index",
+]
+
+# MARK: Constants
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER,
+    mtime_ns INTEGER,
+    indexed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tags (
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    color INTEGER NOT NULL,
+    PRIMARY KEY (path, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_name ON tags (name);
+CREATE INDEX IF NOT EXISTS tags_color ON tags (color);
+"""
+
+OFF = ["", "0", "false", "no", "off"]
+
+# MARK: Functions
+
+
+def get_default_index_path() -> Path:
+    if "darwin" == platform:
+        cache = Path.home() / "Library" / "Caches"
+    else:
+        cache = Path(environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return cache / "srss" / "tags.sqlite3"
+
+
+# `abspath` rather than `resolve` to skip the `stat` of every path component
+def normalize(path: Union[PathLike, str]) -> str:
+    return abspath(path)
+
+
+# Everything at or below `prefix`, as a range on the primary key (`/` + 1 is `0`)
+def prefix_range(prefix: Union[PathLike, str]) -> tuple[str, str, str]:
+    prefix = normalize(prefix).rstrip("/")
+    return prefix, f"{prefix}/", f"{prefix}0"
+
+
+def warn(e: Exception) -> None:
+    print(f"⚠️ Tag index 👉 {e}")
+
+
+# MARK: Classes
+
+
+class TagIndex:
+    def __init__(self, path: Union[PathLike, str]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the threads of a script, so serialize its use
+        self.lock = Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode = WAL")
+            self.db.execute("PRAGMA synchronous = NORMAL")
+            self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    def _forget(self, path: str) -> None:
+        self.db.execute("DELETE FROM tags WHERE path = ?", (path,))
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _record(
+        self, path: str, tags: Sequence[Tag], st: Optional[stat_result]
+    ) -> None:
+        self._forget(path)
+        if not tags:
+            return
+        self.db.execute(
+            "INSERT INTO files (path, inode, mtime_ns, indexed_at) VALUES (?, ?, ?, ?)",
+            (
+                path,
+                st.st_ino if st else None,
+                st.st_mtime_ns if st else None,
+                time(),
+            ),
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO tags (path, position, name, color) "
+            "VALUES (?, ?, ?, ?)",
+            [(path, i, tag.name, tag.color.value) for i, tag in enumerate(tags)],
+        )
+
+    # Mirror the tags of `file` (i.e. right after they were written)
+    def record(self, file: Union[PathLike, str], tags: Sequence[Tag]) -> None:
+        path = normalize(file)
+        try:
+            st = Path(path).stat()
+        except OSError:
+            st = None
+        with self.lock, self.db:
+            self._record(path, tags, st)
+
+    def forget(self, file: Union[PathLike, str]) -> None:
+        with self.lock, self.db:
+            self._forget(normalize(file))
+
+    def has(self, file: Union[PathLike, str]) -> bool:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM files WHERE path = ?", (normalize(file),)
+            ).fetchone()
+        return row is not None
+
+    # Returns `{path: [tags]}` for the files with a matching tag
+    def query(
+        self,
+        name: Optional[str] = None,
+        color: Optional[Color] = None,
+        prefix: Optional[Union[PathLike, str]] = None,
+    ) -> dict[str, list[Tag]]:
+        conditions, params = [], []
+        if name is not None:
+            conditions.append("name = ?")
+            params.append(name)
+        if color is not None:
+            conditions.append("color = ?")
+            params.append(color.value)
+        if prefix is not None:
+            conditions.append("(path = ? OR (path >= ? AND path < ?))")
+            params.extend(prefix_range(prefix))
+        where = " AND ".join(conditions) or "1"
+        sql = (
+            "SELECT path, name, color FROM tags "
+            f"WHERE path IN (SELECT path FROM tags WHERE {where}) "
+            "ORDER BY path, position"
+        )
+        results: dict[str, list[Tag]] = {}
+        with self.lock:
+            for path, tag_name, tag_color in self.db.execute(sql, params):
+                results.setdefault(path, []).append(Tag(tag_name, Color(tag_color)))
+        return results
+
+    # Repair drift: forget the missing files and re-read the tags of the replaced ones
+    # (or of all of them with `full`); the ones that can't be read are skipped
+    def reconcile(
+        self,
+        backend: Optional[TagBackend] = None,
+        prefix: Optional[Union[PathLike, str]] = None,
+        full: bool = False,
+    ) -> dict[str, int]:
+        backend = backend or get_backend()
+        counts = {"checked": 0, "removed": 0, "updated": 0, "skipped": 0}
+        sql = "SELECT path, inode, mtime_ns FROM files"
+        params: Sequence[str] = ()
+        if prefix is not None:
+            sql += " WHERE path = ? OR (path >= ? AND path < ?)"
+            params = prefix_range(prefix)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        for path, inode, mtime_ns in rows:
+            counts["checked"] += 1
+            try:
+                st = Path(path).stat()
+            except FileNotFoundError:
+                with self.lock, self.db:
+                    self._forget(path)
+                counts["removed"] += 1
+                continue
+            except OSError as e:
+                # e.g. not allowed, or its volume isn't there (so it's kept)
+                warn(e)
+                counts["skipped"] += 1
+                continue
+            if full or (st.st_ino, st.st_mtime_ns) != (inode, mtime_ns):
+                try:
+                    tags = backend.get_all(path)
+                except OSError as e:
+                    warn(e)
+                    counts["skipped"] += 1
+                    continue
+                with self.lock, self.db:
+                    self._record(path, tags, st)
+                counts["updated"] += 1
+        return counts
+
+    # Read the tags of everything under `root` (the slow crawl, for (re)building it)
+    def walk(
+        self, root: Union[PathLike, str], backend: Optional[TagBackend] = None
+    ) -> int:
+        backend = backend or get_backend()
+        cnt = 0
+        for dir_path, dir_names, file_names in os_walk(normalize(root)):
+            for name in [*dir_names, *file_names]:
+                path = join(dir_path, name)
+                try:
+                    tags = backend.get_all(path)
+                    st = Path(path).stat()
+                except OSError:
+                    continue
+                with self.lock, self.db:
+                    self._record(path, tags, st)
+                cnt += 1
+        return cnt
+
+
+_index: Optional[TagIndex] = None
+_index_loaded = False
+_index_lock = Lock()
+
+
+# The index at `SRSS_TAG_INDEX` (or the default), or `None` if it's off or broken
+def get_index() -> Optional[TagIndex]:
+    global _index, _index_loaded
+    # (Locked, so a thread asking while it's being opened waits for it rather than
+    # going without)
+    with _index_lock:
+        if not _index_loaded:
+            location = environ.get("SRSS_TAG_INDEX", str(get_default_index_path()))
+            if location.strip().lower() not in OFF:
+                try:
+                    _index = TagIndex(location)
+                except (OSError, sqlite3.Error) as e:
+                    # Reported once, and then gone without
+                    warn(e)
+            _index_loaded = True
+    return _index
+
+
+# Best-effort mirroring for `TagSession`; when nothing was `written`, only if the
+# index doesn't have it yet (or, untagged, still does)
+def mirror(
+    file: Union[PathLike, str], tags: Sequence[Tag], written: bool = True
+) -> None:
+    index = get_index()
+    if index is None:
+        return
+    try:
+        if not written and index.has(file) == bool(tags):
+            return
+        index.record(file, tags)
+    except sqlite3.Error as e:
+        warn(e)
+
+
+def mirror_forget(file: Union[PathLike, str]) -> None:
+    index = get_index()
+    if index is None:
+        return
+    try:
+        index.forget(file)
+    except sqlite3.Error as e:
+        warn(e)
+
+
+# MARK: Command Line
+
+
+def parse_color(value: str) -> Color:
+    return Color(int(value)) if value.isdigit() else Color[value.upper()]
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    # Here, so the scripts don't pay for it
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.index", description="Query and repair the tag index"
+    )
+    parser.add_argument("--index", help="Path of the index (default: SRSS_TAG_INDEX)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="List the files with a matching tag")
+    query.add_argument("--tag", help="Tag name (exact)")
+    query.add_argument("--color", type=parse_color, help="Tag color (e.g. RED or 6)")
+    query.add_argument("--prefix", help="Only files at or below this path")
+    query.add_argument("--long", action="store_true", help="Also list the tags")
+
+    reconcile = commands.add_parser("reconcile", help="Repair drift")
+    reconcile.add_argument("--prefix", help="Only files at or below this path")
+    reconcile.add_argument(
+        "--full", action="store_true", help="Re-read the tags of every indexed file"
+    )
+    reconcile.add_argument(
+        "--walk",
+        nargs="*",
+        default=[],
+        metavar="DIR",
+        help="Also crawl these directories for tagged files not in the index yet",
+    )
+
+    ns = parser.parse_args(args)
+    index = TagIndex(ns.index) if ns.index else get_index()
+    if index is None:
+        parser.error("The tag index is off (SRSS_TAG_INDEX)")
+
+    if "query" == ns.command:
+        results = index.query(name=ns.tag, color=ns.color, prefix=ns.prefix)
+        for path, tags in results.items():
+            if ns.long:
+                print(f"{path}\t{', '.join(tag.name for tag in tags)}")
+            else:
+                print(path)
+    elif "reconcile" == ns.command:
+        counts = index.reconcile(prefix=ns.prefix, full=ns.full)
+        print(
+            f"🔎 Checked {counts['checked']} 👉 "
+            f"{counts['updated']} updated, {counts['removed']} removed, "
+            f"{counts['skipped']} skipped"
+        )
+        for root in ns.walk:
+            print(f"🔎 Walked {root} 👉 {index.walk(root)} files")
+
+
+if __name__ == "__main__":
+    main()
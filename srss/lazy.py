@@ -0,0 +1,63 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Lazy Imports
+#
+# The scripts run once per Quick Action click, so the imports are most of the wait.
+# The heavy dependencies (Pillow, imageio_ffmpeg, patool, rarfile, send2trash) are
+# only imported when they are first used, instead of by every run of every script.
+#
+# e.g.
+#   Image = lazy_import("PIL.Image")  # `from PIL import Image`
+#   send2trash = lazy_import("send2trash", "send2trash")  # `from send2trash import …`
+#
+# Notes:
+#   * A missing dependency only fails when (and if) it's used.
+#   * `import_module` holds the import lock, so the first use is thread-safe.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from importlib import import_module
+from types import ModuleType
+from typing import Any, Callable, Optional, Union
+
+__all__ = [
+    "LazyModule",
+    "lazy_import",
+]
+
+# MARK: Classes
+
+
+# Stands in for a module until one of its attributes is used
+class LazyModule:
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+# MARK: Functions
+
+
+# A module, or a function from it (imported on the first call)
+def lazy_import(name: str, attr: Optional[str] = None) -> Union[LazyModule, Callable]:
+    module = LazyModule(name)
+    if attr is None:
+        return module
+
+    def call(*args, **kwargs):
+        return getattr(module, attr)(*args, **kwargs)
+
+    call.__name__ = call.__qualname__ = attr
+    return call
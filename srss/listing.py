@@ -0,0 +1,217 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Listing
+#
+# What's in an archive (how many files of each suffix, and how big they are), from its
+# headers alone, without touching the data of a single member:
+#   * ZIP (CBZ) 👉 The end of central directory and the central directory, through a
+#     memory map (so only the pages they're on are read: a few KB)
+#   * RAR (CBR) 👉 The block headers (`rarfile`), skipping over the data
+#   * 7z (CB7) 👉 The header at the end (`py7zr`)
+#   * tar (CBT) 👉 The 512 byte header in front of each member, skipping over the data
+#
+# With `pages`, the size of each page too (see `srss.geometry`), from the first 4 KB of
+# it (64 KB for the few JPEGs that need more), read through the memory map (ZIP and
+# tar only; the pages of a RAR or 7z would have to be decompressed to get there).
+#
+# The kind of archive is found from its magic bytes, not its suffix (a `.cbr` is often
+# a ZIP), and the archive is opened only once.
+#
+# Usage:
+#   python3 -m srss.listing [--pages] FILE ...
+#
+# Notes:
+#   * Folders and hidden files (e.g. `.DS_Store`) aren't counted.
+#   * Nothing is shared between the listings, so they can run on as many threads as
+#     there are archives (e.g. `python3 -m srss archive-tag-contents -j 16 …`).
+#
+# External Dependencies
+#   * https://pypi.org/project/py7zr/ (7z only)
+#   * https://pypi.org/project/rarfile/ (RAR only)
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from functools import partial
+from mmap import ACCESS_READ, mmap
+from os import PathLike, fspath, fstat
+from pathlib import PurePath
+from struct import error as StructError
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, Union
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+from zlib import MAX_WBITS, decompressobj
+from zlib import error as ZlibError
+
+from srss.geometry import HEADER_SIZE, PageStats, get_image_size, get_page_stats
+from srss.media import IMAGE_SUFFIXES
+from srss.probe import RAR4, RAR5, SEVEN_ZIP, ZipEntry, iter_zip, read_tail
+from srss.verify import LOCAL_HEADER, LOCAL_SIGNATURE
+
+__all__ = [
+    "Listing",
+    "is_hidden",
+    "is_page",
+    "iter_zip_members",
+    "list_archive",
+    "read_page_size",
+]
+
+# MARK: Constants
+
+# Where a (POSIX or GNU) tar header says what it is
+TAR_MAGIC = (257, b"ustar")
+
+# Enough for the size of nearly every page (see `HEADER_SIZE` for the others)
+PEEK_SIZE = 4 << 10
+
+# (name, uncompressed size, a function reading the first bytes of it, if it can)
+Member = tuple[str, int, Optional[Callable[[int], bytes]]]
+
+# MARK: Classes
+
+
+class Listing(NamedTuple):
+    format: str
+    # e.g. `{".jpg": 24, ".xml": 1}`
+    counts: dict[str, int]
+    # The (uncompressed) bytes of each suffix
+    sizes: dict[str, int]
+    # With `pages` (and when there are any)
+    pages: Optional[PageStats] = None
+
+    def __str__(self) -> str:
+        kinds = ", ".join(
+            f"{suffix or '(none)'} {cnt} ({self.sizes[suffix]} bytes)"
+            for suffix, cnt in sorted(self.counts.items())
+        )
+        pages = f" 📐 {self.pages}" if self.pages else ""
+        return f"{self.format}: {kinds or 'empty'}{pages}"
+
+
+# MARK: Functions
+
+
+def is_hidden(path: Union[PathLike, str]) -> bool:
+    return PurePath(path).stem.startswith(".")
+
+
+def is_page(name: str) -> bool:
+    return PurePath(name).suffix.lower() in IMAGE_SUFFIXES
+
+
+# The first `n` bytes of a ZIP member (inflated, if need be)
+# (nothing, when it's broken or compressed some other way)
+def read_zip_head(mapped: mmap, entry: ZipEntry, n: int) -> bytes:
+    try:
+        header = LOCAL_HEADER.unpack_from(mapped, entry.offset)
+        if LOCAL_SIGNATURE != header[0]:
+            return b""
+        start = entry.offset + LOCAL_HEADER.size + header[-2] + header[-1]
+        data = mapped[start : start + min(n, entry.compressed)]
+        if ZIP_STORED == entry.method:
+            return data
+        if ZIP_DEFLATED == entry.method:
+            return decompressobj(-MAX_WBITS).decompress(data, n)
+    except (StructError, ZlibError):
+        pass
+    return b""
+
+
+def iter_zip_members(mapped: mmap, size: int) -> Iterator[Member]:
+    # A memory map reads and seeks like a file
+    for entry in iter_zip(mapped, size, read_tail(mapped, size)):
+        yield entry.name, entry.size, partial(read_zip_head, mapped, entry)
+
+
+def iter_rar(file: BinaryIO) -> Iterator[Member]:
+    from rarfile import RarFile
+
+    with RarFile(file) as rf:
+        for info in rf.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, None
+
+
+def iter_7z(file: BinaryIO) -> Iterator[Member]:
+    from py7zr import SevenZipFile
+
+    with SevenZipFile(file) as archive:
+        for info in archive.list():
+            if not info.is_directory:
+                yield info.filename, info.uncompressed, None
+
+
+def iter_tar(file: BinaryIO, mapped: mmap) -> Iterator[Member]:
+    from tarfile import open as tar_open
+
+    def read_head(start: int, size: int, n: int) -> bytes:
+        return mapped[start : start + min(n, size)]
+
+    # Iterating (instead of `getmembers`) reads the headers one by one
+    with tar_open(fileobj=file, mode="r:") as tf:
+        for info in tf:
+            if info.isfile():
+                head = partial(read_head, info.offset_data, info.size)
+                yield info.name, info.size, head
+
+
+# The size of a page, from as little of it as possible
+def read_page_size(read_head: Callable[[int], bytes]) -> Optional[tuple[int, int]]:
+    head = read_head(PEEK_SIZE)
+    found = get_image_size(head)
+    if found is None and PEEK_SIZE <= len(head):
+        found = get_image_size(read_head(HEADER_SIZE))
+    return found
+
+
+def list_archive(path: Union[PathLike, str], pages: bool = False) -> Listing:
+    counts: dict[str, int] = {}
+    sizes: dict[str, int] = {}
+    page_sizes = []
+    with open(fspath(path), "rb") as file:
+        size = fstat(file.fileno()).st_size
+        if not size:
+            raise ValueError("Empty file")
+        with mmap(file.fileno(), 0, access=ACCESS_READ) as mapped:
+            offset, magic = TAR_MAGIC
+            if mapped[: len(RAR5)] == RAR5 or mapped[: len(RAR4)] == RAR4:
+                fmt, members = "rar", iter_rar(file)
+            elif mapped[: len(SEVEN_ZIP)] == SEVEN_ZIP:
+                fmt, members = "7z", iter_7z(file)
+            elif mapped[offset : offset + len(magic)] == magic:
+                fmt, members = "tar", iter_tar(file, mapped)
+            else:
+                fmt, members = "zip", iter_zip_members(mapped, size)
+            for name, file_size, read_head in members:
+                if is_hidden(name):
+                    continue
+                suffix = PurePath(name).suffix.lower()
+                counts[suffix] = counts.get(suffix, 0) + 1
+                sizes[suffix] = sizes.get(suffix, 0) + file_size
+                if pages and read_head is not None and is_page(name):
+                    page_size = read_page_size(read_head)
+                    if page_size is not None:
+                        page_sizes.append((name, *page_size))
+    return Listing(fmt, counts, sizes, get_page_stats(page_sizes))
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.listing", description="What's in archives"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    parser.add_argument("--pages", action="store_true", help="Also the page sizes")
+    ns = parser.parse_args(args)
+    for file in ns.files:
+        try:
+            print(f"📦 {file} 👉 {list_archive(file, pages=ns.pages)}")
+        except Exception as e:
+            print(f"🛑 {file} 👉 {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Media
+#
+# The suffixes and tags shared by the image, video, comic and Plex scripts
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from srss.backends import Color, Tag
+
+__all__ = [
+    "COMIC_SUFFIXES",
+    "IMAGE_SUFFIXES",
+    "MOVIE_SUFFIXES",
+    "ORIENTATION_TAGS",
+    "get_aspect_ratio",
+]
+
+# MARK: Suffixes
+
+COMIC_SUFFIXES = [".cbz", ".cbr"]
+
+IMAGE_SUFFIXES = [
+    ".bmp",
+    ".gif",
+    ".jpeg",
+    ".jpg",
+    ".png",
+    ".tiff",
+    ".webp",
+]
+
+# TODO: Find if there is an official list of movie suffixes for Plex
+MOVIE_SUFFIXES = [
+    ".asf",
+    ".avi",
+    ".divx",
+    ".flv",
+    ".m4v",
+    ".mkv",
+    ".mov",
+    ".mp4",
+    ".mpg",
+    ".mpeg",
+    ".ogv",
+    ".ogm",
+    ".rm",
+    ".rmvb",
+    ".ts",
+    ".vob",
+    ".webm",
+    ".wmv",
+]
+
+# MARK: Tags
+
+ORIENTATION_TAGS = {
+    Tag(name="Portrait", color=Color.ORANGE): lambda ratio: ratio < 1,
+    Tag(name="Square", color=Color.GRAY): lambda ratio: 1 == ratio,
+    Tag(name="Landscape", color=Color.PURPLE): lambda ratio: 1 < ratio,
+}
+
+# MARK: Functions
+
+
+def get_aspect_ratio(w: int, h: int) -> float:
+    return w / h
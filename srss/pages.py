@@ -0,0 +1,224 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Pages
+#
+# The deep check of a CBZ: a CBZ whose CRCs are all fine can still have pages that
+# were cut short (or were never images), which the readers then choke on. So, after
+# `srss.verify`, every page is read by Pillow:
+#   * `verify()` 👉 The structure of the file (e.g. the chunks of a PNG)
+#   * `load()` 👉 The whole image decoded (e.g. a JPEG cut short)
+#
+# The pages are streamed out of the archive, straight into Pillow (nothing is written
+# to disk), on a pool of processes (shared by every archive being checked), so each
+# worker only ever holds about one decoded page.
+#
+# Usage:
+#   python3 -m srss.pages FILE ...
+#   python3 -m srss comic-process --deep -r /Volumes/Library/Comics
+#
+# Notes:
+#   * `SRSS_DEEP_VERIFY=1` (or `--deep`) turns it on for `comic_process`; it's off by
+#     default, since it decodes every page of every comic.
+#   * `SRSS_PAGE_WORKERS` sets the number of processes (default: one per core; `1`
+#     checks the pages in the calling thread).
+#   * The members that aren't images (e.g. `ComicInfo.xml`) are left alone.
+#   * The worker processes are spawned, not forked: by then the process has threads
+#     (the tag writer, the verify and deflate pools) and SQLite connections, which a
+#     fork can leave locked in the child.
+#   * Pages of up to `SRSS_PAGE_MAX_PIXELS` are decoded (default: 256 M; Pillow's own
+#     limit is about 89 M, which big double-page scans go over). A bigger page isn't
+#     decoded, and is counted as `page_too_large` rather than as corrupt.
+#
+# External Dependencies
+#   * https://pypi.org/project/pillow/
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from os import PathLike, cpu_count, environ, fspath, stat
+from pathlib import PurePath
+from threading import Lock
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+from zipfile import ZipFile, ZipInfo
+
+from srss.lazy import lazy_import
+from srss.media import IMAGE_SUFFIXES
+from srss.trace import count
+from srss.verify import VERIFIER, BadMember, CorruptArchiveError, Verification
+from srss.verify import test_zip
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+__all__ = [
+    "PAGES_VERIFIER",
+    "check_pages",
+    "get_pool",
+    "get_zip",
+    "is_deep",
+    "test_pages",
+]
+
+# MARK: Lazy Imports
+
+Image = lazy_import("PIL.Image")
+
+# MARK: Constants
+
+OFF = ["", "0", "false", "no", "off"]
+
+# Part of each verification record (`srss.verified`); bump it when the checks change
+PAGES_VERIFIER = f"{VERIFIER}+pages/1"
+
+PAGE_WORKERS = int(environ.get("SRSS_PAGE_WORKERS", str(cpu_count() or 4)))
+
+PAGE_MAX_PIXELS = int(environ.get("SRSS_PAGE_MAX_PIXELS", str(256 << 20)))
+
+# What `check_page_in` returns for a page too big to decode (not an error)
+TOO_LARGE = "Too large"
+
+# MARK: Functions
+
+
+# Read each time, since `--deep` sets it after the imports
+def is_deep() -> bool:
+    return environ.get("SRSS_DEEP_VERIFY", "").strip().lower() not in OFF
+
+
+def is_page(name: str) -> bool:
+    return PurePath(name).suffix.lower() in IMAGE_SUFFIXES
+
+
+# Check one page; returns the error, if any
+def check_page_in(zf: ZipFile, info: ZipInfo) -> Optional[str]:
+    try:
+        # `verify` leaves the image unusable, so it's opened again to decode it
+        with zf.open(info) as member, Image.open(member) as im:
+            im.verify()
+        with zf.open(info) as member, Image.open(member) as im:
+            im.load()
+    except Image.UnidentifiedImageError:
+        return "Not an image"
+    except Image.DecompressionBombError:
+        return TOO_LARGE
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+
+# The archive a worker process last opened (its pages tend to come in a row)
+_zip: Optional[tuple[str, int, ZipFile]] = None
+
+
+def get_zip(path: str) -> ZipFile:
+    global _zip
+    mtime_ns = stat(path).st_mtime_ns
+    if _zip is None or _zip[:2] != (path, mtime_ns):
+        if _zip is not None:
+            _zip[2].close()
+        _zip = (path, mtime_ns, ZipFile(path))
+    return _zip[2]
+
+
+# What a worker process runs (a module-level function, so it can be pickled); the
+# member is the `i`-th of the archive, since two members can have one name
+def check_page(path: str, i: int) -> Optional[str]:
+    try:
+        zf = get_zip(path)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return check_page_in(zf, zf.infolist()[i])
+
+
+# Let Pillow decode pages of up to `PAGE_MAX_PIXELS` (it only refuses twice its limit,
+# and warns in between); what each worker process runs first
+def set_pixel_limit() -> None:
+    from warnings import simplefilter
+
+    # (The module itself, since `Image` only stands in for it)
+    from PIL import Image as module
+
+    module.MAX_IMAGE_PIXELS = PAGE_MAX_PIXELS // 2
+    simplefilter("ignore", module.DecompressionBombWarning)
+
+
+_pool: Optional["ProcessPoolExecutor"] = None
+_pool_lock = Lock()
+
+
+def get_pool() -> "ProcessPoolExecutor":
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            from multiprocessing import get_context
+
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, PAGE_WORKERS),
+                mp_context=get_context("spawn"),
+                initializer=set_pixel_limit,
+            )
+        return _pool
+
+
+# The pages of `path` that Pillow can't read (in the order of the archive)
+def check_pages(
+    path: Union[PathLike, str], workers: int = PAGE_WORKERS
+) -> list[BadMember]:
+    path = fspath(path)
+    with ZipFile(path) as zf:
+        pages = [
+            (i, info)
+            for i, info in enumerate(zf.infolist())
+            if not info.is_dir() and is_page(info.filename)
+        ]
+        if workers <= 1 or len(pages) <= 1:
+            set_pixel_limit()
+            errors = [check_page_in(zf, info) for _, info in pages]
+    if 1 < workers and 1 < len(pages):
+        pool = get_pool()
+        futures = [pool.submit(check_page, path, i) for i, _ in pages]
+        errors = [future.result() for future in futures]
+    too_large = errors.count(TOO_LARGE)
+    if too_large:
+        count("page_too_large", path, too_large)
+    return [
+        BadMember(info.filename, error)
+        for (_, info), error in zip(pages, errors)
+        if error is not None and TOO_LARGE != error
+    ]
+
+
+# Like `srss.verify.test_zip`, then every page; raises when any of it is bad
+def test_pages(path: Union[PathLike, str]) -> Verification:
+    result = test_zip(path, "full")
+    bad = check_pages(path)
+    if bad:
+        raise CorruptArchiveError(result._replace(bad=bad))
+    return result
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.pages", description="Decode every page of CBZs"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    ns = parser.parse_args(args)
+    failed = False
+    for file in ns.files:
+        try:
+            test_pages(file)
+            print(f"✅ {file} 👉 Every page decodes")
+        except Exception as e:
+            failed = True
+            print(f"🛑 {file} 👉 {e}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
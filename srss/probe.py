@@ -0,0 +1,423 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Probe
+#
+# What a comic actually is, from one open of the file, instead of asking `is_zipfile`,
+# `is_rarfile` and `patool` in turn (each of them opening it again):
+#   * The magic bytes (the first 64) 👉 ZIP, RAR 4, RAR 5, 7z, PDF, or an HTML page
+#     (what a failed download is usually saved as)
+#   * ZIP 👉 The end of central directory (in the last 64 KiB), then the central
+#     directory itself, for the number of members and their total size
+#   * RAR 👉 The block headers, one after the other (RARs have no central directory)
+#   * 7z 👉 The start header, which says where the archive should end
+#   * `truncated` 👉 An archive that ends before its headers say it should
+#
+# The descriptors are cached (by path, size and mtime), so a comic that is renamed
+# (e.g. `.cbr` ➡️ `.cbz`) or seen again (e.g. by the daemon) isn't read again.
+#
+# Usage:
+#   python3 -m srss.probe FILE ...
+#
+# Notes:
+#   * Only the headers are read; the data (and its CRCs) is `srss.verify`'s job.
+#   * The members of RARs with encrypted headers (and of 7z archives) aren't counted.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from os import PathLike, fspath, stat
+from struct import Struct
+from threading import Lock
+from typing import BinaryIO, Iterable, Iterator, Literal, NamedTuple, Optional, Union
+
+__all__ = [
+    "NotAnArchiveError",
+    "Probe",
+    "TruncatedError",
+    "ZipEntry",
+    "get_probe",
+    "iter_zip",
+    "move_probe",
+    "probe_file",
+    "read_tail",
+]
+
+# MARK: Constants
+
+HEAD_SIZE = 64
+
+# The end of central directory, and the longest comment it can have
+TAIL_SIZE = 22 + 0xFFFF
+
+CACHE_SIZE = 4096
+
+ZIP_LOCAL = b"PK\x03\x04"
+ZIP_EMPTY = b"PK\x05\x06"
+RAR4 = b"Rar!\x1a\x07\x00"
+RAR5 = b"Rar!\x1a\x07\x01\x00"
+SEVEN_ZIP = b"7z\xbc\xaf\x27\x1c"
+PDF = b"%PDF-"
+
+# signature, disks, entries (this disk, total), directory size and offset, comment
+ZIP_END = Struct("<4s4H2LH")
+# signature, disk, offset of the ZIP64 end of central directory, disks
+ZIP64_LOCATOR = Struct("<4sLQL")
+# signature, size, versions, disks, entries (this disk, total), directory size, offset
+ZIP64_END = Struct("<4sQ2H2L4Q")
+# signature, versions, flags, method, time, date, CRC, sizes, name/extra/comment
+# lengths, disk, attributes, offset
+ZIP_CENTRAL = Struct("<4s4B4HL2L5H2L")
+
+# CRC, type, flags, size
+RAR4_BLOCK = Struct("<HBHH")
+RAR4_FILE = 0x74
+RAR4_ARCHIVE = 0x73
+RAR4_END = 0x7B
+
+RAR5_FILE = 2
+RAR5_ENCRYPTION = 4
+RAR5_END = 5
+
+# version, CRC, where the (next) header is, its size and its CRC
+SEVEN_ZIP_START = Struct("<2sLQQL")
+
+Format = Literal["zip", "rar4", "rar5", "7z", "pdf", "html", "truncated", "unknown"]
+
+# MARK: Classes
+
+
+class Probe(NamedTuple):
+    path: str
+    format: Format
+    size: int
+    # The files (not the folders) in the archive, when its headers could be read
+    members: Optional[int] = None
+    # Their total (uncompressed) size
+    uncompressed: Optional[int] = None
+    # Why it's `truncated` (or `unknown`)
+    error: Optional[str] = None
+    mtime_ns: int = 0
+
+    @property
+    def is_rar(self) -> bool:
+        return self.format in ("rar4", "rar5")
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"{self.format} ({self.error})"
+        if self.members is None:
+            return self.format
+        return f"{self.format}, {self.members} members, {self.uncompressed} bytes"
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    # Uncompressed
+    size: int
+    method: int
+    # Where its local header is
+    offset: int
+    compressed: int
+
+
+class NotAnArchiveError(Exception):
+    def __init__(self, probe: Probe) -> None:
+        super().__init__(f"Not an archive: {probe}")
+        self.probe = probe
+
+
+class TruncatedError(Exception):
+    pass
+
+
+# MARK: Functions
+
+
+def read_at(file: BinaryIO, offset: int, size: int) -> bytes:
+    file.seek(offset)
+    data = file.read(size)
+    if len(data) < size:
+        raise TruncatedError(f"Ends at {offset + len(data)}, expected {offset + size}")
+    return data
+
+
+# The ZIP64 sizes and offset of a member (in its extra field), for the ones too large
+# for 32 bits
+def get_zip64_fields(extra: bytes) -> list[int]:
+    while 4 <= len(extra):
+        kind = int.from_bytes(extra[:2], "little")
+        length = int.from_bytes(extra[2:4], "little")
+        if 0x0001 == kind:
+            data = extra[4 : 4 + length]
+            return [
+                int.from_bytes(data[i : i + 8], "little")
+                for i in range(0, len(data) - 7, 8)
+            ]
+        extra = extra[4 + length :]
+    return []
+
+
+# The end of the file, as far back as the end of central directory can be (only its
+# last bytes when there's no ZIP comment, which is nearly always)
+def read_tail(file: BinaryIO, size: int) -> bytes:
+    short = ZIP64_LOCATOR.size + ZIP_END.size
+    tail = read_at(file, max(0, size - short), min(size, short))
+    if tail[-ZIP_END.size :].startswith(ZIP_EMPTY) and tail.endswith(b"\0\0"):
+        return tail
+    return read_at(file, max(0, size - TAIL_SIZE), min(size, TAIL_SIZE))
+
+
+# Each file in a ZIP, from its central directory (`tail` being the end of the file,
+# e.g. from `read_tail`)
+def iter_zip(file: BinaryIO, size: int, tail: bytes) -> Iterator[ZipEntry]:
+    at = tail.rfind(ZIP_EMPTY)
+    if at < 0 or len(tail) < at + ZIP_END.size:
+        raise TruncatedError("No end of central directory")
+    end = size - len(tail) + at
+    _, _, _, _, entries, cd_size, cd_offset, _ = ZIP_END.unpack_from(tail, at)
+    cd_end = end
+    if 0xFFFF == entries or 0xFFFFFFFF in (cd_size, cd_offset):
+        # The locator, right before the end of central directory, says where the ZIP64
+        # one is
+        locator = at - ZIP64_LOCATOR.size
+        if locator < 0 or b"PK\x06\x07" != tail[locator : locator + 4]:
+            raise TruncatedError("No ZIP64 end of central directory")
+        _, _, cd_end, _ = ZIP64_LOCATOR.unpack_from(tail, locator)
+        try:
+            record = read_at(file, cd_end, ZIP64_END.size)
+        except TruncatedError:
+            record = b""
+        if not record.startswith(b"PK\x06\x06"):
+            # Shifted by something before the archive (e.g. a self-extractor), so
+            # right before the locator (i.e. without an extensible data field)
+            cd_end = end - ZIP64_LOCATOR.size - ZIP64_END.size
+            record = read_at(file, max(0, cd_end), ZIP64_END.size)
+            if cd_end < 0 or not record.startswith(b"PK\x06\x06"):
+                raise TruncatedError("No ZIP64 end of central directory")
+        fields = ZIP64_END.unpack(record)
+        entries, cd_size, cd_offset = fields[-3:]
+    # Anything before the archive (e.g. a self-extractor) shifts everything
+    cd_start = cd_end - cd_size
+    if cd_start < 0 or cd_start < cd_offset:
+        raise TruncatedError("Central directory before the start of the file")
+    if size - len(tail) <= cd_start:
+        directory = tail[cd_start - (size - len(tail)) : at]
+    else:
+        directory = read_at(file, cd_start, cd_size)
+    pos = 0
+    for _ in range(entries):
+        if len(directory) < pos + ZIP_CENTRAL.size:
+            raise TruncatedError("Central directory cut short")
+        fields = ZIP_CENTRAL.unpack_from(directory, pos)
+        flags, method, compressed, file_size = fields[5], fields[6], *fields[10:12]
+        name_len, extra_len, comment_len = fields[12:15]
+        name = directory[pos + ZIP_CENTRAL.size : pos + ZIP_CENTRAL.size + name_len]
+        extra_at = pos + ZIP_CENTRAL.size + name_len
+        extra = directory[extra_at : extra_at + extra_len]
+        # The ZIP64 fields come in this order, and only for the ones that don't fit
+        zip64 = iter(get_zip64_fields(extra))
+        if 0xFFFFFFFF == file_size:
+            file_size = next(zip64, file_size)
+        if 0xFFFFFFFF == compressed:
+            compressed = next(zip64, compressed)
+        offset = fields[-1]
+        if 0xFFFFFFFF == offset:
+            offset = next(zip64, offset)
+        # Shifted like the central directory (e.g. by a self-extractor)
+        offset += cd_start - cd_offset
+        if not name.endswith(b"/"):
+            # Like `zipfile`: UTF-8 when flagged as such, the DOS code page otherwise
+            name = name.decode("utf-8" if flags & 0x800 else "cp437")
+            yield ZipEntry(name, file_size, method, offset, compressed)
+        pos = extra_at + extra_len + comment_len
+
+
+def probe_zip(file: BinaryIO, size: int, tail: bytes) -> tuple[int, int]:
+    members = uncompressed = 0
+    for entry in iter_zip(file, size, tail):
+        members += 1
+        uncompressed += entry.size
+    return members, uncompressed
+
+
+def probe_rar4(file: BinaryIO, size: int) -> tuple[Optional[int], Optional[int]]:
+    members = uncompressed = 0
+    pos = len(RAR4)
+    while pos < size:
+        block = read_at(file, pos, RAR4_BLOCK.size)
+        _, kind, flags, head_size = RAR4_BLOCK.unpack(block)
+        if head_size < RAR4_BLOCK.size:
+            raise TruncatedError(f"Bad block header at {pos}")
+        data_size = 0
+        if RAR4_FILE == kind:
+            fields = read_at(file, pos, 40 if flags & 0x100 else 15)
+            data_size = int.from_bytes(fields[7:11], "little")
+            file_size = int.from_bytes(fields[11:15], "little")
+            # Large files: the high 32 bits follow the fixed fields
+            if flags & 0x100:
+                data_size |= int.from_bytes(fields[32:36], "little") << 32
+                file_size |= int.from_bytes(fields[36:40], "little") << 32
+            if 0xE0 != flags & 0xE0:
+                members += 1
+                uncompressed += file_size
+        elif RAR4_ARCHIVE == kind and flags & 0x80:
+            # The block headers are encrypted too
+            return None, None
+        elif RAR4_END == kind:
+            return members, uncompressed
+        elif flags & 0x8000:
+            data_size = int.from_bytes(read_at(file, pos + 7, 4), "little")
+        pos += head_size + data_size
+    if size < pos:
+        raise TruncatedError(f"Ends at {size}, expected {pos}")
+    return members, uncompressed
+
+
+# A RAR 5 variable length integer (and where the next field starts)
+def read_vint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        if len(data) <= pos:
+            raise TruncatedError("Header cut short")
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos, shift = pos + 1, shift + 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def probe_rar5(file: BinaryIO, size: int) -> tuple[Optional[int], Optional[int]]:
+    members = uncompressed = 0
+    pos = len(RAR5)
+    while pos < size:
+        start = read_at(file, pos, min(7, size - pos))
+        head_size, at = read_vint(start, 4)
+        header = read_at(file, pos + at, head_size)
+        kind, i = read_vint(header, 0)
+        flags, i = read_vint(header, i)
+        if flags & 0x1:
+            _, i = read_vint(header, i)
+        data_size = 0
+        if flags & 0x2:
+            data_size, i = read_vint(header, i)
+        if RAR5_FILE == kind:
+            file_flags, i = read_vint(header, i)
+            file_size, i = read_vint(header, i)
+            if not file_flags & 0x1:
+                members += 1
+                uncompressed += file_size
+        elif RAR5_ENCRYPTION == kind:
+            return None, None
+        elif RAR5_END == kind:
+            return members, uncompressed
+        pos += at + head_size + data_size
+    if size < pos:
+        raise TruncatedError(f"Ends at {size}, expected {pos}")
+    return members, uncompressed
+
+
+def probe_7z(head: bytes, size: int) -> None:
+    if len(head) < len(SEVEN_ZIP) + SEVEN_ZIP_START.size:
+        raise TruncatedError("Start header cut short")
+    _, _, offset, length, _ = SEVEN_ZIP_START.unpack_from(head, len(SEVEN_ZIP))
+    end = len(SEVEN_ZIP) + SEVEN_ZIP_START.size + offset + length
+    if size < end:
+        raise TruncatedError(f"Ends at {size}, expected {end}")
+
+
+def is_html(head: bytes) -> bool:
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    return text.startswith(b"<") and (b"<html" in text or b"<!doctype html" in text)
+
+
+# Always reads the file (see `get_probe` for the cached descriptor)
+def probe_file(path: Union[PathLike, str]) -> Probe:
+    path = fspath(path)
+    with open(path, "rb") as file:
+        st = stat(file.fileno())
+        size = st.st_size
+        head = file.read(HEAD_SIZE)
+        fmt: Format = "unknown"
+        members = uncompressed = error = None
+        try:
+            if not head:
+                raise TruncatedError("Empty")
+            if head.startswith(RAR5):
+                fmt = "rar5"
+                members, uncompressed = probe_rar5(file, size)
+            elif head.startswith(RAR4):
+                fmt = "rar4"
+                members, uncompressed = probe_rar4(file, size)
+            elif head.startswith(SEVEN_ZIP):
+                fmt = "7z"
+                probe_7z(head, size)
+            elif head.startswith(PDF):
+                fmt = "pdf"
+            elif is_html(head):
+                fmt = "html"
+            else:
+                # ZIPs can have something before them, so the end is what counts
+                tail = head
+                if HEAD_SIZE < size:
+                    tail = read_at(file, max(0, size - TAIL_SIZE), min(size, TAIL_SIZE))
+                if head.startswith((ZIP_LOCAL, ZIP_EMPTY)) or ZIP_EMPTY in tail:
+                    fmt = "zip"
+                    members, uncompressed = probe_zip(file, size, tail)
+                else:
+                    error = "Unrecognized magic bytes"
+        except TruncatedError as e:
+            fmt, members, uncompressed, error = "truncated", None, None, str(e)
+    return Probe(path, fmt, size, members, uncompressed, error, st.st_mtime_ns)
+
+
+_cache: dict[str, Probe] = {}
+_cache_lock = Lock()
+
+
+def remember(probe: Probe) -> Probe:
+    with _cache_lock:
+        _cache.pop(probe.path, None)
+        _cache[probe.path] = probe
+        if CACHE_SIZE < len(_cache):
+            del _cache[next(iter(_cache))]
+    return probe
+
+
+# The descriptor of `path`, read again only when its size or mtime changed
+def get_probe(path: Union[PathLike, str]) -> Probe:
+    path = fspath(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached is not None:
+        st = stat(path)
+        if (st.st_size, st.st_mtime_ns) == (cached.size, cached.mtime_ns):
+            return cached
+    return remember(probe_file(path))
+
+
+# After renaming the file (a rename keeps the mtime, so it's still the same file)
+def move_probe(probe: Probe, dst: Union[PathLike, str]) -> Probe:
+    with _cache_lock:
+        _cache.pop(probe.path, None)
+    return remember(probe._replace(path=fspath(dst)))
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.probe", description="What archives actually are"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    ns = parser.parse_args(args)
+    for file in ns.files:
+        try:
+            print(f"🔎 {file} 👉 {probe_file(file)}")
+        except OSError as e:
+            print(f"🛑 {file} 👉 {e}")
+
+
+if __name__ == "__main__":
+    main()
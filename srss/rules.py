@@ -0,0 +1,84 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Tag Ownership Rules
+#
+# Each script declares the tags it owns (i.e. the ones it replaces on every run) once,
+# as a module constant:
+#   * Exact tags/names 👉 a `frozenset` lookup
+#   * Patterns (optionally only for one color) 👉 one combined alternation per color
+#   * Colors 👉 a `frozenset` lookup (every tag of that color)
+#
+# So every tag on a file is classified in one pass, instead of running `re.search`
+# for every (tag, pattern) pair.
+#
+# Notes:
+#   * Patterns must match the whole tag name (`fullmatch`), so e.g. `\d+x\d+` doesn't
+#     claim someone else's `Scan 1920x1080 (Old)` tag.
+#   * Flags on compiled patterns are dropped when they are combined.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from re import Pattern
+from re import compile as re_compile
+from typing import Iterable, Optional, Tuple, Union
+
+from srss.backends import Color, Tag
+
+__all__ = [
+    "TagRules",
+]
+
+# A pattern owns the matching tags of any color, or only the ones of the given color
+PatternRule = Union[Pattern, str, Tuple[Union[Pattern, str], Optional[Color]]]
+
+# MARK: Classes
+
+
+# e.g.
+#   OWNED_TAGS = TagRules(
+#       tags=[TAG_CORRUPT, *ORIENTATION_TAGS.keys()],
+#       patterns=[(r"\d+x\d+", GREEN), (r"\d{2}:\d{2}:\d{2}", BLUE)],
+#   )
+class TagRules:
+    def __init__(
+        self,
+        tags: Iterable[Union[Tag, str]] = (),
+        patterns: Iterable[PatternRule] = (),
+        colors: Iterable[Color] = (),
+    ) -> None:
+        self.names = frozenset(t.name if isinstance(t, Tag) else t for t in tags)
+        self.colors = frozenset(colors)
+        alternatives: dict[Optional[Color], list[str]] = {}
+        for rule in patterns:
+            pattern, color = rule if isinstance(rule, tuple) else (rule, None)
+            if isinstance(pattern, Pattern):
+                pattern = pattern.pattern
+            alternatives.setdefault(color, []).append(f"(?:{pattern})")
+        # `None` holds the patterns for any color
+        self.patterns = {
+            color: re_compile("|".join(alts)) for color, alts in alternatives.items()
+        }
+
+    # Accepts the loose lists (`Tag`s, names and patterns) `TagSession` used to take
+    @classmethod
+    def from_owned(cls, owned: Iterable[Union[Tag, str, Pattern]]) -> "TagRules":
+        tags, patterns = [], []
+        for rule in owned:
+            (patterns if isinstance(rule, Pattern) else tags).append(rule)
+        return cls(tags=tags, patterns=patterns)
+
+    def owns(self, tag: Tag) -> bool:
+        if tag.name in self.names or tag.color in self.colors:
+            return True
+        for color in (None, tag.color):
+            pattern = self.patterns.get(color)
+            if pattern is not None and pattern.fullmatch(tag.name):
+                return True
+        return False
+
+    # Split the tags into (owned, foreign) in one pass
+    def classify(self, tags: Iterable[Tag]) -> tuple[list[Tag], list[Tag]]:
+        owned, foreign = [], []
+        for tag in tags:
+            (owned if self.owns(tag) else foreign).append(tag)
+        return owned, foreign
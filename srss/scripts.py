@@ -0,0 +1,175 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Scripts
+#
+# The scripts in the checkout, by name, so something other than a Quick Action (e.g.
+# `srss.daemon` or `python3 -m srss`) can load them once and call their entry points:
+#   * `process(arg)` 👉 One path (most scripts)
+#   * `main(args)` 👉 All of the paths, the way a Quick Action runs it
+#
+# Each script also declares what it works on and what it spends its time on, which
+# is what `srss.executor` picks threads or processes by:
+#   * `cpu` 👉 Decoding in Python (e.g. Pillow's `verify`), so processes
+#   * `subprocess` 👉 Waiting on `ffmpeg`, `unrar`, `7z`, … so threads
+#   * `metadata` 👉 Waiting on `stat`s and xattrs (i.e. tagging), so threads
+#
+# Notes:
+#   * The name is also what the script passes to `srss.client.run_script`, since a
+#     script pasted into a Shortcut doesn't know its own file.
+#   * Some of the file names aren't valid module names (`video-…`), so they are
+#     loaded from their path.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import sys
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from threading import Lock
+from types import ModuleType
+from typing import Literal, NamedTuple
+
+__all__ = [
+    "SCRIPTS",
+    "Script",
+    "load_script",
+]
+
+# MARK: Constants
+
+ROOT = Path(__file__).resolve().parents[1]
+
+Workload = Literal["cpu", "subprocess", "metadata"]
+
+Target = Literal["files", "dirs"]
+
+# MARK: Classes
+
+
+class Script(NamedTuple):
+    name: str
+    # The subcommand of `python3 -m srss`
+    command: str
+    help: str
+    workload: Workload
+    target: Target
+
+    @property
+    def file(self) -> Path:
+        return ROOT / f"{self.name}.py"
+
+    @property
+    def module_name(self) -> str:
+        return f"srss_script_{self.name.replace('-', '_')}"
+
+
+SCRIPTS = {
+    script.name: script
+    for script in [
+        Script(
+            "archive_tag_contents",
+            "archive-tag-contents",
+            "Tag archives with the count of each kind of file inside",
+            "metadata",
+            "files",
+        ),
+        Script(
+            "cbz_create_from_folder",
+            "cbz-from-folder",
+            "Create a CBZ from each folder",
+            "subprocess",
+            "dirs",
+        ),
+        Script(
+            "cbz_create_from_images",
+            "cbz-from-images",
+            "Create a CBZ from the images in each folder",
+            "subprocess",
+            "files",
+        ),
+        Script(
+            "comic_process",
+            "comic-process",
+            "Fix, repack and test comics",
+            "subprocess",
+            "files",
+        ),
+        Script(
+            "comic_transcode",
+            "comic-transcode",
+            "Make smaller copies of CBZs for a reading device",
+            "subprocess",
+            "files",
+        ),
+        Script(
+            "image_tag_info",
+            "image-tag-info",
+            "Tag images with their resolution and orientation",
+            "cpu",
+            "files",
+        ),
+        Script(
+            "mylar_tag_series_folder",
+            "mylar-tag-series-folder",
+            "Tag Mylar series folders",
+            "metadata",
+            "dirs",
+        ),
+        Script(
+            "plex_tag_movie_folder",
+            "plex-tag-movie-folder",
+            "Tag Plex movie folders",
+            "metadata",
+            "dirs",
+        ),
+        Script(
+            "plex_tag_music_video_type",
+            "plex-tag-music-video-type",
+            "Tag Plex music videos with their type",
+            "metadata",
+            "files",
+        ),
+        Script(
+            "video-rename-with-resolution",
+            "video-rename-with-resolution",
+            "Put the resolution in the name of videos",
+            "subprocess",
+            "files",
+        ),
+        Script(
+            "video-tag-wrong-resolution-in-file-name",
+            "video-tag-wrong-resolution",
+            "Tag videos with the wrong resolution in their name",
+            "subprocess",
+            "files",
+        ),
+        Script(
+            "video_tag_info",
+            "video-tag-info",
+            "Tag videos with their duration, resolution and orientation",
+            "subprocess",
+            "files",
+        ),
+    ]
+}
+
+# MARK: Functions
+
+_lock = Lock()
+
+
+# Import a script (once) as a module, without running its `__main__` part
+def load_script(name: str) -> ModuleType:
+    script = SCRIPTS[name]
+    with _lock:
+        module = sys.modules.get(script.module_name)
+        if module is None:
+            spec = spec_from_file_location(script.module_name, script.file)
+            module = module_from_spec(spec)
+            # Registered first, so what it defines can be pickled by reference
+            sys.modules[script.module_name] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[script.module_name]
+                raise
+    return module
@@ -0,0 +1,166 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Tags
+#
+# Notes:
+#   * Every `macos_tags.add` / `macos_tags.remove` is a full read+encode+write of the
+#     `_kMDItemUserTags` xattr, so tagging a file one tag at a time costs 5–10 round
+#     trips. `TagSession` reads the tags once and writes (at most) once.
+#   * Writing identical tags still bumps the ctime, which sets off rsync and Plex, so
+#     nothing is written when nothing changed.
+#   * `Tag` equality ignores the color, so the tags are compared as `str(tag)`, which
+#     includes it.
+#   * The tags are stored by a backend from `srss.backends` (`macos_tags` by default on
+#     macOS and `user.*` xattrs on Linux).
+#   * Every commit is mirrored into the tag index (`srss.index`); one that wrote
+#     nothing only when the index doesn't have the file yet.
+#   * The tags are only read when first needed, so when the commit is queued on the
+#     `srss.writer.TagWriter`, the read happens in its worker thread too.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from os import PathLike
+from re import Pattern
+from typing import Iterable, Optional, Union
+
+from srss.backends import Color, Tag, TagBackend, get_backend
+from srss.index import mirror, mirror_forget
+from srss.rules import TagRules
+
+__all__ = [
+    "Color",
+    "Tag",
+    "TagRules",
+    "TagSession",
+    "add_tag",
+    "get_all_tags",
+    "remove_tag",
+    "set_all_tags",
+]
+
+# The tags a script owns: its `TagRules`, or a list of `Tag`s, names and patterns
+Owned = Union[TagRules, Iterable[Union[Tag, str, Pattern]]]
+
+# MARK: Functions
+
+
+def get_all_tags(
+    file: Union[PathLike, str], backend: Optional[TagBackend] = None
+) -> list[Tag]:
+    return (backend or get_backend()).get_all(file)
+
+
+def set_all_tags(
+    tags: Iterable[Tag],
+    file: Union[PathLike, str],
+    backend: Optional[TagBackend] = None,
+) -> None:
+    (backend or get_backend()).set_all(tags, file)
+
+
+# Add a single tag (read once, write only if missing)
+def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
+    with TagSession(file) as session:
+        session.add(tag)
+
+
+# Remove a single tag (read once, write only if present)
+def remove_tag(tag: Tag, file: Union[PathLike, str]) -> None:
+    with TagSession(file, owned=[tag]):
+        pass
+
+
+# MARK: Classes
+
+
+# Read the tags on a file once, collect the changes and then write them at most once
+#
+# The tags matching `owned` are the ones the script manages: any of them that are not
+# (re-)added during the session are removed on commit. Every other tag is left alone,
+# in place. The added tags go after the kept tags in the order they were added (the
+# order matters when sorting by tags in Finder).
+#
+# e.g.
+#   OWNED_TAGS = TagRules(tags=[TAG_CORRUPT], patterns=[(r"\d+x\d+", GREEN)])
+#   with TagSession(path, owned=OWNED_TAGS) as tags:
+#       tags.add(Tag(name=f"{w}x{h}", color=GREEN))
+class TagSession:
+    def __init__(
+        self,
+        file: Union[PathLike, str],
+        owned: Owned = (),
+        backend: Optional[TagBackend] = None,
+    ) -> None:
+        self.file = file
+        self.backend = backend or get_backend()
+        # Scripts should pass a module-level `TagRules` so it's only compiled once
+        if not isinstance(owned, TagRules):
+            owned = TagRules.from_owned(owned)
+        self.rules = owned
+        self.added: dict[str, Tag] = {}
+        self._original: Optional[list[Tag]] = None
+
+    def __enter__(self) -> "TagSession":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Don't write half of a change if the script blew up part way through
+        if exc_type is None:
+            self.commit()
+
+    # The tags the file had (read once, on first use)
+    @property
+    def original(self) -> list[Tag]:
+        if self._original is None:
+            self._original = self.backend.get_all(self.file)
+        return self._original
+
+    def is_owned(self, tag: Tag) -> bool:
+        return self.rules.owns(tag)
+
+    def add(self, tag: Tag) -> None:
+        self.added[tag.name] = tag
+
+    def discard(self, tag: Tag) -> None:
+        self.added.pop(tag.name, None)
+
+    def has(self, tag: Tag) -> bool:
+        if tag.name in self.added:
+            return True
+        return tag.name in [t.name for t in self.tags]
+
+    # The tags the file will have after the commit
+    @property
+    def tags(self) -> list[Tag]:
+        _, foreign = self.rules.classify(self.original)
+        tags = [self.added.get(tag.name, tag) for tag in foreign]
+        names = {tag.name for tag in tags}
+        tags += [tag for name, tag in self.added.items() if name not in names]
+        return tags
+
+    @property
+    def changed(self) -> bool:
+        return [str(tag) for tag in self.tags] != [str(tag) for tag in self.original]
+
+    # The file was renamed (the tags go with it), so just follow it
+    def rename(self, file: Union[PathLike, str]) -> None:
+        mirror_forget(self.file)
+        self.file = file
+
+    # The file was replaced (e.g. repacked), so re-read the tags of the new one
+    def reset(self, file: Optional[Union[PathLike, str]] = None) -> None:
+        if file is not None:
+            mirror_forget(self.file)
+            self.file = file
+        self._original = None
+
+    # Write the tags if (and only if) they changed; returns whether it wrote
+    def commit(self) -> bool:
+        tags = self.tags
+        written = self.changed
+        if written:
+            self.backend.set_all(tags, self.file)
+            self._original = tags
+        # Even when nothing was written, so files tagged before the index get into it
+        mirror(self.file, tags, written)
+        return written
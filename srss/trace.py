@@ -0,0 +1,387 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Trace
+#
+# What the scripts do, as events, so a long run can be taken apart afterwards:
+#   * Spans 👉 One stage for one path (`discovery`, `probe`, `validate`, `convert`,
+#     `tag`, `trash`), with how long it took (and how many bytes it went through)
+#   * Counts 👉 The outcomes (`valid`, `corrupt`, `collision`, `repack_failed`, …)
+#   * Notes 👉 The messages for humans, which are still printed, in one shape for
+#     every script: `ICON NAME 👉 TEXT` (e.g. `🛑 Comic.cbz 👉 Not a file`), the name
+#     rather than the whole path, then the error (if any) on the next line
+#
+# That shape changed a few of the older messages, e.g. `〘1080p〛👉 Movie.mkv` is now
+# `🏷️ Movie.mkv 👉 1080p`, `📏 Movie.mkv (name) 👉 1080p` is `📏 Movie.mkv 👉 1080p
+# (name)`, and the renames show the new name only (the folder doesn't change).
+#
+# Usage:
+#   SRSS_TRACE=FILE python3 -m srss comic-process -r /Volumes/Library/Comics
+#   python3 -m srss.trace [--slowest 10] [--json] FILE ...
+#
+# Notes:
+#   * `SRSS_TRACE=FILE` appends every event to FILE as JSON Lines (`-` for stderr), and
+#     a `summary` event at the end of the run (p50/p95/max of each stage, the counts
+#     and the slowest files), which is also printed to stderr.
+#   * Without it, nothing is recorded (the notes are only printed).
+#   * `python3 -m srss.trace` summarizes trace files, e.g. of the daemon (which runs
+#     for days) or of several runs together.
+#   * The worker processes append to the same file and send what they recorded back
+#     to the parent, so the summary covers them too.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import sys
+from atexit import register as atexit_register
+from collections import Counter
+from math import ceil
+from os import PathLike, environ, fspath, getpid
+from pathlib import PurePath
+from threading import Lock
+from time import perf_counter, time
+from typing import Iterable, Iterator, Optional, TextIO, TypeVar, Union
+
+__all__ = [
+    "Span",
+    "Tracer",
+    "count",
+    "get_tracer",
+    "note",
+    "render_summary",
+    "span",
+    "summarize",
+    "timed",
+]
+
+# MARK: Constants
+
+OFF = ["", "0", "false", "no", "off"]
+
+SLOWEST = 10
+
+T = TypeVar("T")
+
+# (stage, path, seconds, bytes)
+Record = tuple[str, Optional[str], float, Optional[int]]
+
+# MARK: Functions
+
+
+def get_path(path: Optional[Union[PathLike, str]]) -> Optional[str]:
+    return None if path is None else fspath(path)
+
+
+# The nearest-rank percentile of (sorted) `values`
+def percentile(values: list[float], q: float) -> float:
+    return values[max(0, ceil(q * len(values)) - 1)]
+
+
+def summarize(
+    spans: Iterable[Record], counts: dict[str, int], slowest: int = SLOWEST
+) -> dict:
+    by_stage: dict[str, list[float]] = {}
+    sizes: Counter[str] = Counter()
+    by_path: Counter[str] = Counter()
+    for stage, path, seconds, size in spans:
+        by_stage.setdefault(stage, []).append(seconds)
+        if size:
+            sizes[stage] += size
+        if path is not None:
+            by_path[path] += seconds
+    stages = {}
+    for stage, times in sorted(by_stage.items()):
+        times.sort()
+        stages[stage] = {
+            "n": len(times),
+            "total_ms": sum(times) * 1000,
+            "p50_ms": percentile(times, 0.5) * 1000,
+            "p95_ms": percentile(times, 0.95) * 1000,
+            "max_ms": times[-1] * 1000,
+            "bytes": sizes[stage],
+        }
+    return {
+        "stages": stages,
+        "counts": dict(sorted(counts.items())),
+        "slowest": [
+            {"path": path, "ms": seconds * 1000}
+            for path, seconds in by_path.most_common(slowest)
+        ],
+    }
+
+
+def render_summary(summary: dict) -> list[str]:
+    lines = []
+    if summary["stages"]:
+        width = max(len(stage) for stage in summary["stages"])
+        lines.append(
+            f"📊 {'':{width}}  {'n':>6}  {'p50':>8}  {'p95':>8}  {'max':>8}  "
+            f"{'total':>9}  (ms)"
+        )
+        for stage, stats in summary["stages"].items():
+            lines.append(
+                f"   {stage:{width}}  {stats['n']:6}  {stats['p50_ms']:8.1f}  "
+                f"{stats['p95_ms']:8.1f}  {stats['max_ms']:8.1f}  "
+                f"{stats['total_ms']:9.0f}"
+            )
+    if summary["counts"]:
+        counts = summary["counts"].items()
+        lines.append("🧮 " + " · ".join(f"{name} {cnt}" for name, cnt in counts))
+    for slow in summary["slowest"]:
+        lines.append(f"🐢 {PurePath(slow['path']).name} 👉 {slow['ms']:.1f} ms")
+    return lines
+
+
+# The human-readable rendering of a note (what the scripts used to `print`)
+def render_note(event: dict) -> None:
+    text = f" 👉 {event['text']}" if event["text"] else ""
+    print(f"{event['icon']} {event['subject']}{text}")
+    if "error" in event:
+        print(event["error"])
+
+
+# MARK: Classes
+
+
+class Span:
+    __slots__ = ("tracer", "stage", "path", "bytes", "started")
+
+    def __init__(
+        self,
+        tracer: Optional["Tracer"],
+        stage: str,
+        path: Optional[Union[PathLike, str]] = None,
+        bytes: Optional[int] = None,
+    ) -> None:
+        self.tracer = tracer
+        self.stage = stage
+        self.path = path
+        # Can be set while the span is open (e.g. once the size is known)
+        self.bytes = bytes
+        self.started = 0.0
+
+    def __enter__(self) -> "Span":
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.tracer is not None:
+            self.tracer.end(self, perf_counter() - self.started, exc_type)
+
+
+class Tracer:
+    def __init__(self, target: Optional[str] = None) -> None:
+        self.target = environ.get("SRSS_TRACE", "") if target is None else target
+        self.enabled = self.target.strip().lower() not in OFF
+        self.script: Optional[str] = None
+        self.lock = Lock()
+        self.file: Optional[TextIO] = None
+        self.spans: list[Record] = []
+        self.counts: Counter[str] = Counter()
+
+    # The JSON Lines sink
+    def emit(self, event: dict) -> None:
+        if not self.enabled:
+            return
+        from json import dumps
+
+        event = {"ts": round(time(), 6), "pid": getpid(), **event}
+        if self.script:
+            event["script"] = self.script
+        line = dumps(event, ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.file is None:
+                if "-" == self.target:
+                    self.file = sys.stderr
+                else:
+                    # Line buffered, so the lines of several processes don't mix
+                    self.file = open(self.target, "a", encoding="utf-8", buffering=1)
+            self.file.write(line)
+
+    # e.g. `with tracer.span("validate", src, bytes=size): test_archive(src)`
+    def span(
+        self,
+        stage: str,
+        path: Optional[Union[PathLike, str]] = None,
+        bytes: Optional[int] = None,
+    ) -> Span:
+        return Span(self if self.enabled else None, stage, path, bytes)
+
+    def end(self, span: Span, seconds: float, exc_type) -> None:
+        path = get_path(span.path)
+        with self.lock:
+            self.spans.append((span.stage, path, seconds, span.bytes))
+        event = {"event": "span", "stage": span.stage, "path": path}
+        event["ms"] = round(seconds * 1000, 3)
+        if span.bytes is not None:
+            event["bytes"] = span.bytes
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        self.emit(event)
+
+    def count(
+        self, outcome: str, path: Optional[Union[PathLike, str]] = None, n: int = 1
+    ) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counts[outcome] += n
+        event = {"event": "count", "outcome": outcome, "path": get_path(path)}
+        self.emit({**event, "n": n})
+
+    # A message for humans (printed) that's also an event (and, maybe, an outcome)
+    #
+    # e.g.
+    #   note("🛑", src, "Corrupt", error=e, outcome="corrupt")
+    #   👉 🛑 Comic.cbz 👉 Corrupt
+    def note(
+        self,
+        icon: str,
+        subject: Union[PathLike, str],
+        text: str = "",
+        error: Optional[BaseException] = None,
+        outcome: Optional[str] = None,
+    ) -> None:
+        path = fspath(subject) if isinstance(subject, PathLike) else None
+        event = {
+            "event": "note",
+            "icon": icon,
+            "subject": PurePath(subject).name if path else subject,
+            "text": text,
+            "path": path,
+        }
+        if error is not None:
+            event["error"] = str(error)
+        render_note(event)
+        if outcome is not None:
+            self.count(outcome, path)
+        self.emit(event)
+
+    # Hand over what was recorded (e.g. from a worker process to its parent)
+    def take(self) -> tuple[list[Record], dict[str, int]]:
+        with self.lock:
+            spans, self.spans = self.spans, []
+            counts, self.counts = self.counts, Counter()
+        return spans, dict(counts)
+
+    def merge(self, recorded: tuple[list[Record], dict[str, int]]) -> None:
+        spans, counts = recorded
+        with self.lock:
+            self.spans += spans
+            self.counts.update(counts)
+
+    # End of the run: the summary, into the trace and onto stderr
+    def close(self) -> None:
+        spans, counts = self.take()
+        if spans or counts:
+            summary = summarize(spans, counts)
+            self.emit({"event": "summary", **summary})
+            for line in render_summary(summary):
+                print(line, file=sys.stderr)
+        with self.lock:
+            if self.file is not None and self.file is not sys.stderr:
+                self.file.close()
+            self.file = None
+
+
+_tracer: Optional[Tracer] = None
+
+
+# The tracer shared by everything in this process
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+        if _tracer.enabled:
+            atexit_register(_tracer.close)
+    return _tracer
+
+
+def span(
+    stage: str,
+    path: Optional[Union[PathLike, str]] = None,
+    bytes: Optional[int] = None,
+) -> Span:
+    return get_tracer().span(stage, path, bytes)
+
+
+def count(
+    outcome: str, path: Optional[Union[PathLike, str]] = None, n: int = 1
+) -> None:
+    get_tracer().count(outcome, path, n)
+
+
+def note(
+    icon: str,
+    subject: Union[PathLike, str],
+    text: str = "",
+    error: Optional[BaseException] = None,
+    outcome: Optional[str] = None,
+) -> None:
+    get_tracer().note(icon, subject, text, error=error, outcome=outcome)
+
+
+# Time only what it takes to produce the items (e.g. walking the folders), as one span
+def timed(items: Iterable[T], stage: str) -> Iterator[T]:
+    tracer = get_tracer()
+    if not tracer.enabled:
+        yield from items
+        return
+    seconds, cnt = 0.0, 0
+    iterator = iter(items)
+    try:
+        while True:
+            started = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += perf_counter() - started
+            cnt += 1
+            yield item
+    finally:
+        with tracer.lock:
+            tracer.spans.append((stage, None, seconds, None))
+        tracer.emit({"event": "span", "stage": stage, "ms": seconds * 1000, "n": cnt})
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    import json
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.trace", description="Summarize SRSS_TRACE files"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    parser.add_argument("--slowest", type=int, default=SLOWEST, metavar="N")
+    parser.add_argument("--json", action="store_true", help="Print it as JSON")
+    ns = parser.parse_args(args)
+
+    spans: list[Record] = []
+    counts: Counter[str] = Counter()
+    for file in ns.files:
+        with open(file, encoding="utf-8") as lines:
+            for line in lines:
+                event = json.loads(line)
+                if "span" == event["event"]:
+                    spans.append(
+                        (
+                            event["stage"],
+                            event.get("path"),
+                            event["ms"] / 1000,
+                            event.get("bytes"),
+                        )
+                    )
+                elif "count" == event["event"]:
+                    counts[event["outcome"]] += event["n"]
+    summary = summarize(spans, counts, slowest=ns.slowest)
+    if ns.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print("\n".join(render_summary(summary)))
+
+
+if __name__ == "__main__":
+    main()
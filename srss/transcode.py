@@ -0,0 +1,314 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Transcode
+#
+# Makes a smaller copy of a CBZ for a reading device, page by page, zip to zip:
+#   * Each page is read out of the CBZ, decoded, scaled down to fit the screen of the
+#     profile (never up), re-encoded (JPEG or WebP, grayscale for e-ink), and written
+#     to the new CBZ (with `srss.cbz.write_entries`), all in memory
+#   * A page that comes out no smaller (e.g. it was already small) is copied through
+#     as it was, and so is everything that isn't a page (e.g. `ComicInfo.xml`)
+#   * The pages are transcoded on the pool of processes of `srss.pages`, a few ahead
+#     of the one being written, so only about two pages per process are ever held
+#
+# Usage:
+#   python3 -m srss.transcode [--profile NAME] FILE ...
+#   python3 -m srss comic-transcode --profile tablet -r /Volumes/Library/Comics
+#
+# Profiles (`PROFILES`):
+#   * `eink` 👉 1072x1448, grayscale JPEG (Kindle Paperwhite 3, Kobo Clara)
+#   * `eink-hd` 👉 1264x1680, grayscale JPEG (Kindle Paperwhite 5, Kobo Libra 2)
+#   * `tablet` 👉 1640x2360, WebP (iPad Air)
+#   * `phone` 👉 1080x2400, WebP
+#
+# Notes:
+#   * `SRSS_TRANSCODE_PROFILE` (or `--profile`) picks the profile (default: `eink`).
+#   * `SRSS_PAGE_WORKERS` sets the number of processes (default: one per core; `1`
+#     transcodes the pages in the calling thread).
+#   * The landscape pages (spreads) are fit to the screen turned sideways, the way
+#     they are read.
+#   * A page with an EXIF orientation (e.g. from a phone) is turned upright before
+#     it's fit, since the EXIF isn't carried over.
+#   * A page only gets its new name (e.g. `1.png` 👉 `1.jpg`) when that name isn't
+#     taken, by another member or by a page transcoded before it; otherwise it's
+#     copied through as it was.
+#   * JPEGs are decoded at 1/2, 1/4 or 1/8 of their size when that's still bigger than
+#     the screen (`Image.draft`), which is most of the speed-up on big scans.
+#   * A page that can't be decoded is copied through and reported.
+#
+# External Dependencies
+#   * https://pypi.org/project/pillow/
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from collections import deque
+from functools import partial
+from io import BytesIO
+from os import PathLike, environ, fspath, stat
+from pathlib import Path, PurePosixPath
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Iterator, NamedTuple, Optional, Union
+from zipfile import ZipFile, ZipInfo
+
+from srss.cbz import Entry, write_entries
+from srss.lazy import lazy_import
+from srss.media import IMAGE_SUFFIXES
+from srss.pages import PAGE_WORKERS, get_pool, get_zip
+from srss.verify import BadMember
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+__all__ = [
+    "PROFILES",
+    "Profile",
+    "Report",
+    "get_destination",
+    "get_profile",
+    "transcode_cbz",
+]
+
+# MARK: Lazy Imports
+
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# MARK: Constants
+
+DEFAULT_PROFILE = "eink"
+
+# The suffix of the pages of each format
+SUFFIXES = {"JPEG": ".jpg", "WEBP": ".webp"}
+
+# (the new page, or `None` to copy it through; the error, if it couldn't be read)
+Transcoded = tuple[Optional[bytes], Optional[str]]
+
+# (the member, the name of the transcoded page, its future, if it's on the pool)
+Pending = tuple[ZipInfo, Optional[str], Optional["Future"]]
+
+# MARK: Classes
+
+
+class Profile(NamedTuple):
+    name: str
+    # The screen (portrait); the pages are scaled down to fit it
+    size: tuple[int, int]
+    # `JPEG` or `WEBP`
+    format: str
+    quality: int
+    grayscale: bool = False
+
+    @property
+    def suffix(self) -> str:
+        return SUFFIXES[self.format]
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in [
+        Profile("eink", (1072, 1448), "JPEG", 70, grayscale=True),
+        Profile("eink-hd", (1264, 1680), "JPEG", 75, grayscale=True),
+        Profile("tablet", (1640, 2360), "WEBP", 80),
+        Profile("phone", (1080, 2400), "WEBP", 75),
+    ]
+}
+
+
+class Report(NamedTuple):
+    # The pages in the archive, and how many of them were transcoded
+    pages: int
+    transcoded: int
+    # The size of the archive, before and after
+    bytes_in: int
+    bytes_out: int
+    seconds: float
+    # The pages that couldn't be decoded (copied through)
+    errors: list[BadMember]
+
+    def __str__(self) -> str:
+        saved = self.bytes_in - self.bytes_out
+        share = 100 * saved / self.bytes_in if self.bytes_in else 0
+        rate = self.pages / self.seconds if self.seconds else 0
+        text = (
+            f"{self.transcoded}/{self.pages} pages, {saved / 1e6:.1f} MB saved "
+            f"({share:.0f}%), {rate:.1f} pages/s"
+        )
+        if self.errors:
+            text += f", {len(self.errors)} unreadable"
+        return text
+
+
+# MARK: Functions
+
+
+# Read each time, since `--profile` sets it after the imports
+def get_profile(name: Optional[str] = None) -> Profile:
+    name = name or environ.get("SRSS_TRANSCODE_PROFILE", "").strip() or DEFAULT_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown profile: {name}") from None
+
+
+# e.g. `Comic.cbz` 👉 `Comic [eink].cbz`
+def get_destination(src: Union[PathLike, str], profile: Profile) -> Path:
+    src = Path(src)
+    return src.with_name(f"{src.stem} [{profile.name}].cbz")
+
+
+# The name of the transcoded page, or `None` if it isn't a page
+def get_target(name: str, profile: Profile) -> Optional[str]:
+    path = PurePosixPath(name)
+    if path.suffix.lower() not in IMAGE_SUFFIXES:
+        return None
+    return path.with_suffix(profile.suffix).as_posix()
+
+
+# The screen of the profile, turned sideways for a landscape page
+def get_box(size: tuple[int, int], profile: Profile) -> tuple[int, int]:
+    width, height = size
+    return profile.size[::-1] if height < width else profile.size
+
+
+def transcode_in(zf: ZipFile, info: ZipInfo, profile: Profile) -> Transcoded:
+    try:
+        data = zf.read(info)
+        with Image.open(BytesIO(data)) as im:
+            mode = "L" if profile.grayscale else "RGB"
+            # Decode a JPEG at a fraction of its size, when that's still big enough
+            # (as it's stored, i.e. before it's turned upright)
+            im.draft(mode, get_box(im.size, profile))
+            page = ImageOps.exif_transpose(im.convert(mode))
+        page.thumbnail(get_box(page.size, profile), Image.Resampling.LANCZOS)
+        out = BytesIO()
+        if "JPEG" == profile.format:
+            page.save(out, "JPEG", quality=profile.quality, optimize=True)
+        else:
+            page.save(out, profile.format, quality=profile.quality)
+    except Image.UnidentifiedImageError:
+        return None, "Not an image"
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+    transcoded = out.getvalue()
+    # Only worth it when it's smaller
+    return (transcoded if len(transcoded) < len(data) else None), None
+
+
+# What a worker process runs (a module-level function, so it can be pickled); the
+# member is the `i`-th of the archive, since two members can have one name
+def transcode_page(path: str, i: int, profile: Profile) -> Transcoded:
+    try:
+        zf = get_zip(path)
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+    return transcode_in(zf, zf.infolist()[i], profile)
+
+
+def copy_info(info: ZipInfo, name: str, size: int) -> ZipInfo:
+    entry = ZipInfo(name, info.date_time)
+    entry.external_attr = info.external_attr
+    entry.file_size = size
+    return entry
+
+
+# Transcode the CBZ `src` into the CBZ `dst` (see above)
+def transcode_cbz(
+    src: Union[PathLike, str],
+    dst: Union[PathLike, str],
+    profile: Profile,
+    workers: int = PAGE_WORKERS,
+) -> Report:
+    src = fspath(src)
+    start = perf_counter()
+    pages = transcoded = 0
+    errors: list[BadMember] = []
+    with ZipFile(src) as zf:
+        # With their positions in the archive, since two members can have one name
+        infos = [(i, info) for i, info in enumerate(zf.infolist()) if not info.is_dir()]
+        # The names in the new CBZ (every member's, and the new ones of the pages
+        # transcoded so far)
+        taken = {info.filename for _, info in infos}
+
+        def take(pending: Pending) -> Entry:
+            nonlocal transcoded
+            info, target, future = pending
+            data, error = None, None
+            if future is not None:
+                data, error = future.result()
+            elif target is not None:
+                data, error = transcode_in(zf, info, profile)
+            if error is not None:
+                errors.append(BadMember(info.filename, error))
+            # Taken by a page transcoded since it was queued
+            if data is not None and target != info.filename and target in taken:
+                data = None
+            if data is None:
+                entry = copy_info(info, info.filename, info.file_size)
+                return entry, partial(zf.open, info)
+            transcoded += 1
+            # (Only now, so a page copied through doesn't hold on to a name)
+            taken.add(target)
+            return copy_info(info, target, len(data)), partial(BytesIO, data)
+
+        def entries() -> Iterator[Entry]:
+            nonlocal pages
+            pending: deque[Pending] = deque()
+            try:
+                for i, info in infos:
+                    target = get_target(info.filename, profile)
+                    if target is not None:
+                        pages += 1
+                        # e.g. `1.png` and `1.jpg`, so it keeps its name (and format)
+                        if target != info.filename and target in taken:
+                            target = None
+                    future = None
+                    if target is not None and 1 < workers:
+                        future = get_pool().submit(transcode_page, src, i, profile)
+                    pending.append((info, target, future))
+                    # Nothing to wait for, or too many at once
+                    while pending and (
+                        pending[0][2] is None or 2 * workers < len(pending)
+                    ):
+                        yield take(pending.popleft())
+                while pending:
+                    yield take(pending.popleft())
+            finally:
+                for _, _, future in pending:
+                    if future is not None:
+                        future.cancel()
+
+        write_entries(dst, entries())
+    seconds = perf_counter() - start
+    sizes = stat(src).st_size, stat(dst).st_size
+    return Report(pages, transcoded, *sizes, seconds, errors)
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.transcode", description="Transcode CBZs for a device"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    parser.add_argument(
+        "--profile", choices=sorted(PROFILES), default=None, help="See `PROFILES`"
+    )
+    ns = parser.parse_args(args)
+    profile = get_profile(ns.profile)
+    failed = False
+    for file in ns.files:
+        try:
+            report = transcode_cbz(file, get_destination(file, profile), profile)
+            print(f"📉 {file} 👉 {report}")
+        except Exception as e:
+            failed = True
+            print(f"🛑 {file} 👉 {e}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Verification Cache
+#
+# Remembers how the test of an archive went, so a library that was checked yesterday
+# isn't checked again from scratch tonight. Each result is a small record:
+#   * The identity of the file 👉 size, mtime, inode, and a hash of its first and last
+#     64 KiB (which catches a file rewritten with the same size and mtime)
+#   * The verifier (and its version) 👉 A better verifier means everything is re-tested
+#   * The result 👉 OK, or the error
+#
+# The record is kept in an xattr on the file (so it follows the file when it's renamed
+# or moved, even on another machine) and in a local SQLite cache (so looking it up
+# doesn't touch the disk the library is on).
+#
+# Usage:
+#   with span("validate", src):
+#       test_verified(src, test_zip, VERIFIER)
+#
+# The cache lives at `SRSS_VERIFY_CACHE` (default: `~/Library/Caches/srss/
+# verified.sqlite3` on macOS and `$XDG_CACHE_HOME/srss/verified.sqlite3` elsewhere),
+# and the xattr is `SRSS_VERIFY_XATTR` (default: `user.srss.verified`). Set either to
+# `off` to turn it off.
+#
+# Notes:
+#   * `SRSS_REVERIFY=1` (or `--reverify`) ignores the records (and replaces them).
+#   * A record older than `SRSS_SPOT_CHECK_DAYS` (default: 30) is ignored anyway, for
+#     `SRSS_SPOT_CHECK_RATE` (default: 2%) of the files, so bit rot shows up sooner
+#     or later.
+#   * Only a verdict about the archive itself is recorded (including a `rar` or `7z`
+#     that ran and failed, see `comic_process`); an `OSError` (e.g. the share went
+#     away) or a missing tool is not.
+#   * A hit is only read; the cache is written when it didn't have the record under
+#     that path yet.
+#   * Python only has `os.getxattr` on Linux, so on macOS it's the SQLite cache alone.
+#   * Anything that goes wrong with the cache is reported and ignored, so it never
+#     gets in the way of the test itself.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+import os
+import sqlite3
+from hashlib import blake2b
+from os import PathLike, environ, stat_result
+from os.path import abspath
+from pathlib import Path
+from random import random
+from sys import platform
+from threading import Lock
+from time import time
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+from srss.probe import NotAnArchiveError
+from srss.verify import CorruptArchiveError
+
+__all__ = [
+    "CachedFailureError",
+    "Record",
+    "VerificationCache",
+    "get_cache",
+    "lookup",
+    "record",
+    "test_verified",
+]
+
+# MARK: Constants
+
+OFF = ["", "0", "false", "no", "off"]
+
+XATTR = environ.get("SRSS_VERIFY_XATTR", "user.srss.verified")
+
+SPOT_CHECK_DAYS = float(environ.get("SRSS_SPOT_CHECK_DAYS", "30"))
+
+SPOT_CHECK_RATE = float(environ.get("SRSS_SPOT_CHECK_RATE", "0.02"))
+
+# How much of each end of the file is hashed
+EDGE_SIZE = 64 << 10
+
+# The failures that say something about the archive (and so are worth remembering)
+VERDICTS = (CorruptArchiveError, NotAnArchiveError)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verified (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    verifier TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    error TEXT,
+    verified_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS verified_inode ON verified (inode);
+"""
+
+# MARK: Classes
+
+
+class Record(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+    digest: str
+    verifier: str
+    ok: bool
+    error: Optional[str]
+    verified_at: float
+
+    def matches(self, st: stat_result, verifier: str) -> bool:
+        identity = (st.st_size, st.st_mtime_ns, st.st_ino, verifier)
+        return (self.size, self.mtime_ns, self.inode, self.verifier) == identity
+
+
+class CachedFailureError(Exception):
+    def __init__(self, cached: Record) -> None:
+        super().__init__(f"{cached.error} (verified before)")
+        self.record = cached
+
+
+class VerificationCache:
+    def __init__(self, path: Union[PathLike, str]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the threads of a script, so serialize its use
+        self.lock = Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode = WAL")
+            self.db.execute("PRAGMA synchronous = NORMAL")
+            self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    # By path, or (after a rename) by inode; with the path it was recorded under
+    def get(self, path: str, st: stat_result) -> Optional[tuple[str, Record]]:
+        columns = (
+            "path, size, mtime_ns, inode, digest, verifier, ok, error, verified_at"
+        )
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT {columns} FROM verified WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                row = self.db.execute(
+                    f"SELECT {columns} FROM verified "
+                    "WHERE inode = ? AND size = ? AND mtime_ns = ?",
+                    (st.st_ino, st.st_size, st.st_mtime_ns),
+                ).fetchone()
+        if row is None:
+            return None
+        return row[0], Record(*row[1:6], bool(row[6]), *row[7:])
+
+    def put(self, path: str, entry: Record) -> None:
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO verified (path, size, mtime_ns, inode, digest, "
+                "verifier, ok, error, verified_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, *entry[:5], int(entry.ok), *entry[6:]),
+            )
+
+
+# MARK: Functions
+
+
+def get_default_cache_path() -> Path:
+    if "darwin" == platform:
+        cache = Path.home() / "Library" / "Caches"
+    else:
+        cache = Path(environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return cache / "srss" / "verified.sqlite3"
+
+
+def warn(e: Exception) -> None:
+    print(f"⚠️ Verification cache 👉 {e}")
+
+
+# A hash of the size and both ends of the file
+def get_digest(path: str, size: int) -> str:
+    digest = blake2b(size.to_bytes(8, "little"), digest_size=16)
+    with open(path, "rb") as file:
+        digest.update(file.read(EDGE_SIZE))
+        if 2 * EDGE_SIZE < size:
+            file.seek(-EDGE_SIZE, os.SEEK_END)
+        digest.update(file.read(EDGE_SIZE))
+    return digest.hexdigest()
+
+
+# Read each time, since `--reverify` sets it after the imports
+def is_reverify() -> bool:
+    return environ.get("SRSS_REVERIFY", "").strip().lower() not in OFF
+
+
+_xattrs_failed = False
+
+
+def has_xattrs() -> bool:
+    if _xattrs_failed or not hasattr(os, "getxattr"):
+        return False
+    return XATTR.strip().lower() not in OFF
+
+
+def read_xattr(path: str) -> Optional[Record]:
+    if not has_xattrs():
+        return None
+    from json import loads
+
+    try:
+        return Record(**loads(os.getxattr(path, XATTR)))
+    except (OSError, ValueError, TypeError):
+        # Not there (yet), or not from this version
+        return None
+
+
+def write_xattr(path: str, entry: Record) -> None:
+    global _xattrs_failed
+    if not has_xattrs():
+        return
+    from json import dumps
+
+    value = dumps(entry._asdict(), separators=(",", ":")).encode()
+    try:
+        os.setxattr(path, XATTR, value)
+    except OSError as e:
+        # e.g. a file system without xattrs; the SQLite cache still has it
+        _xattrs_failed = True
+        warn(e)
+
+
+_cache: Optional[VerificationCache] = None
+_cache_loaded = False
+_cache_lock = Lock()
+
+
+# The cache at `SRSS_VERIFY_CACHE` (or the default), or `None` if it's off or broken
+def get_cache() -> Optional[VerificationCache]:
+    global _cache, _cache_loaded
+    # e.g. the threads of a batch, all asking at once on the first comic
+    with _cache_lock:
+        if not _cache_loaded:
+            location = environ.get("SRSS_VERIFY_CACHE", str(get_default_cache_path()))
+            if location.strip().lower() not in OFF:
+                try:
+                    _cache = VerificationCache(location)
+                except (OSError, sqlite3.Error) as e:
+                    warn(e)
+            # Only once it's open (or known broken)
+            _cache_loaded = True
+    return _cache
+
+
+# The (still valid) record of how `file` was verified, if there is one
+def lookup(file: Union[PathLike, str], verifier: str) -> Optional[Record]:
+    if is_reverify():
+        return None
+    path = abspath(file)
+    st = os.stat(path)
+    cache = get_cache()
+    found = cached = None
+    if cache is not None:
+        try:
+            cached = cache.get(path, st)
+        except sqlite3.Error as e:
+            warn(e)
+    if cached is not None:
+        found = cached[1]
+    if found is None or not found.matches(st, verifier):
+        found = read_xattr(path)
+    if found is None or not found.matches(st, verifier):
+        return None
+    # Once in a while, check the old ones again anyway
+    if SPOT_CHECK_DAYS * 86400 < time() - found.verified_at:
+        if random() < SPOT_CHECK_RATE:
+            return None
+    if found.digest != get_digest(path, st.st_size):
+        return None
+    # Only written when the cache doesn't have it under this path yet (e.g. it was
+    # renamed, or only the xattr had it), so a hit stays a read
+    if cache is not None and cached != (path, found):
+        try:
+            cache.put(path, found)
+        except sqlite3.Error as e:
+            warn(e)
+    return found
+
+
+def record(
+    file: Union[PathLike, str], verifier: str, error: Optional[Exception] = None
+) -> None:
+    path = abspath(file)
+    st = os.stat(path)
+    entry = Record(
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        inode=st.st_ino,
+        digest=get_digest(path, st.st_size),
+        verifier=verifier,
+        ok=error is None,
+        error=None if error is None else str(error),
+        verified_at=time(),
+    )
+    cache = get_cache()
+    if cache is not None:
+        try:
+            cache.put(path, entry)
+        except sqlite3.Error as e:
+            warn(e)
+    write_xattr(path, entry)
+
+
+# Run `test` (which raises when the archive is bad), unless it was already run on
+# this very file; a remembered failure is raised again as a `CachedFailureError`
+# (returns whether the test was skipped)
+def test_verified(
+    file: Union[PathLike, str], test: Callable[[Any], Any], verifier: str
+) -> bool:
+    found = lookup(file, verifier)
+    if found is not None:
+        if not found.ok:
+            raise CachedFailureError(found)
+        return True
+    try:
+        test(file)
+    except VERDICTS as e:
+        record(file, verifier, e)
+        raise
+    record(file, verifier)
+    return False
@@ -0,0 +1,254 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Verify
+#
+# Checks the CRC of every member of a ZIP (CBZ), in this process, instead of running
+# `patoolib.test_archive` (i.e. an `unzip -t`, one member after the other):
+#   * The central directory is read once, and the file is mapped (`mmap`) once; each
+#     member is checked straight from its own view of the mapping (no copies)
+#   * The members are checked on a pool of threads, since `zlib.crc32` and
+#     `zlib.decompress` let go of the GIL
+#   * `quick` 👉 Stop at the first bad member (enough to tag it as corrupt)
+#   * `full` 👉 Check (and report) every member
+#
+# Usage:
+#   python3 -m srss.verify [--full] FILE ...
+#
+# Notes:
+#   * `SRSS_VERIFY_WORKERS` sets the number of threads (default: up to 8). Small
+#     archives are checked in the calling thread, where threads would only add
+#     overhead.
+#   * Members compressed with something other than deflate (e.g. bzip2, LZMA) or
+#     encrypted are read with `zipfile` instead.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from mmap import ACCESS_READ, mmap
+from os import PathLike, cpu_count, environ, fspath
+from struct import Struct
+from threading import Event, Lock
+from typing import TYPE_CHECKING, Iterable, Literal, NamedTuple, Optional, Union
+from zipfile import ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile, ZipInfo
+from zlib import MAX_WBITS, crc32, decompressobj
+from zlib import error as ZlibError
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+__all__ = [
+    "BadMember",
+    "CorruptArchiveError",
+    "VERIFIER",
+    "Verification",
+    "test_zip",
+    "verify_zip",
+]
+
+# MARK: Constants
+
+# Part of each verification record (`srss.verified`); bump it when the checks change
+VERIFIER = "srss.verify/1"
+
+VERIFY_WORKERS = int(environ.get("SRSS_VERIFY_WORKERS", str(min(8, cpu_count() or 4))))
+
+# Smaller archives are checked without the threads
+THREADED_SIZE = 4 << 20
+
+CHUNK_SIZE = 1 << 20
+
+# signature, version, flags, compression, time, date, crc, sizes, name + extra lengths
+LOCAL_HEADER = Struct("<4s5HL2L2H")
+
+LOCAL_SIGNATURE = b"PK\x03\x04"
+
+Mode = Literal["quick", "full"]
+
+# MARK: Classes
+
+
+class BadMember(NamedTuple):
+    name: str
+    error: str
+
+
+class Verification(NamedTuple):
+    path: str
+    members: int
+    # The uncompressed bytes that were checked
+    bytes: int
+    bad: list[BadMember]
+    # When the archive itself can't be read (e.g. not a ZIP, or cut short)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.bad
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return self.error
+        if self.bad:
+            return "; ".join(f"{bad.name}: {bad.error}" for bad in self.bad)
+        return f"{self.members} members OK"
+
+
+class CorruptArchiveError(Exception):
+    def __init__(self, result: Verification) -> None:
+        super().__init__(str(result))
+        self.result = result
+
+
+# MARK: Functions
+
+
+# The CRC (and size) of a member's data, as stored or inflated a chunk at a time
+def check_data(data: memoryview, info: ZipInfo) -> tuple[int, int]:
+    if ZIP_STORED == info.compress_type:
+        return crc32(data), len(data)
+    inflater = decompressobj(-MAX_WBITS)
+    crc = size = 0
+    for start in range(0, len(data), CHUNK_SIZE):
+        chunk = data[start : start + CHUNK_SIZE]
+        while chunk:
+            out = inflater.decompress(chunk, CHUNK_SIZE)
+            crc, size = crc32(out, crc), size + len(out)
+            chunk = inflater.unconsumed_tail
+    out = inflater.flush()
+    crc, size = crc32(out, crc), size + len(out)
+    if not inflater.eof:
+        raise ValueError("Deflate stream cut short")
+    return crc, size
+
+
+# Check one member (from the mapping); returns the error, if any
+def check_member(mapped: mmap, zf: ZipFile, lock: Lock, info: ZipInfo) -> Optional[str]:
+    try:
+        if info.flag_bits & 0x1 or info.compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+            # Rare enough not to bother; `zipfile` checks the CRC as it reads
+            with lock, zf.open(info) as member:
+                while member.read(CHUNK_SIZE):
+                    pass
+            return None
+        end = info.header_offset + LOCAL_HEADER.size
+        if len(mapped) < end:
+            return "Cut short"
+        header = LOCAL_HEADER.unpack_from(mapped, info.header_offset)
+        if LOCAL_SIGNATURE != header[0]:
+            return "Bad local header"
+        start = end + header[-2] + header[-1]
+        end = start + info.compress_size
+        if len(mapped) < end:
+            return "Cut short"
+        with memoryview(mapped) as view, view[start:end] as data:
+            crc, size = check_data(data, info)
+        if size != info.file_size:
+            return f"Size mismatch ({size} != {info.file_size})"
+        if crc != info.CRC:
+            return f"CRC mismatch ({crc:08x} != {info.CRC:08x})"
+    except (BadZipFile, EOFError, OSError, ValueError, ZlibError) as e:
+        return str(e) or type(e).__name__
+    return None
+
+
+_pool: Optional["ThreadPoolExecutor"] = None
+_pool_lock = Lock()
+
+
+def get_pool() -> "ThreadPoolExecutor":
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, VERIFY_WORKERS), thread_name_prefix="srss-verify"
+            )
+        return _pool
+
+
+def verify_zip(
+    path: Union[PathLike, str], mode: Mode = "quick", workers: int = VERIFY_WORKERS
+) -> Verification:
+    path = fspath(path)
+    try:
+        zf = ZipFile(path)
+    except (BadZipFile, OSError) as e:
+        return Verification(path, 0, 0, [], error=str(e) or type(e).__name__)
+    with zf, open(path, "rb") as file:
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+        if not infos:
+            return Verification(path, 0, 0, [])
+        try:
+            mapped = mmap(file.fileno(), 0, access=ACCESS_READ)
+        except (OSError, ValueError) as e:
+            return Verification(path, len(infos), 0, [], error=str(e))
+        with mapped:
+            bad = check_members(mapped, zf, infos, mode, workers)
+    checked = sum(info.file_size for info in infos)
+    return Verification(path, len(infos), checked, bad)
+
+
+def check_members(
+    mapped: mmap, zf: ZipFile, infos: list[ZipInfo], mode: Mode, workers: int
+) -> list[BadMember]:
+    lock = Lock()
+    stop = Event()
+    # By the position of the member in the archive (two members can have one name)
+    bad: list[tuple[int, BadMember]] = []
+
+    def check(i: int) -> None:
+        if stop.is_set():
+            return
+        info = infos[i]
+        error = check_member(mapped, zf, lock, info)
+        if error is not None:
+            with lock:
+                bad.append((i, BadMember(info.filename, error)))
+            if "quick" == mode:
+                stop.set()
+
+    compressed = sum(info.compress_size for info in infos)
+    if workers <= 1 or 1 == len(infos) or compressed < THREADED_SIZE:
+        for i in range(len(infos)):
+            check(i)
+    else:
+        # Largest first, so one big member doesn't finish last on its own
+        order = sorted(
+            range(len(infos)), key=lambda i: infos[i].compress_size, reverse=True
+        )
+        list(get_pool().map(check, order))
+    # In the order of the archive
+    return [member for _, member in sorted(bad)]
+
+
+# Like `patoolib.test_archive`: raises when the archive (or a member) is bad
+def test_zip(path: Union[PathLike, str], mode: Mode = "quick") -> Verification:
+    result = verify_zip(path, mode)
+    if not result.ok:
+        raise CorruptArchiveError(result)
+    return result
+
+
+# MARK: Command Line
+
+
+def main(args: Optional[Iterable[str]] = None) -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog="python3 -m srss.verify", description="Check the CRCs of ZIPs / CBZs"
+    )
+    parser.add_argument("files", nargs="+", metavar="FILE")
+    parser.add_argument("--full", action="store_true", help="Report every bad member")
+    ns = parser.parse_args(args)
+    failed = False
+    for file in ns.files:
+        result = verify_zip(file, "full" if ns.full else "quick")
+        failed = failed or not result.ok
+        print(f"{'✅' if result.ok else '🛑'} {file} 👉 {result}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
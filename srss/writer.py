@@ -0,0 +1,196 @@
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+# SRSS: Tag Writer
+#
+# Applies the tag updates queued by the scripts on a pool of worker threads, instead
+# of one blocking xattr round trip after another (which, over SMB, is most of the
+# time a tag-only script takes).
+#
+#   * The updates for one file are applied in the order they were queued (by the
+#     same worker, one after the other); different files go in parallel.
+#   * A failed update is recorded for its path and reported by `wait`, instead of
+#     stopping the whole run.
+#   * `SRSS_TAG_WORKERS` sets the number of threads (default: 8). `1` (or `0`)
+#     applies every update right away, in the calling thread.
+#   * The updates queued while a `TagBatch` is tracked (by the current thread, see
+#     `tracking`) are waited for and reported on their own, so that one batch (e.g.
+#     one in `srss.daemon`) neither waits for nor takes the failures of another.
+# =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+# MARK: Imports
+
+from atexit import register as atexit_register
+from collections import deque
+from contextlib import contextmanager
+from os import PathLike, environ
+from os.path import abspath
+from pathlib import PurePath
+from threading import Condition, local
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Union
+
+from srss.tags import TagSession
+from srss.trace import get_tracer
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+__all__ = [
+    "TagBatch",
+    "TagWriter",
+    "get_tag_writer",
+    "report_failures",
+]
+
+# MARK: Constants
+
+TAG_WORKERS = int(environ.get("SRSS_TAG_WORKERS", "8"))
+
+# MARK: Classes
+
+
+# The updates queued for one batch (how many are left, and the ones that failed)
+class TagBatch:
+    def __init__(self) -> None:
+        self.pending = 0
+        self.failures: dict[str, list[Exception]] = {}
+
+
+# (an update, the batch it was queued for)
+Update = tuple[Callable[[], object], Optional[TagBatch]]
+
+
+class TagWriter:
+    def __init__(self, workers: int = TAG_WORKERS) -> None:
+        self.workers = max(1, workers)
+        # Started with the first update (`concurrent.futures` imports `logging`, which
+        # would slow down the startup of every script)
+        self.executor: Optional["ThreadPoolExecutor"] = None
+        self.idle = Condition()
+        # The queued (and, first, the running) updates of each file
+        self.queues: dict[str, deque[Update]] = {}
+        self.pending = 0
+        self.failures: dict[str, list[Exception]] = {}
+        # The batch tracked by each thread
+        self.local = local()
+
+    @property
+    def current(self) -> Optional[TagBatch]:
+        return getattr(self.local, "batch", None)
+
+    # Queue the updates of the current thread for `batch`
+    @contextmanager
+    def tracking(self, batch: TagBatch) -> Iterator[TagBatch]:
+        previous = self.current
+        self.local.batch = batch
+        try:
+            yield batch
+        finally:
+            self.local.batch = previous
+
+    def submit(self, file: Union[PathLike, str], update: Callable[[], object]) -> None:
+        path = abspath(file)
+        batch = self.current
+        if 1 == self.workers:
+            self._apply(path, update, batch)
+            return
+        with self.idle:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="srss-tags"
+                )
+            self.pending += 1
+            if batch is not None:
+                batch.pending += 1
+            queue = self.queues.get(path)
+            if queue:
+                # The worker on this file picks it up when it's done with the others
+                queue.append((update, batch))
+                return
+            self.queues[path] = deque([(update, batch)])
+        self.executor.submit(self._drain, path)
+
+    # Queue the (read+diff+)write of a session
+    def commit(self, session: TagSession) -> None:
+        self.submit(session.file, session.commit)
+
+    def _apply(
+        self, path: str, update: Callable[[], object], batch: Optional[TagBatch]
+    ) -> None:
+        try:
+            with get_tracer().span("tag", path):
+                update()
+        except Exception as e:
+            failures = self.failures if batch is None else batch.failures
+            with self.idle:
+                failures.setdefault(path, []).append(e)
+
+    def _drain(self, path: str) -> None:
+        while True:
+            with self.idle:
+                update, batch = self.queues[path][0]
+            self._apply(path, update, batch)
+            with self.idle:
+                queue = self.queues[path]
+                queue.popleft()
+                self.pending -= 1
+                if batch is not None:
+                    batch.pending -= 1
+                if not self.pending or (batch is not None and not batch.pending):
+                    self.idle.notify_all()
+                if not queue:
+                    del self.queues[path]
+                    return
+
+    # Wait for everything queued so far (only for the current batch, if the thread
+    # tracks one), then report (and return) the failures
+    def wait(self, report: bool = True) -> dict[str, list[Exception]]:
+        batch = self.current
+        if batch is not None:
+            return self.wait_batch(batch, report)
+        with self.idle:
+            self.idle.wait_for(lambda: not self.pending)
+            failures, self.failures = self.failures, {}
+        if report:
+            report_failures(failures)
+        return failures
+
+    # Wait for the updates queued for `batch` only, then report (and return) its
+    # failures
+    def wait_batch(
+        self, batch: TagBatch, report: bool = True
+    ) -> dict[str, list[Exception]]:
+        with self.idle:
+            self.idle.wait_for(lambda: not batch.pending)
+            failures, batch.failures = batch.failures, {}
+        if report:
+            report_failures(failures)
+        return failures
+
+    def close(self) -> dict[str, list[Exception]]:
+        failures = self.wait()
+        if self.executor is not None:
+            self.executor.shutdown()
+        return failures
+
+
+# MARK: Functions
+
+
+def report_failures(failures: dict[str, list[Exception]]) -> None:
+    for path, errors in failures.items():
+        for e in errors:
+            print(f"🛑 {PurePath(path).name} 👉 Tags not written ({e})")
+
+
+_tag_writer: Optional[TagWriter] = None
+
+
+# The writer shared by everything in this process
+def get_tag_writer() -> TagWriter:
+    global _tag_writer
+    if _tag_writer is None:
+        _tag_writer = TagWriter()
+        # Don't lose queued updates if a script forgets to wait
+        atexit_register(_tag_writer.wait)
+    return _tag_writer
@@ -7,64 +7,45 @@
 
 # MARK: Imports
 
-from os import environ, pathsep
 from pathlib import Path
 from re import IGNORECASE as re_IGNORECASE
 from re import compile as re_compile
 from re import search as re_search
 from re import sub as re_sub
-from sys import argv
 
-from imageio_ffmpeg import read_frames
+from srss.client import run_script
+from srss.homebrew import add_homebrew_to_path
+from srss.lazy import lazy_import
+from srss.media import MOVIE_SUFFIXES
+from srss.trace import note, span
+
+# MARK: Lazy Imports
+
+read_frames = lazy_import("imageio_ffmpeg", "read_frames")
 
 # MARK: PATH Additions
 # To allow `imageio_ffmpeg` to find the binaries from Homebrew
 
-environ["PATH"] += pathsep + "/usr/local/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/sbin"
-
-# MARK: Constants
-
-MOVIE_SUFFIXES = [
-    ".asf",
-    ".avi",
-    ".divx",
-    ".flv",
-    ".m4v",
-    ".mkv",
-    ".mov",
-    ".mp4",
-    ".mpg",
-    ".mpeg",
-    ".ogv",
-    ".ogm",
-    ".rm",
-    ".rmvb",
-    ".ts",
-    ".vob",
-    ".webm",
-    ".wmv",
-]
-
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
+add_homebrew_to_path()
+
+# MARK: Process One Path
 
+
+def process(arg: str) -> None:
     src = Path(arg).resolve()
 
     # ♻️ Skip if the path is not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not src.is_file():
-        print(f"🛑 {src.name} 👉 not a file")
-        continue
+        note("🛑", src, "not a file", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # ♻️ Skip if the path does not have a recognized suffix
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not src.suffix.lower() in MOVIE_SUFFIXES:
-        print(f"🛑 {src.suffix} 👉 not a movie suffix")
-        continue
+        note("🛑", src.suffix, "not a movie suffix", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Normalize dimensions (<w>x<h>) in the file name to resolution (<h>p)
@@ -72,10 +53,10 @@ for arg in args:
     pattern_dimensions = re_compile(r"\b(\d{3,4})\s?[xX]\s?(\d{3,4})\b")
     matches = re_search(pattern_dimensions, src.stem)
     if matches:
-        print(f"📏 {src.name} (name) 👉 {matches.group(1)}")
+        note("📏", src, f"{matches.group(1)} (name)")
         fn_height = matches.group(2)
         dst = src.with_stem(re_sub(pattern_dimensions, f"{fn_height}p", src.stem))
-        print(f"♻️ Renaming {src} 👉 {dst}")
+        note("♻️", src, f"Renaming ➡️ {dst.name}", outcome="renamed")
         src.rename(dst)
         src = dst
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
@@ -87,7 +68,7 @@ for arg in args:
     matches = re_search(pattern_resolution, src.stem)
     if matches:
         fn_resolution = matches.group(1)
-        print(f"📏 {src.name} (name) 👉 {fn_resolution}")
+        note("📏", src, f"{fn_resolution} (name)")
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # If the "p" is capitalized, make it lowercase
@@ -96,7 +77,7 @@ for arg in args:
         if "P" in fn_resolution:
             fn_resolution = fn_resolution.lower()
             dst = src.with_stem(re_sub(pattern_resolution, fn_resolution, src.stem))
-            print(f"♻️ Lowering case {src} 👉 {dst}")
+            note("♻️", src, f"Lowering case ➡️ {dst.name}", outcome="renamed")
             dst = src.rename(dst)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
@@ -104,19 +85,19 @@ for arg in args:
     # And if the video is corrupt, rename it to indicate that
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        reader = read_frames(src)
-        meta = reader.__next__()
+        with span("probe", src):
+            reader = read_frames(src)
+            meta = reader.__next__()
     except Exception as e:
-        print(f"🚫 {src.name} 👉 corrupt")
+        note("🚫", src, "corrupt", error=e, outcome="corrupt")
         src.rename(src.with_stem(f"_CORRUPT_ {src.stem}"))
-        print(e)
-        continue
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Get the video resolution
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     vid_width, vid_height = meta["size"]
-    print(f"📏 {src.name} (meta) 👉 {vid_width}x{vid_height}")
+    note("📏", src, f"{vid_width}x{vid_height} (meta)")
     vid_resolution = f"{vid_height}p"
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
@@ -124,19 +105,31 @@ for arg in args:
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if fn_resolution:
         if fn_resolution == vid_resolution:
-            print(f"🚫 {src.name} 👉 already has correct resolution")
-            continue
+            note("🚫", src, "already has correct resolution", outcome="correct")
+            return
         else:
             dst = src.with_stem(re_sub(pattern_resolution, vid_resolution, src.stem))
-            print(f"♻️ {src} 👉 {dst}")
+            note("♻️", src, f"➡️ {dst.name}", outcome="renamed")
             src.rename(dst)
-            continue
+            return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Add the resolution to the file name if it is missing
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not fn_resolution:
         dst = src.with_stem(f"{src.stem} [{vid_resolution}]")
-        print(f"♻️ {src} 👉 {dst}")
+        note("♻️", src, f"➡️ {dst.name}", outcome="renamed")
         src.rename(dst)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+
+
+if __name__ == "__main__":
+    run_script("video-rename-with-resolution", main)
@@ -8,92 +8,63 @@
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike, environ, pathsep
 from pathlib import Path
 from re import compile as re_compile
 from re import search as re_search
-from sys import argv
-from typing import Union
 
-from imageio_ffmpeg import read_frames
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
+from srss.client import run_script
+from srss.homebrew import add_homebrew_to_path
+from srss.lazy import lazy_import
+from srss.media import MOVIE_SUFFIXES
+from srss.tags import Color, Tag, add_tag
+from srss.trace import count, note, span
+
+# MARK: Lazy Imports
+
+read_frames = lazy_import("imageio_ffmpeg", "read_frames")
 
 # MARK: PATH Additions
 # To allow `imageio_ffmpeg` to find the binaries from Homebrew
 
-environ["PATH"] += pathsep + "/usr/local/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/sbin"
+add_homebrew_to_path()
 
 # MARK: Constants
 
-MOVIE_SUFFIXES = [
-    ".asf",
-    ".avi",
-    ".divx",
-    ".flv",
-    ".m4v",
-    ".mkv",
-    ".mov",
-    ".mp4",
-    ".mpg",
-    ".mpeg",
-    ".ogv",
-    ".ogm",
-    ".rm",
-    ".rmvb",
-    ".ts",
-    ".vob",
-    ".webm",
-    ".wmv",
-]
-
 RED = itemgetter("RED")(Color)
 
 TAG_WRONG_RESOLTUION = Tag(name="Wrong Resolution", color=RED)
 
-# MARK: Functions
-
-
-# Extend `macos_tags.add` to accept a `PathLike` object
-def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    add_tag_original(tag, file=str(file))
-
+# MARK: Process One Path
 
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
 
+def process(arg: str) -> None:
     path = Path(arg).resolve()
 
     # ♻️ Skip if the path is not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.is_file():
-        print(f"🛑 {path.name} 👉 not a file")
-        continue
+        note("🛑", path, "not a file", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # ♻️ Skip if the path does not have a recognized suffix
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.suffix.lower() in MOVIE_SUFFIXES:
-        print(f"🛑 {path.suffix} 👉 not a movie suffix")
-        continue
+        note("🛑", path.suffix, "not a movie suffix", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # (Try to) get the metadata or skip+tag if the video is corrupt
     # And if the video is corrupt, rename it to indicate that
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        reader = read_frames(path)
-        meta = reader.__next__()
+        with span("probe", path):
+            reader = read_frames(path)
+            meta = reader.__next__()
     except Exception as e:
-        print(f"🚫 {path.name} 👉 corrupt")
+        note("🚫", path, "corrupt", error=e, outcome="corrupt")
         path.rename(path.with_stem(f"_CORRUPT_ {path.stem}"))
-        print(e)
-        continue
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Get the video resolution
@@ -105,11 +76,24 @@ for arg in args:
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     pattern_resolution = re_compile(rf"{vid_height}[pP]")
     if re_search(pattern_resolution, path.name):
-        print(f"🛑 {path.name} 👉 has correct resolution")
-        continue
+        note("🛑", path, "has correct resolution", outcome="correct")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Rename the file to append the resolution
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     add_tag(TAG_WRONG_RESOLTUION, file=path)
+    count("wrong_resolution", path)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+
+
+if __name__ == "__main__":
+    run_script("video-tag-wrong-resolution-in-file-name", main)
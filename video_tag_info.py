@@ -9,187 +9,79 @@
 # MARK: Imports
 
 from operator import itemgetter
-from os import PathLike, environ, pathsep
-from pathlib import Path, PurePath
-from re import Pattern
-from re import compile as re_compile
-from re import search as re_search
-from sys import argv
-from typing import Union
-
-from imageio_ffmpeg import read_frames
-from macos_tags import Color, Tag
-from macos_tags import add as add_tag_original
-from macos_tags import get_all as get_all_tags_original
-from macos_tags import remove as remove_tag_original
+from pathlib import Path
+
+from srss.client import run_script
+from srss.homebrew import add_homebrew_to_path
+from srss.lazy import lazy_import
+from srss.media import MOVIE_SUFFIXES, ORIENTATION_TAGS, get_aspect_ratio
+from srss.tags import Color, Tag, TagRules, TagSession
+from srss.trace import note, span
+from srss.writer import get_tag_writer
+
+# MARK: Lazy Imports
+
+read_frames = lazy_import("imageio_ffmpeg", "read_frames")
 
 # MARK: PATH Additions
 # To allow `imageio_ffmpeg` to find the binaries from Homebrew
 
-environ["PATH"] += pathsep + "/usr/local/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/bin"
-environ["PATH"] += pathsep + "/opt/homebrew/sbin"
+add_homebrew_to_path()
 
 # MARK: Constants
 
-(
-    RED,
-    ORANGE,
-    GREEN,
-    BLUE,
-    PURPLE,
-    GRAY,
-) = itemgetter(
-    "RED",
-    "ORANGE",
-    "GREEN",
-    "BLUE",
-    "PURPLE",
-    "GRAY",
-)(Color)
+RED, GREEN, BLUE = itemgetter("RED", "GREEN", "BLUE")(Color)
 
 TAG_CORRUPT = Tag(name="Corrupt", color=RED)
 
-ORIENTATION_TAGS = {
-    Tag(name="Portrait", color=ORANGE): lambda ratio: ratio < 1,
-    Tag(name="Square", color=GRAY): lambda ratio: 1 == ratio,
-    Tag(name="Landscape", color=PURPLE): lambda ratio: 1 < ratio,
-}
-
-MOVIE_SUFFIXES = [
-    ".asf",
-    ".avi",
-    ".divx",
-    ".flv",
-    ".m4v",
-    ".mkv",
-    ".mov",
-    ".mp4",
-    ".mpg",
-    ".mpeg",
-    ".ogv",
-    ".ogm",
-    ".rm",
-    ".rmvb",
-    ".ts",
-    ".vob",
-    ".webm",
-    ".wmv",
-]
-
-# MARK: Functions
-
-
-# Extend `macos_tags.add` to accept a `PathLike` object
-def add_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    add_tag_original(tag, file=str(file))
-
-
-# Extend `macos_tags.get_all_tags` to accept a `PathLike` object
-def get_all_tags(file: Union[PathLike, str]) -> list[Tag]:
-    return get_all_tags_original(file=str(file))
+# The tags set by this script (i.e. the ones it replaces on each run)
+OWNED_TAGS = TagRules(
+    tags=[TAG_CORRUPT, *ORIENTATION_TAGS.keys()],
+    patterns=[
+        (r"\d+x\d+", GREEN),  # e.g. `1920x1080`
+        (r"\d{2}:\d{2}:\d{2}", BLUE),  # e.g. `01:23:45`
+    ],
+)
 
+# MARK: Process One Path
 
-# Extend `macos_tags.remove` to accept a `PathLike` object
-def remove_tag(tag: Tag, file: Union[PathLike, str]) -> None:
-    remove_tag_original(file=str(file), tag=tag)
+tag_writer = get_tag_writer()
 
 
-def get_aspect_ratio(w: int, h: int) -> float:
-    return w / h
-
-
-def remove_tag_by_name(tag_name: str, file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    for tag in get_all_tags(file=file):
-        if tag.name == tag_name:
-            remove_tag(tag, file=file)
-            break
-
-
-def remove_tag_by_re(
-    tag_name_re: Union[Pattern, str], file: Union[PathLike, str]
-) -> None:
-    if isinstance(tag_name_re, str):
-        tag_name_re = re_compile(tag_name_re)
-    file = PurePath(file)
-    for tag in get_all_tags(file=file):
-        results = re_search(tag_name_re, tag.name)
-        if results:
-            remove_tag(tag, file=file)
-
-
-def remove_tags_by_name(tag_names: list[str], file: Union[PathLike, str]) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_name(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=file):
-        if tag.name in tag_names:
-            remove_tag(tag, file=file)
-
-
-def remove_tags_by_re(
-    tag_names: list[Union[Pattern, str]], file: Union[PathLike, str]
-) -> None:
-    file = PurePath(file)
-    if 1 == len(tag_names):
-        remove_tag_by_re(tag_names[0], file=file)
-        return
-    for tag in get_all_tags(file=file):
-        for tag_name in tag_names:
-            if re_search(tag_name, tag.name):
-                remove_tag(tag, file=file)
-
-
-# MARK: The Loop
-args = argv[1:]
-for arg in args:
-
+def process(arg: str) -> None:
     path = Path(arg)
 
     # Skip if the path is not a file
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.is_file():
-        print(f"🛑 {path.name} 👉 not a file")
-        continue
+        note("🛑", path, "not a file", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Skip if the path does not have a recognized suffix
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     if not path.suffix.lower() in MOVIE_SUFFIXES:
-        print(f"🛑 {path.suffix} 👉 not a movie suffix")
-        continue
+        note("🛑", path.suffix, "not a movie suffix", outcome="skipped")
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
-    # Remove any pre-existing tags (that look like they were set by this script)
+    # Read the existing tags (the ones that look like they were set by this script are
+    # replaced when written)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
-    remove_tags_by_name(
-        [
-            TAG_CORRUPT.name,
-            *[tag.name for tag in ORIENTATION_TAGS.keys()],
-        ],
-        file=path,
-    )
-    remove_tags_by_re(
-        [
-            re_compile(r"\d+x\d+"),
-            re_compile(r"\d{2}:\d{2}:\d{2}"),
-        ],
-        file=path,
-    )
+    tags = TagSession(path, owned=OWNED_TAGS)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # (Try to) get the metadata or skip+tag if the video is corrupt
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
     try:
-        reader = read_frames(path)
-        meta = reader.__next__()
+        with span("probe", path):
+            reader = read_frames(path)
+            meta = reader.__next__()
     except Exception as e:
-        print(f"🚫 {path.name} 👉 corrupt")
-        print(e)
-        add_tag(TAG_CORRUPT, file=path)
-        continue
+        note("🚫", path, "corrupt", error=e, outcome="corrupt")
+        tags.add(TAG_CORRUPT)
+        tag_writer.commit(tags)
+        return
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # The order in which the tags are assigned matters when sorting by tags
@@ -205,8 +97,8 @@ for arg in args:
     hours, remainder = divmod(duration_secs, 3600)
     minutes, seconds = divmod(remainder, 60)
     duration_tag = Tag(name=f"{hours:02}:{minutes:02}:{seconds:02}", color=BLUE)
-    add_tag(duration_tag, file=path)
-    print(f"〘{duration_tag.name}〛👉 {path.name}")
+    tags.add(duration_tag)
+    note("🏷️", path, duration_tag.name)
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
 
     # Add the resolution-based tags
@@ -216,12 +108,31 @@ for arg in args:
 
     for tag, test in ORIENTATION_TAGS.items():
         if test(vid_ratio):
-            add_tag(tag, file=path)
-            print(f"〘{tag.name}〛👉 {path.name}")
+            tags.add(tag)
+            note("🏷️", path, tag.name)
             break
 
     # Set the video resolution-based tags
     res_tag = Tag(name=f"{vid_width}x{vid_height}", color=GREEN)
-    add_tag(res_tag, file=path)
-    print(f"〘{res_tag.name}〛👉 {path.name}")
+    tags.add(res_tag)
+    note("🏷️", path, res_tag.name, outcome="valid")
     # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+    # Queue writing the tags (only if they changed)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+    tag_writer.commit(tags)
+    # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=
+
+
+# MARK: Main
+
+
+def main(args: list[str]) -> None:
+    for arg in args:
+        process(arg)
+    # Wait for the queued tag writes (and report the failed ones)
+    tag_writer.wait()
+
+
+if __name__ == "__main__":
+    run_script("video_tag_info", main)